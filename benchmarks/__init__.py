@@ -0,0 +1,10 @@
+"""
+    Benchmarks of PySLOBS, run against the stand-in server in pyslobs.standin
+    so they need neither StreamLabs Desktop nor a network.
+
+    Run with:
+        python -m benchmarks [--quick] [--only SUITE ...] [--output FILE]
+
+    Results are written as JSON, so they can be compared across releases.
+    Not part of the installed package.
+"""
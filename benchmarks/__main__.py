@@ -0,0 +1,56 @@
+import argparse
+import json
+import sys
+import time
+
+from . import commands, decoders, encoding, factories, memory, pubsub
+from .common import environment
+
+SUITES = {
+    "commands": commands.run,
+    "pubsub": pubsub.run,
+    "factories": factories.run,
+    "decoders": decoders.run,
+    "encoding": encoding.run,
+    "memory": memory.run,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks", description="Benchmark PySLOBS."
+    )
+    parser.add_argument(
+        "--only",
+        nargs="+",
+        choices=sorted(SUITES),
+        help="Run only these suites.",
+    )
+    parser.add_argument(
+        "--quick", action="store_true", help="Fewer iterations; for smoke tests."
+    )
+    parser.add_argument(
+        "--output", help="Write the JSON results to this file, rather than stdout."
+    )
+    args = parser.parse_args(argv)
+
+    results = dict(
+        environment=environment(),
+        started=time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        quick=args.quick,
+        suites=dict(),
+    )
+    for name in args.only or SUITES:
+        print(f"Running {name}...", file=sys.stderr)
+        results["suites"][name] = SUITES[name](quick=args.quick)
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            output.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
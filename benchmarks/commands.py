@@ -0,0 +1,104 @@
+"""
+    Command throughput and latency: commands/second, and p50/p99 of the time
+    command() takes, with several coroutines issuing commands at once.
+
+    The commands are identical, so ConnectionConfig.share_reads would answer
+    most of them without sending anything. It is turned off, so every command
+    goes to the server; commands_sent says how many did.
+"""
+import asyncio
+from time import perf_counter
+
+from pyslobs import SlobsConnection
+from pyslobs.standin import StandinModel, StandinServer, StandinThread
+
+from .common import summarize
+
+CONCURRENCY = (1, 8, 64)
+PARAMS = dict(resource="ScenesService", args=[])
+
+
+async def _measure(conn, concurrency: int, commands: int) -> dict:
+    latencies = []
+    remaining = commands
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            started = perf_counter()
+            await conn.command("activeSceneId", PARAMS)
+            latencies.append(perf_counter() - started)
+
+    # Warm up, so connecting and authenticating isn't measured.
+    await conn.command("activeSceneId", PARAMS)
+    shared_before = conn.commands_shared
+    started = perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = perf_counter() - started
+    return dict(
+        concurrency=concurrency,
+        commands=len(latencies),
+        commands_sent=len(latencies) - (conn.commands_shared - shared_before),
+        seconds=elapsed,
+        commands_per_second=len(latencies) / elapsed,
+        latency=summarize(latencies),
+    )
+
+
+async def _run_levels(config, concurrency_levels, commands) -> list[dict]:
+    conn = SlobsConnection(config)
+    background_task = asyncio.create_task(conn.background_processing())
+    try:
+        return [
+            await _measure(conn, concurrency, commands)
+            for concurrency in concurrency_levels
+        ]
+    finally:
+        conn.close()
+        await background_task
+
+
+async def _run_asyncio(model, server_options, concurrency_levels, commands, **config):
+    async with StandinServer(model, **server_options) as server:
+        return await _run_levels(
+            server.connection_config(transport="asyncio", **config),
+            concurrency_levels,
+            commands,
+        )
+
+
+def run(
+    quick: bool = False,
+    transports=("asyncio", "thread"),
+    concurrency_levels=CONCURRENCY,
+    latency: float = 0,
+    **config,
+) -> list[dict]:
+    """config is passed to the ConnectionConfig (e.g. codec="orjson")."""
+    config = dict(config, share_reads=False)
+    commands = 500 if quick else 5000
+    model = StandinModel.seeded()
+    server_options = dict(latency=latency)
+    results = []
+    for transport in transports:
+        if transport == "asyncio":
+            levels = asyncio.run(
+                _run_asyncio(model, server_options, concurrency_levels, commands, **config)
+            )
+        else:
+            # The server needs its own loop: this transport blocks while
+            # connecting.
+            with StandinThread(StandinServer(model, **server_options)) as server:
+                levels = asyncio.run(
+                    _run_levels(
+                        server.connection_config(transport=transport, **config),
+                        concurrency_levels,
+                        commands,
+                    )
+                )
+        for level in levels:
+            level["transport"] = transport
+            level["server_latency"] = latency
+        results.extend(levels)
+    return results
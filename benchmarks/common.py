@@ -0,0 +1,59 @@
+"""
+    Helpers shared by the benchmark suites.
+"""
+import platform
+import sys
+from importlib import metadata
+from math import ceil
+from time import perf_counter
+
+
+def percentile(ordered: list[float], percent: float) -> float:
+    """Nearest-rank percentile of an already sorted, non-empty list."""
+    rank = ceil(len(ordered) * percent / 100)
+    return ordered[max(0, rank - 1)]
+
+
+def summarize(samples: list[float]) -> dict:
+    """Summary statistics of samples (in seconds)."""
+    ordered = sorted(samples)
+    return dict(
+        count=len(ordered),
+        mean=sum(ordered) / len(ordered),
+        min=ordered[0],
+        p50=percentile(ordered, 50),
+        p99=percentile(ordered, 99),
+        max=ordered[-1],
+    )
+
+
+def best_of(function, repeat: int, number: int = 1) -> float:
+    """Seconds per call of function(), taking the fastest of repeat runs of
+    number calls each. The fastest run is the one least disturbed by the rest
+    of the machine."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = perf_counter()
+        for _ in range(number):
+            function()
+        best = min(best, (perf_counter() - started) / number)
+    return best
+
+
+def environment() -> dict:
+    def version(package):
+        try:
+            return metadata.version(package)
+        except metadata.PackageNotFoundError:
+            return None
+
+    return dict(
+        python=sys.version.split()[0],
+        implementation=platform.python_implementation(),
+        platform=platform.platform(),
+        machine=platform.machine(),
+        pyslobs=version("PySLOBS"),
+        websocket_client=version("websocket-client"),
+        orjson=version("orjson"),
+        msgspec=version("msgspec"),
+    )
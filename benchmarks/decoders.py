@@ -0,0 +1,109 @@
+"""
+    Decoders: the compiled, schema-driven decoders in pyslobs.slobs.factories,
+    against the field-at-a-time decoding they replaced, on getNodes and
+    getSources payloads.
+"""
+import json
+
+import pyslobs  # noqa: F401 Registers the classes the factories create.
+from pyslobs.slobs.factories import _instance, sceneitem_factory, source_factory
+from pyslobs.slobs.typedefs import ICrop, ITransform, IVec2, TSceneNodeType
+from pyslobs.standin import StandinModel
+
+from .common import best_of
+from .factories import scene_json
+
+NODE_COUNTS = (100, 1000, 10000)
+
+
+def sceneitem_by_hand(connection, json_dict):
+    """sceneitem_factory, as written before the decoders were compiled."""
+    if isinstance(json_dict["transform"]["position"], list):
+        transform_position = IVec2(
+            x=json_dict["transform"]["position"][0],
+            y=json_dict["transform"]["position"][1],
+        )
+    else:
+        transform_position = IVec2(**json_dict["transform"]["position"])
+    return _instance(
+        connection,
+        "SceneItem",
+        resource_id=json_dict["resourceId"],
+        source_id=json_dict["sourceId"],
+        id_=json_dict["id"],
+        node_id=json_dict.get("nodeId", None),
+        parent_id=json_dict["parentId"],
+        scene_id=json_dict["sceneId"],
+        scene_node_type=TSceneNodeType(json_dict["sceneNodeType"]),
+        name=json_dict["name"],
+        locked=json_dict["locked"],
+        recording_visible=json_dict["recordingVisible"],
+        scene_item_id=json_dict["sceneItemId"],
+        stream_visible=json_dict["streamVisible"],
+        transform=ITransform(
+            crop=ICrop(**json_dict["transform"]["crop"]),
+            position=transform_position,
+            rotation=json_dict["transform"]["rotation"],
+            scale=IVec2(**json_dict["transform"]["scale"]),
+        ),
+        visible=json_dict["visible"],
+    )
+
+
+def source_by_hand(connection, json_dict):
+    """source_factory, as written before the decoders were compiled."""
+    return _instance(
+        connection,
+        "Source",
+        resource_id=json_dict.get("resourceId", None),
+        source_id=json_dict.get("sourceId", None),
+        async_=json_dict["async"],
+        audio=json_dict["audio"],
+        channel=json_dict.get("channel", None),
+        configurable=json_dict.get("configurable", None),
+        do_not_duplicate=json_dict["doNotDuplicate"],
+        height=json_dict["height"],
+        id_=json_dict["id"],
+        muted=json_dict["muted"],
+        name_=json_dict["name"],
+        type_=json_dict["type"],
+        video=json_dict["video"],
+        width=json_dict["width"],
+    )
+
+
+def sources_json(sources: int) -> list[dict]:
+    """A getSources reply with about that many sources."""
+    model = StandinModel.seeded(scenes=1, items_per_scene=sources)
+    return json.loads(
+        json.dumps(
+            [
+                model.source_model(source)
+                for source in model.collection().sources.values()
+            ]
+        )
+    )
+
+
+def run(quick: bool = False, node_counts=NODE_COUNTS) -> list[dict]:
+    repeat = 3 if quick else 7
+    results = []
+    for nodes in node_counts:
+        payloads = dict(
+            get_nodes=(scene_json(nodes)["nodes"], sceneitem_factory, sceneitem_by_hand),
+            get_sources=(sources_json(nodes), source_factory, source_by_hand),
+        )
+        number = max(1, 1000 // nodes)
+        result = dict(nodes=nodes)
+        for name, (payload, compiled, by_hand) in payloads.items():
+            compiled_seconds = best_of(
+                lambda: [compiled(None, entry) for entry in payload], repeat, number
+            )
+            by_hand_seconds = best_of(
+                lambda: [by_hand(None, entry) for entry in payload], repeat, number
+            )
+            result[f"{name}_seconds_per_entry"] = compiled_seconds / len(payload)
+            result[f"{name}_by_hand_seconds_per_entry"] = by_hand_seconds / len(payload)
+            result[f"{name}_speedup"] = by_hand_seconds / compiled_seconds
+        results.append(result)
+    return results
@@ -0,0 +1,63 @@
+"""
+    Encoding: the time to encode one request for the high-rate setters, with
+    the cached request templates of RequestEncoder, against encoding the
+    whole request each time, as before.
+"""
+from pyslobs import ICrop, ITransform, IVec2
+from pyslobs.connection import _SlobsWebSocket
+from pyslobs.jsoncodec import CODECS, RequestEncoder
+from pyslobs.slobs.scenenode import SceneItem
+
+from .common import best_of
+
+ITEM = 'SceneItem["scene","item","source"]'
+TRANSFORM = ITransform(ICrop(0, 0, 0, 0), IVec2(100.5, 200.25), 45, IVec2(1.5, 1.5))
+
+CALLS = dict(
+    set_transform=(
+        "setTransform",
+        dict(resource=ITEM, args=[SceneItem.marshall_transform(TRANSFORM)]),
+    ),
+    set_visibility=("setVisibility", dict(resource=ITEM, args=[True])),
+    set_deflection=(
+        "setDeflection",
+        dict(resource='AudioSource["source"]', args=[0.75]),
+    ),
+)
+
+
+def _available_codecs():
+    for name, codec_class in CODECS.items():
+        try:
+            yield name, codec_class()
+        except ImportError:
+            continue
+
+
+def run(quick: bool = False) -> list[dict]:
+    repeat = 3 if quick else 7
+    number = 2000 if quick else 20000
+    results = []
+    for codec_name, codec in _available_codecs():
+        encoder = RequestEncoder(codec)
+        for call_name, (method, params) in CALLS.items():
+            whole_seconds = best_of(
+                lambda: codec.encode(
+                    _SlobsWebSocket._build_params_dict(12345, method, params)
+                ),
+                repeat,
+                number,
+            )
+            cached_seconds = best_of(
+                lambda: encoder.encode(12345, method, params), repeat, number
+            )
+            results.append(
+                dict(
+                    codec=codec_name,
+                    call=call_name,
+                    whole_seconds=whole_seconds,
+                    cached_seconds=cached_seconds,
+                    speedup=whole_seconds / cached_seconds,
+                )
+            )
+    return results
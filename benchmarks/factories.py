@@ -0,0 +1,52 @@
+"""
+    Decoding: the cost of turning the JSON dicts of a scene into Python
+    objects with scene_factory, and of its items with sceneitem_factory.
+
+    A scene's nodes are only built when read, so scene_factory is timed both
+    alone ("lazy") and with every node read.
+"""
+import json
+
+import pyslobs  # noqa: F401 Registers the classes the factories create.
+from pyslobs.slobs.factories import scene_factory, sceneitem_factory
+from pyslobs.standin import StandinModel
+
+from .common import best_of
+
+NODE_COUNTS = (10, 100, 1000, 10000)
+
+
+def scene_json(nodes: int, folders: int = 0) -> dict:
+    """The JSON dict of a scene with nodes items, as the server sends it."""
+    model = StandinModel.seeded(
+        scenes=1, items_per_scene=nodes, folders_per_scene=folders
+    )
+    # Round trip, so the dicts are as fresh from a decoder.
+    return json.loads(json.dumps(model.scene_model(model.active_scene())))
+
+
+def run(quick: bool = False, node_counts=NODE_COUNTS) -> list[dict]:
+    repeat = 3 if quick else 7
+    results = []
+    for nodes in node_counts:
+        scene = scene_json(nodes)
+        items = scene["nodes"]
+        number = max(1, 1000 // nodes)
+        lazy_seconds = best_of(lambda: scene_factory(None, scene), repeat, number)
+        scene_seconds = best_of(
+            lambda: list(scene_factory(None, scene).nodes), repeat, number
+        )
+        items_seconds = best_of(
+            lambda: [sceneitem_factory(None, item) for item in items], repeat, number
+        )
+        results.append(
+            dict(
+                nodes=nodes,
+                scene_factory_lazy_seconds=lazy_seconds,
+                scene_factory_lazy_seconds_per_node=lazy_seconds / nodes,
+                scene_factory_seconds=scene_seconds,
+                scene_factory_seconds_per_node=scene_seconds / nodes,
+                sceneitem_factory_seconds_per_node=items_seconds / nodes,
+            )
+        )
+    return results
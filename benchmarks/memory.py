@@ -0,0 +1,53 @@
+"""
+    Memory: the bytes retained by the objects that sceneitem_factory and
+    source_factory build, per scene item and per source, with the default
+    ITransforms and with CompactTransforms.
+"""
+import gc
+import tracemalloc
+from types import SimpleNamespace
+
+from pyslobs.slobs.factories import sceneitem_factory, source_factory
+from pyslobs.standin import StandinModel
+
+from .factories import scene_json
+
+NODE_COUNTS = (1000, 10000, 100000)
+
+
+def retained_bytes(build) -> int:
+    """Bytes still allocated after build() returns, while its result lives."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = build()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del result
+    return after - before
+
+
+def run(quick: bool = False, node_counts=NODE_COUNTS) -> list[dict]:
+    if quick:
+        node_counts = node_counts[:1]
+    results = []
+    for nodes in node_counts:
+        items = scene_json(nodes)["nodes"]
+        model = StandinModel.seeded(scenes=1, items_per_scene=nodes)
+        sources = [
+            model.source_model(source)
+            for source in model.collection().sources.values()
+        ]
+        result = dict(nodes=nodes)
+        for name, compact in (("itransform", False), ("compact_transform", True)):
+            connection = SimpleNamespace(compact_transforms=compact, identity_map=None)
+            result[f"bytes_per_item_{name}"] = retained_bytes(
+                lambda: [sceneitem_factory(connection, item) for item in items]
+            ) / nodes
+        result["bytes_per_source"] = retained_bytes(
+            lambda: [source_factory(None, source) for source in sources]
+        ) / len(sources)
+        results.append(result)
+    return results
@@ -0,0 +1,54 @@
+"""
+    Event fan-out: the cost of PubSubHub.publish() with 1, 10 and 100
+    subscribers to the key, and of delivering the message to all of them.
+"""
+import asyncio
+from time import perf_counter
+
+from pyslobs.pubsubhub import PubSubHub
+
+SUBSCRIBERS = (1, 10, 100)
+
+
+def _make_callback(counter):
+    async def callback(key, message):
+        counter[0] += 1
+
+    return callback
+
+
+async def _measure(subscribers: int, messages: int) -> dict:
+    hub = PubSubHub()
+    delivered = [0]
+    for _ in range(subscribers):
+        await hub.subscribe("key", _make_callback(delivered))
+
+    publish_seconds = 0.0
+    started = perf_counter()
+    for message in range(messages):
+        publish_started = perf_counter()
+        await hub.publish("key", message)
+        publish_seconds += perf_counter() - publish_started
+    expected = subscribers * messages
+    while delivered[0] < expected:
+        await asyncio.sleep(0)
+    elapsed = perf_counter() - started
+    await hub.close()
+    return dict(
+        subscribers=subscribers,
+        messages=messages,
+        publish_seconds_per_message=publish_seconds / messages,
+        delivered_seconds_per_message=elapsed / messages,
+        deliveries_per_second=expected / elapsed,
+    )
+
+
+def run(quick: bool = False, subscriber_counts=SUBSCRIBERS) -> list[dict]:
+    messages = 200 if quick else 2000
+
+    async def run_all():
+        return [
+            await _measure(subscribers, messages) for subscribers in subscriber_counts
+        ]
+
+    return asyncio.run(run_all())
@@ -1,6 +1,21 @@
-from .config import ConnectionConfig, config_from_ini_else_stdin, config_from_ini
+from .apibase import hydrate
+from .config import (
+    ConnectionConfig,
+    ReconnectPolicy,
+    config_from_ini_else_stdin,
+    config_from_ini,
+)
 from .connection import AuthenticationFailure, ProtocolError, SlobsConnection
-from .pubsubhub import SubscriptionPreferences, CLOSED, UNSUBSCRIBED
+from .jsoncodec import JsonCodec
+from .mirror import SceneGraphMirror
+from .pubsubhub import (
+    CLOSED,
+    UNSUBSCRIBED,
+    Delivery,
+    Overflow,
+    SubscriptionPreferences,
+)
+from .timeouts import AdaptiveTimeoutPolicy, FixedTimeoutPolicy, TimeoutPolicy
 from .slobs.audioservice import AudioService
 from .slobs.notificationsservice import NotificationsService
 from .slobs.performanceservice import PerformanceService
@@ -11,6 +26,7 @@ from .slobs.sourcesservice import SourcesService
 from .slobs.streamingservice import StreamingService
 from .slobs.transitionsservice import TransitionsService
 from .slobs.typedefs import (
+    CompactTransform,
     ICrop,
     ISceneCollectionCreateOptions,
     ISourceAddOptions,
@@ -23,22 +39,30 @@ from .slobs.typedefs import (
 )
 
 __all__ = [
+    "AdaptiveTimeoutPolicy",
     "AudioService",
     "AuthenticationFailure",
     "CLOSED",
+    "CompactTransform",
     "ConnectionConfig",
+    "Delivery",
+    "FixedTimeoutPolicy",
     "ICrop",
     "ISceneCollectionCreateOptions",
     "ISourceAddOptions",
     "ITransform",
     "IVec2",
+    "JsonCodec",
     "MonitoringType",
     "NotificationSubType",
     "NotificationType",
     "NotificationsService",
+    "Overflow",
     "PerformanceService",
     "ProtocolError",
+    "ReconnectPolicy",
     "SceneCollectionsService",
+    "SceneGraphMirror",
     "ScenesService",
     "SelectionService",
     "SlobsConnection",
@@ -46,8 +70,10 @@ __all__ = [
     "StreamingService",
     "SubscriptionPreferences",
     "TSceneNodeType",
+    "TimeoutPolicy",
     "TransitionsService",
     "UNSUBSCRIBED",
     "config_from_ini",
     "config_from_ini_else_stdin",
+    "hydrate",
 ]
@@ -22,8 +22,13 @@
             - defined with the associated SlobsClasses
 """
 
+import asyncio
+from collections import deque
+from dataclasses import replace
+from typing import Optional
+
 from .connection import ProtocolError
-from .pubsubhub import SubscriptionPreferences
+from .pubsubhub import CLOSED, Delivery, Overflow, SubscriptionPreferences
 
 """
     Design note: Considered the use of CompactMode, which limits the number
@@ -41,10 +46,17 @@ from .pubsubhub import SubscriptionPreferences
     Compromise:
         * get all the fields, but only use the ones that appear as properties
           on the SlobsClasses.
+        * the list methods can opt in to CompactMode (ConnectionConfig.compact_mode
+          or their compact argument), for large listings. The other fields
+          are fetched afterwards, in one batch, by hydrate().
 """
 
 
 class SlobsBase:
+    # Slotted throughout the hierarchy: there may be many thousands of
+    # instances. __weakref__ allows an identity map.
+    __slots__ = ("_connection", "_resource_id", "__weakref__")
+
     def __init__(self, connection, resource_id):
         self._connection = connection
         self._resource_id = resource_id
@@ -52,15 +64,29 @@ class SlobsBase:
     def __str__(self):
         return f"{self.__class__.__name__}({self._resource_id})"
 
+    def _refresh(self, **fields) -> None:
+        """Update this instance in place from a fresh payload (see identitymap).
+        The constructors only store their arguments, so re-running one does."""
+        self.__init__(self._connection, **fields)
+
     # Helper functions.
 
-    def _prepared_params(self, args=None):
+    def _prepared_params(self, args=None, compact=False):
         if args is None:
             args = []
         else:
             assert isinstance(args, list)
+        if compact:
+            return dict(resource=self._resource_id, args=args, compactMode=True)
         return dict(resource=self._resource_id, args=args)
 
+    def _compact(self, compact: Optional[bool]) -> bool:
+        """Whether a list method should ask for CompactMode: compact, unless
+        it is None, in which case the connection's default."""
+        if compact is None:
+            return getattr(self._connection, "compact_mode", False)
+        return compact
+
     @staticmethod
     def _check_empty(response):
         if response:
@@ -68,6 +94,8 @@ class SlobsBase:
 
 
 class SlobsService(SlobsBase):
+    __slots__ = ()
+
     def __init__(self, connection):
         # This takes advantage of the fact that the Python class names
         # match the Javascript Resource names.
@@ -103,6 +131,13 @@ class SlobsClass(SlobsBase):
 
     """
 
+    __slots__ = ("_source_id",)
+
+    _model_factory = None
+    # The factory that builds an instance from the class's getModel reply, given
+    # the resource_id the reply lacks.
+    # Classes that can be returned in CompactMode set it, for hydrate().
+
     def __init__(self, connection, resource_id, source_id):
         super().__init__(connection, resource_id)
         self._source_id = source_id
@@ -119,6 +154,50 @@ class SlobsClass(SlobsBase):
         # Override to use source_id instead.
         return f"{self.__class__.__name__}({self._source_id})"
 
+    def _adopt(self, other: "SlobsClass") -> None:
+        """Take every field of other, a fresh instance of the same class."""
+        for cls in type(self).__mro__:
+            for slot in cls.__dict__.get("__slots__", ()):
+                if slot != "__weakref__":
+                    setattr(self, slot, getattr(other, slot))
+
+
+async def hydrate(objects) -> None:
+    """Fill in the fields of SlobsClass instances returned in CompactMode, by
+    fetching their models in one batch per connection. Instances are updated
+    in place.
+
+    If any model couldn't be fetched or decoded, the rest are still filled in,
+    then the first error is raised.
+    """
+    by_connection = dict()
+    for instance in objects:
+        by_connection.setdefault(id(instance._connection), []).append(instance)
+    errors = []
+    for instances in by_connection.values():
+        connection = instances[0]._connection
+        results = await connection.command_batch(
+            [("getModel", instance._prepared_params()) for instance in instances]
+        )
+        for instance, result in zip(instances, results):
+            if isinstance(result, BaseException):
+                errors.append(result)
+                continue
+            try:
+                # A model has no resourceId; the instance keeps its own.
+                fresh = instance._model_factory(
+                    connection, result, instance._resource_id
+                )
+            except (LookupError, TypeError, ValueError) as e:
+                errors.append(
+                    ProtocolError(f"Could not decode the model of {instance}: {e!r}")
+                )
+                continue
+            if fresh is not instance:  # Not already refreshed by an identity map.
+                instance._adopt(fresh)
+    if errors:
+        raise errors[0]
+
 
 class _EventSubscription:
     def __init__(self, connection, resource_id, callback_coroutine):
@@ -136,6 +215,91 @@ class _EventSubscription:
         await self._connection.unsubscribe(self._resource_id, self._callback_coroutine)
 
 
+class _EventStream:
+    """Events, as an asynchronous iterator. See Event.stream()."""
+
+    def __init__(self, event, maxsize: int, overflow: Overflow, filter_):
+        self._event = event
+        self._maxsize = maxsize
+        self._overflow = overflow
+        self._filter = filter_
+        self._buffer = deque()
+        self._ready = asyncio.Event()
+        self._space = asyncio.Event()
+        self._subscription: Optional[_EventSubscription] = None
+        self._ended = False
+        # Set when the connection closes, or the stream is left. Events already
+        # buffered may still be read.
+
+    async def __aenter__(self):
+        self._subscription = await self._event.subscribe(
+            self._receive,
+            SubscriptionPreferences(
+                notify_on_close=True,
+                delivery=Delivery.QUEUED,
+                queue_size=self._maxsize,
+                overflow=self._overflow,
+                filter_=self._filter,
+            ),
+        )
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self._end()
+        self._buffer.clear()
+        if self._subscription is not None:
+            subscription, self._subscription = self._subscription, None
+            try:
+                await subscription.unsubscribe()
+            except ProtocolError:
+                pass  # Connection already closed.
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not await self._wait():
+            raise StopAsyncIteration
+        message = self._buffer.popleft()
+        self._space.set()
+        return message
+
+    async def get_many(self, max_items: int = 100) -> list:
+        """Wait for at least one event; return up to max_items that have
+        arrived, oldest first. Returns an empty list at the end of the stream."""
+        if not await self._wait():
+            return []
+        buffer = self._buffer
+        result = [buffer.popleft() for _ in range(min(max_items, len(buffer)))]
+        self._space.set()
+        return result
+
+    async def _wait(self) -> bool:
+        """Wait until an event is buffered. False if none ever will be."""
+        while not self._buffer:
+            if self._ended:
+                return False
+            self._ready.clear()
+            await self._ready.wait()
+        return True
+
+    def _end(self) -> None:
+        self._ended = True
+        self._ready.set()
+        self._space.set()
+
+    async def _receive(self, key, message):
+        if key is CLOSED:
+            self._end()
+            return
+        while len(self._buffer) >= self._maxsize and not self._ended:
+            self._space.clear()
+            await self._space.wait()
+        if not self._ended:
+            self._buffer.append(message)
+            self._ready.set()
+
+
 class Event:
     """An event that can be subscribed to"""
 
@@ -145,8 +309,16 @@ class Event:
         self._method = method
 
     async def subscribe(
-        self, callback_coroutine, subscription_prefs=SubscriptionPreferences()
+        self,
+        callback_coroutine,
+        subscription_prefs=SubscriptionPreferences(),
+        filter_=None,
     ) -> _EventSubscription:
+        """filter_, if given, overrides subscription_prefs.filter_: a predicate
+        taking the event's message, or a dict of fields and values the message
+        must have, e.g. dict(sceneId=scene.id)."""
+        if filter_ is not None:
+            subscription_prefs = replace(subscription_prefs, filter_=filter_)
         subscription_resource_id = await self._connection.subscribe(
             method=self._method,
             params=dict(resource=self._service, args=[]),
@@ -159,3 +331,24 @@ class Event:
             subscription_resource_id,
             callback_coroutine,
         )
+
+    def stream(
+        self, maxsize: int = 100, overflow: Overflow = Overflow.DROP_OLDEST, filter_=None
+    ) -> _EventStream:
+        """Subscribe, and iterate over the events. e.g.
+
+            async with ScenesService(conn).item_updated.stream() as events:
+                async for message in events:
+                    ...
+
+        or take them in batches with get_many(). Up to maxsize events wait in
+        the stream. Beyond that, up to maxsize more wait in the subscription's
+        queue, and then overflow applies (see pubsubhub.Overflow). It may not
+        be Overflow.BLOCK: that would stop the connection receiving anything,
+        including the responses to commands sent by whoever reads the stream.
+        Unsubscribes on leaving the context; ends when the connection closes.
+        filter_ is as for subscribe().
+        """
+        if overflow is Overflow.BLOCK:
+            raise ValueError("A stream's overflow may not be Overflow.BLOCK.")
+        return _EventStream(self, maxsize, overflow, filter_)
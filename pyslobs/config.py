@@ -3,8 +3,31 @@ from typing import Optional
 import configparser
 from dataclasses import dataclass
 
+from .jsoncodec import JsonCodec
+from .timeouts import TimeoutPolicy
+
 DEFAULT_DOMAIN = "localhost"
 DEFAULT_PORT = 59650
+DEFAULT_TRANSPORT = "thread"
+TRANSPORTS = ("thread", "asyncio")
+
+
+@dataclass
+class ReconnectPolicy:
+    """How a SlobsConnection recovers when its connection drops."""
+
+    initial_delay: float = 0.5
+    # Seconds to wait before the first attempt to reconnect.
+    max_delay: float = 30
+    multiplier: float = 2
+    # Each failed attempt multiplies the delay, up to max_delay.
+    max_attempts: Optional[int] = None
+    # Give up (and close the connection) after this many failures in a row.
+    # None means keep trying.
+    retry_in_flight: bool = False
+    # Commands still awaiting a response when the connection drops are
+    # resent after reconnecting if True, or fail with ProtocolError if False.
+    # Only enable if the commands are safe to repeat.
 
 
 @dataclass
@@ -14,6 +37,40 @@ class ConnectionConfig:
     token: str
     domain: str = DEFAULT_DOMAIN
     port: int = DEFAULT_PORT
+    # "thread" drives the blocking websocket-client library from executor
+    # threads. "asyncio" speaks WebSocket directly over asyncio streams, and
+    # connects lazily on first use.
+    transport: str = DEFAULT_TRANSPORT
+    # Maximum number of commands awaiting a response at once. Further commands
+    # queue until a slot is free. None means no limit.
+    max_in_flight: Optional[int] = None
+    # JSON encoder/decoder for messages: "json" (standard library), "orjson" or
+    # "msgspec" (which need those packages installed), or a JsonCodec instance.
+    codec: str | JsonCodec = "json"
+    # If set, reconnect when the connection drops, rather than closing.
+    reconnect: Optional[ReconnectPolicy] = None
+    # If True, SlobsConnection.metrics records per-method counters and latencies.
+    metrics: bool = False
+    # Decides how long each command waits for its response. None means every
+    # command waits SlobsConnection.TIMEOUT seconds.
+    timeout_policy: Optional[TimeoutPolicy] = None
+    # If True, the same resource is always represented by the same SlobsClass
+    # instance (while it is in use), updated in place as fresh data arrives.
+    # See identitymap.py.
+    identity_map: bool = False
+    # If True, scene items' transforms are CompactTransforms (one slotted
+    # object) rather than ITransforms (four namedtuples), to save memory.
+    compact_transforms: bool = False
+    # If True, the list methods (ScenesService.get_scenes,
+    # SourcesService.get_sources and Scene.get_nodes) ask for CompactMode
+    # replies, which hold little more than each object's ids. Its other
+    # fields are None until fetched with hydrate(). Each call can override
+    # this with its compact argument.
+    compact_mode: bool = False
+    # If True, an idempotent read (see SlobsConnection.IDEMPOTENT_METHODS)
+    # issued while an identical one awaits its response shares that request
+    # and its result, rather than sending its own.
+    share_reads: bool = False
 
 
 def config_from_ini() -> Optional[ConnectionConfig]:
@@ -45,8 +102,12 @@ def config_from_ini() -> Optional[ConnectionConfig]:
         port = int(parser["connection"].get("port", DEFAULT_PORT))
     except ValueError:
         assert False, "Port in ini file is not an integer"
+    transport = parser["connection"].get("transport", DEFAULT_TRANSPORT)
+    assert transport in TRANSPORTS, "Transport in ini file is not one of %s" % (
+        TRANSPORTS,
+    )
 
-    return ConnectionConfig(token, domain, port)
+    return ConnectionConfig(token, domain, port, transport)
 
 
 def config_from_ini_else_stdin() -> ConnectionConfig:
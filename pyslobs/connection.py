@@ -1,8 +1,8 @@
 import asyncio
-from collections import defaultdict
-import json
+from collections import OrderedDict, defaultdict, deque
 import logging
 import time
+from time import monotonic, perf_counter
 from typing import Any, Optional
 
 from websocket import (
@@ -11,7 +11,11 @@ from websocket import (
     WebSocketException,
 )
 
-from .config import ConnectionConfig, config_from_ini
+from . import wsframing
+from .config import ConnectionConfig, ReconnectPolicy, config_from_ini
+from .identitymap import IdentityMap
+from .jsoncodec import CODECS, JsonCodec, RequestEncoder, streamed_response
+from .metrics import ConnectionMetrics, encoded_size
 from .pubsubhub import PubSubHub, SubscriptionPreferences
 
 
@@ -23,6 +27,21 @@ class ProtocolError(Exception):
     pass
 
 
+class _BatchRejected(ProtocolError):
+    pass
+
+
+def _make_codec(connection_config: ConnectionConfig) -> JsonCodec:
+    codec = connection_config.codec
+    if isinstance(codec, JsonCodec):
+        return codec
+    try:
+        codec_class = CODECS[codec]
+    except KeyError:
+        raise ProtocolError("Unknown codec: %r" % codec)
+    return codec_class()
+
+
 class _SlobsWebSocket:
     """
     _SlobsWebSocket is a class internal to the API. It is not used by
@@ -39,12 +58,28 @@ class _SlobsWebSocket:
 
     logger = logging.getLogger("slobsapi._SlobsWebSocket")
 
+    asynchronous = False
+    # SlobsConnection runs the methods of synchronous websockets in an
+    # executor thread.
+
+    measure_frames = False
+    # If set, the size and decoding time of each received message are stored
+    # in last_frame_size and last_decode_seconds.
+    last_frame_size = 0
+    last_decode_seconds = 0.0
+
+    stream_ids = frozenset()
+    # Message ids whose list results are returned undecoded, as a
+    # StreamedResult (see SlobsConnection.command_stream).
+
     def __init__(self, connection_config: ConnectionConfig, on_close=None):
 
         self.url = (
             f"ws://{connection_config.domain}:{connection_config.port}/api/websocket"
         )
         self.token = connection_config.token
+        self.codec = _make_codec(connection_config)
+        self._request_encoder = RequestEncoder(self.codec)
         self._on_close = on_close
         try:
             self.socket = create_connection(self.url, timeout=20)
@@ -58,21 +93,48 @@ class _SlobsWebSocket:
         return bool(self.socket)
 
     def send_message(self, id_, method, params) -> None:
-        message_json = json.dumps(self._build_params_dict(id_, method, params))
-        self.logger.debug("Sending:  %s", message_json)
+        self.send_encoded(self.encode_message(id_, method, params))
+
+    def send_batch(self, requests) -> None:
+        """Send a JSON-RPC batch. requests is a list of (id_, method, params)."""
+        self.send_encoded(
+            self.codec.encode(
+                [self._build_params_dict(*request) for request in requests]
+            )
+        )
+
+    def encode_message(self, id_, method, params) -> str | bytes:
+        return self._request_encoder.encode(id_, method, params)
+
+    def send_encoded(self, message_json) -> None:
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("Sending:  %s", message_json)
         self.socket.send(message_json)
 
     def receive_message(self):
         while self.socket:
             try:
                 raw_message = self.socket.recv()
-                self.logger.debug("Received: %s", raw_message)
+                if self.logger.isEnabledFor(logging.DEBUG):
+                    self.logger.debug("Received: %s", raw_message)
                 if not raw_message:
                     break
                 else:
+                    if self.stream_ids:
+                        result = streamed_response(raw_message, self.stream_ids)
+                        if result is not None:
+                            self.last_frame_size = encoded_size(raw_message)
+                            self.last_decode_seconds = 0.0
+                            return result
                     try:
-                        result = json.loads(raw_message)
-                    except json.JSONDecodeError as json_error:
+                        if self.measure_frames:
+                            started = perf_counter()
+                            result = self.codec.decode(raw_message)
+                            self.last_decode_seconds = perf_counter() - started
+                            self.last_frame_size = encoded_size(raw_message)
+                        else:
+                            result = self.codec.decode(raw_message)
+                    except self.codec.decode_errors as json_error:
                         raise ProtocolError(
                             "%s from %s" % (json_error, raw_message))
                     except TypeError as type_error:
@@ -87,6 +149,7 @@ class _SlobsWebSocket:
                     self.close()
                 else:
                     self.logger.debug("Websocket closed. Shutting down")
+                    break
             except OSError as e:
                 if self.socket and self.socket.connected:
                     self.logger.warning(
@@ -95,6 +158,7 @@ class _SlobsWebSocket:
                     time.sleep(1)  # To prevent busy-loop
                 else:
                     self.logger.debug("Socket closed. Shutting down")
+                    break
 
         self.close()
         return None
@@ -131,6 +195,202 @@ class _SlobsWebSocket:
         return request
 
 
+class _AsyncSlobsWebSocket:
+    """
+    _AsyncSlobsWebSocket is a class internal to the API. It is not used by
+    a client.
+
+    It has the same responsibilities as _SlobsWebSocket, but speaks the
+    WebSocket protocol directly over asyncio streams, so no executor threads
+    are involved in sending or receiving.
+
+    Because connecting requires a running event loop, the connection is
+    made (and authenticated) lazily by the first send or receive. A
+    refused connection is therefore reported then, rather than on
+    construction.
+    """
+
+    logger = logging.getLogger("slobsapi._AsyncSlobsWebSocket")
+
+    asynchronous = True
+
+    measure_frames = False
+    last_frame_size = 0
+    last_decode_seconds = 0.0
+
+    stream_ids = frozenset()
+
+    def __init__(self, connection_config: ConnectionConfig, on_close=None):
+        self.domain = connection_config.domain
+        self.port = connection_config.port
+        self.token = connection_config.token
+        self.codec = _make_codec(connection_config)
+        self._request_encoder = RequestEncoder(self.codec)
+        self._on_close = on_close
+        self._reader = None
+        self._writer = None
+        self._message_reader = None
+        self._connect_lock = asyncio.Lock()
+        self._closed = False
+
+    def is_alive(self) -> bool:
+        return not self._closed
+
+    async def connect(self) -> None:
+        async with self._connect_lock:
+            if self._writer or self._closed:
+                return
+            try:
+                reader, writer = await asyncio.open_connection(self.domain, self.port)
+            except OSError as e:
+                self.close()
+                raise ProtocolError(
+                    "Couldn't connect. Is StreamLabs Desktop running? %s" % e
+                )
+            try:
+                await wsframing.client_handshake(
+                    reader, writer, self.domain, self.port, "/api/websocket"
+                )
+            except (wsframing.FramingError, OSError, asyncio.IncompleteReadError) as e:
+                writer.close()
+                self.close()
+                raise ProtocolError("WebSocket handshake failed: %s" % e)
+            self._reader = reader
+            self._writer = writer
+            self._message_reader = wsframing.MessageReader(reader)
+            await self._authenticate()
+
+    async def send_message(self, id_, method, params) -> None:
+        await self.send_encoded(self.encode_message(id_, method, params))
+
+    def encode_message(self, id_, method, params) -> str | bytes:
+        return self._request_encoder.encode(id_, method, params)
+
+    async def send_encoded(self, message_json) -> None:
+        if not self._writer:
+            await self.connect()
+        await self._send_frame(message_json)
+
+    async def send_batch(self, requests) -> None:
+        """Send a JSON-RPC batch. requests is a list of (id_, method, params)."""
+        if not self._writer:
+            await self.connect()
+        await self._send_json(
+            [_SlobsWebSocket._build_params_dict(*request) for request in requests]
+        )
+
+    async def _send_json(self, message) -> None:
+        await self._send_frame(self.codec.encode(message))
+
+    async def _send_frame(self, message_json) -> None:
+        if self._closed:
+            raise ProtocolError("SlobsConnection is closed.")
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("Sending:  %s", message_json)
+        if isinstance(message_json, str):
+            message_json = message_json.encode("utf-8")
+        self._writer.write(
+            wsframing.encode_frame(wsframing.OPCODE_TEXT, message_json, mask=True)
+        )
+        await self._writer.drain()
+
+    async def receive_message(self):
+        if not self._writer:
+            try:
+                await self.connect()
+            except ProtocolError as e:
+                self.logger.warning("Websocket failure: (%s). Shutting down.", e)
+                return None
+        return await self._receive_json()
+
+    async def _receive_json(self):
+        while not self._closed:
+            try:
+                opcode, payload = await self._message_reader.read()
+            except (asyncio.IncompleteReadError, ConnectionError) as e:
+                if not self._closed:
+                    self.logger.debug("Socket closed (%s). Shutting down", e)
+                break
+            except wsframing.FramingError as e:
+                self.logger.warning("Websocket failure: (%s). Shutting down.", e)
+                break
+
+            if opcode == wsframing.OPCODE_PING:
+                self._writer.write(
+                    wsframing.encode_frame(wsframing.OPCODE_PONG, payload, mask=True)
+                )
+                continue
+            if opcode == wsframing.OPCODE_PONG:
+                continue
+            if opcode == wsframing.OPCODE_CLOSE:
+                self.logger.debug("Websocket closed. Shutting down")
+                break
+
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug("Received: %s", payload)
+            if self.stream_ids:
+                result = streamed_response(payload, self.stream_ids)
+                if result is not None:
+                    self.last_frame_size = len(payload)
+                    self.last_decode_seconds = 0.0
+                    return result
+            try:
+                if self.measure_frames:
+                    started = perf_counter()
+                    result = self.codec.decode(payload)
+                    self.last_decode_seconds = perf_counter() - started
+                    self.last_frame_size = len(payload)
+                    return result
+                return self.codec.decode(payload)
+            except self.codec.decode_errors as json_error:
+                raise ProtocolError("%s from %s" % (json_error, payload))
+            except (TypeError, UnicodeDecodeError) as type_error:
+                raise ProtocolError(type_error)
+
+        self.close()
+        return None
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        if self._writer:
+            try:
+                self._writer.write(
+                    wsframing.encode_frame(wsframing.OPCODE_CLOSE, b"", mask=True)
+                )
+            except (OSError, RuntimeError):
+                pass  # Already gone, or the loop has shut down.
+            self._writer.close()
+            self._writer = None
+        if self._on_close:
+            self._on_close()
+
+    async def _authenticate(self) -> None:
+        message_id = "auth_request"
+        await self._send_json(
+            _SlobsWebSocket._build_params_dict(
+                message_id,
+                "auth",
+                dict(resource="TcpServerService", args=[self.token]),
+            )
+        )
+        response = await self._receive_json()
+
+        if response is None:
+            raise ProtocolError("Connection closed during authentication.")
+        if response["id"] != message_id:
+            raise ProtocolError("Response id mismatch: %s" % response)
+        if "result" not in response or response["result"] is not True:
+            raise AuthenticationFailure("%s" % response)
+
+
+_TRANSPORTS = {
+    "thread": _SlobsWebSocket,
+    "asyncio": _AsyncSlobsWebSocket,
+}
+
+
 # noinspection PyBroadException
 class SlobsConnection:
     """
@@ -153,6 +413,11 @@ class SlobsConnection:
             - an unexpected exception is caught
         The exact reason is logged.
 
+        If the connection_config has a ReconnectPolicy, a socket closed by
+        the remote end (or a network failure) is instead followed by attempts
+        to reconnect. After reconnecting, the server subscriptions are
+        re-issued, so existing subscribers keep receiving events.
+
         The close() method will close the socket, triggering
         background_processing to clean up.
 
@@ -163,13 +428,59 @@ class SlobsConnection:
 
     logger = logging.getLogger("slobsapi.SlobsConnection")
 
+    MAX_ABANDONED = 1000
+    # Number of abandoned commands remembered, to recognise late responses.
+
     TIMEOUT: float | None = 5
     # Number of seconds a command has to get a response before raising a
     # Timeout exception.
     # Keeping the value low makes the system more responsive to failed
     # connections. In practice, 5 seconds in plenty, but there are edge cases
     # (e.g. hundreds of scenes) where StreamLabs does take longer, and this
-    # needs to be increased.
+    # needs to be increased, or a per-method ConnectionConfig.timeout_policy
+    # used instead.
+
+    IDEMPOTENT_METHODS = frozenset(
+        {
+            "activeCollection",
+            "activeScene",
+            "activeSceneId",
+            "collections",
+            "getAll",
+            "getAvailableSourcesTypesList",
+            "getFolder",
+            "getFolders",
+            "getItem",
+            "getItems",
+            "getModel",
+            "getNestedItems",
+            "getNestedNodes",
+            "getNestedScenes",
+            "getNestedSources",
+            "getNode",
+            "getNodeByName",
+            "getNodes",
+            "getNotification",
+            "getParent",
+            "getPath",
+            "getPropertiesFormData",
+            "getRead",
+            "getRootNodes",
+            "getScene",
+            "getScenes",
+            "getSettings",
+            "getSource",
+            "getSources",
+            "getSourcesByName",
+            "getSourcesForCurrentScene",
+            "getSourcesForScene",
+            "getUnread",
+            "getVisualItems",
+        }
+    )
+    # Reads with no side effects. With ConnectionConfig.share_reads, identical
+    # commands to these methods (same resource and args) issued while one is
+    # in flight share its request and its result.
 
     def __init__(self, connection_config: Optional[ConnectionConfig] = None):
 
@@ -177,7 +488,37 @@ class SlobsConnection:
         if not connection_config:
             raise ProtocolError("Connection not configured.")
 
-        self.websocket = _SlobsWebSocket(connection_config, on_close=None)
+        try:
+            transport = _TRANSPORTS[connection_config.transport]
+        except KeyError:
+            raise ProtocolError(
+                "Unknown transport: %r" % connection_config.transport
+            )
+        self._connection_config = connection_config
+        self._transport = transport
+        self.websocket = transport(connection_config, on_close=None)
+
+        self.metrics: Optional[ConnectionMetrics] = (
+            ConnectionMetrics() if connection_config.metrics else None
+        )
+        self.websocket.measure_frames = self.metrics is not None
+        self._streamed_ids: set[int] = set()
+        # Message ids of the commands sent by command_stream(), awaiting their
+        # response. Shared with the websocket, which leaves their results
+        # undecoded.
+        self.websocket.stream_ids = self._streamed_ids
+        self._frame_share = (0, 0.0)
+        # Size and decoding time of the message being dispatched, divided
+        # between the responses it contains.
+
+        self.timeout_policy = connection_config.timeout_policy
+
+        self.identity_map: Optional[IdentityMap] = (
+            IdentityMap() if connection_config.identity_map else None
+        )
+        self.compact_transforms = connection_config.compact_transforms
+        self.compact_mode = connection_config.compact_mode
+        self.share_reads = connection_config.share_reads
 
         self._response_listeners = dict()
         self._event_listeners = defaultdict(lambda: set())
@@ -185,6 +526,66 @@ class SlobsConnection:
         self._undelivered_events = dict()
         self.hub = PubSubHub()
 
+        self._in_flight: dict[int, asyncio.Future] = dict()
+        # Map from message_id -> future awaiting the response to that command.
+        self._abandoned: OrderedDict[Any, tuple[str, float]] = OrderedDict()
+        # Map from message_id (or promise resourceId) of a command that timed
+        # out or was cancelled -> (method, when it was abandoned). Oldest first.
+        # A response that arrives for one is reported as late, not published.
+        self._promises: dict[str, asyncio.Future] = dict()
+        # Map from resourceId of a PROMISE -> future of the command awaiting it.
+
+        self.max_in_flight = connection_config.max_in_flight
+        self._window = (
+            asyncio.BoundedSemaphore(self.max_in_flight) if self.max_in_flight else None
+        )
+        self._resource_locks: dict[Any, list] = dict()
+        # Map from resource -> [lock, number of commands using it].
+        # Only used with a window, to stop commands to the same resource
+        # overtaking each other while queued for a slot.
+        self._queued = 0
+
+        self._flights: dict[tuple, list] = dict()
+        # Map from (method, resource, args, compactMode) of an idempotent
+        # command in flight -> [task sending it, number of callers awaiting it].
+        self.commands_shared = 0
+        # Commands answered by another identical command's request.
+
+        self.batch_supported: Optional[bool] = None
+        # Whether the server accepts JSON-RPC batches. None until the first
+        # command_batch() finds out. Set to False to always pipeline instead.
+        self._unanswered_batches = deque()
+        # Message ids of batches sent, oldest first, awaiting their response.
+
+        self.reconnect_policy: Optional[ReconnectPolicy] = connection_config.reconnect
+        self._closing = asyncio.Event()  # Set when close() is called.
+        self._connected = asyncio.Event()  # Clear while reconnecting.
+        self._connected.set()
+        self._server_subscriptions: dict[Any, tuple[str, Any]] = dict()
+        # Map from resource_id -> (method, params) of the command that
+        # subscribed to it; replayed after reconnecting.
+        self._subscribed_events: dict[tuple[str, str], Any] = dict()
+        # Map from (resource, method) -> resource_id, for the subscriptions
+        # that later subscribers to the same event can share.
+        self._pending_subscriptions: dict[tuple[str, str], asyncio.Future] = dict()
+        # Map from (resource, method) -> future resource_id, while the first
+        # subscriber awaits the server's response.
+        self._subscription_counts: dict[Any, int] = dict()
+        # Map from resource_id -> number of local subscriptions to it. The
+        # server is told to unsubscribe when it falls to zero.
+        self._current_resource_ids: dict[Any, Any] = dict()
+        self._original_resource_ids: dict[Any, Any] = dict()
+        # Maps between the resource_ids returned by the first subscription
+        # (which the hub and clients know) and those returned after a
+        # reconnection, when they differ.
+        self._in_flight_requests: Optional[dict[int, tuple]] = (
+            dict() if self.reconnect_policy and self.reconnect_policy.retry_in_flight
+            else None
+        )
+        # Map from message_id -> (method, params, future), to resend after
+        # reconnecting. Only kept if the policy retries in-flight commands.
+        self._restore_task = None
+
     async def __aenter__(self):
         return self
 
@@ -195,30 +596,87 @@ class SlobsConnection:
     def is_alive(self):
         return bool(self.websocket) and self.websocket.is_alive()
 
-    async def _send(self, method, params):
+    @property
+    def queue_depth(self) -> int:
+        """Number of commands waiting for a slot in the in-flight window."""
+        return self._queued
+
+    @property
+    def in_flight(self) -> int:
+        """Number of commands sent and awaiting their response."""
+        return len(self._in_flight) + len(self._promises)
+
+    async def _send(self, message_id, method, params, call=None):
         """
-        Send message (in separate thread, so blocking doesn't hold up other
-        coroutines) and wait for it to be sent.
-        Returns the message_id used.
+        Send message and wait for it to be sent.
+        Synchronous websockets are driven from a separate thread, so blocking
+        doesn't hold up other coroutines.
+        If call is provided, the encoding and sending are measured.
         """
         if not self.is_alive():
+            await self._await_reconnection()
+        if call is not None:
+            await self._measured_send(message_id, method, params, call)
+        elif self.websocket.asynchronous:
+            await self.websocket.send_message(message_id, method, params)
+        else:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(
+                None,
+                lambda: self.websocket.send_message(message_id, method, params),
+            )
+
+    async def _measured_send(self, message_id, method, params, call):
+        websocket = self.websocket
+        encode_started = perf_counter()
+        message_json = websocket.encode_message(message_id, method, params)
+        encoded_at = perf_counter()
+        if websocket.asynchronous:
+            await websocket.send_encoded(message_json)
+        else:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(
+                None, lambda: websocket.send_encoded(message_json)
+            )
+        self.metrics.sent(
+            call, encode_started, encoded_at, perf_counter(), encoded_size(message_json)
+        )
+
+    async def _send_batch(self, requests):
+        """
+        Send a list of (message_id, method, params) as a single JSON-RPC batch.
+        """
+        if not self.is_alive():
+            await self._await_reconnection()
+        message_ids = [request[0] for request in requests]
+        self._unanswered_batches.append(message_ids)
+        if self.websocket.asynchronous:
+            await self.websocket.send_batch(requests)
+        else:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(
+                None, lambda: self.websocket.send_batch(requests)
+            )
+
+    async def _await_reconnection(self):
+        if self._connected.is_set() or self._closing.is_set():
             raise ProtocolError(
                 # Unexpected? Check the debug log for what triggered the closure.
                 "SlobsConnection is closed."
             )
-        message_id = _message_id_factory.next()
-        loop = asyncio.get_running_loop()
-        await loop.run_in_executor(
-            None,
-            lambda: self.websocket.send_message(message_id, method, params),
-        )
-        return message_id
+        # Reconnecting. Only wait for TIMEOUT seconds, else raise TimeoutError
+        await asyncio.wait_for(self._connected.wait(), timeout=self.TIMEOUT)
+        if not self.is_alive():
+            raise ProtocolError("SlobsConnection is closed.")
 
     async def _receive_message(self):
         """
-        Wait for received message (in separate thread).
+        Wait for received message (in separate thread, if the websocket is
+        synchronous).
         """
         if self.websocket:
+            if self.websocket.asynchronous:
+                return await self.websocket.receive_message()
             loop = asyncio.get_running_loop()
             return await loop.run_in_executor(None,
                                               self.websocket.receive_message)
@@ -232,31 +690,10 @@ class SlobsConnection:
         This needs to be awaited to keep messages pumping.
         """
         try:
-            while self.websocket and self.websocket.is_alive():
-                try:
-                    message = await self._receive_message()
-
-                    if message:
-                        if "id" in message and message["id"] is not None:
-                            # This is a response to an explicit request.
-                            key = message["id"]
-                            await self.hub.publish(key=key, message=message)
-                        elif "result" in message:
-                            # This is a response to a subscription.
-                            key = message["result"]["resourceId"]
-                            data = message["result"].get("data", None)
-                            await self.hub.publish(key=key, message=data)
-                        else:
-                            raise ProtocolError(
-                                "Message from StreamLabs Desktop should "
-                                "include `id` or `result`: %r",
-                                message,
-                            )
-                except AttributeError:
-                    if not self.hub:
-                        # Connection was closed mid-receive.
-                        break
-                    raise
+            while True:
+                await self._receive_until_closed()
+                if not await self._reconnect():
+                    break
             self.logger.debug(
                 "_receive_and_dispatch terminating because socket was closed"
             )
@@ -268,88 +705,514 @@ class SlobsConnection:
 
         self.logger.debug("_receive_and_dispatch terminated cleanly.")
 
+    async def _receive_until_closed(self):
+        while self.websocket and self.websocket.is_alive():
+            try:
+                websocket = self.websocket
+                message = await self._receive_message()
+
+                if self.metrics is not None and message:
+                    self._measure_frame(websocket, message)
+
+                if isinstance(message, list):
+                    # This is the response to a batch.
+                    self._batch_answered(message)
+                    for submessage in message:
+                        await self._dispatch(submessage)
+                elif message:
+                    await self._dispatch(message)
+            except AttributeError:
+                if not self.hub or not self.websocket:
+                    # Connection was closed mid-receive.
+                    break
+                raise
+
+    def _measure_frame(self, websocket, message) -> None:
+        size = websocket.last_frame_size
+        self.metrics.frame_received(size)
+        responses = len(message) if isinstance(message, list) else 1
+        self._frame_share = (size // responses, websocket.last_decode_seconds / responses)
+
+    async def _reconnect(self) -> bool:
+        """
+        If the policy allows, replace a websocket that dropped.
+        Returns whether a new websocket is open.
+        """
+        policy = self.reconnect_policy
+        if not policy or self._closing.is_set():
+            return False
+
+        self._connected.clear()
+        self.websocket = None
+        self._unanswered_batches.clear()
+        self._abandon_in_flight()
+
+        delay = policy.initial_delay
+        attempts = 0
+        while True:
+            self.logger.info("Connection lost. Reconnecting in %s seconds.", delay)
+            try:
+                await asyncio.wait_for(self._closing.wait(), timeout=delay)
+                return False  # close() was called while waiting.
+            except asyncio.TimeoutError:
+                pass
+            attempts += 1
+            try:
+                websocket = await self._open_websocket()
+                break
+            except AuthenticationFailure:
+                self.logger.exception("Reconnection refused. Giving up.")
+                return False
+            except (ProtocolError, OSError, WebSocketException) as e:
+                self.logger.warning("Reconnection attempt %s failed: %s", attempts, e)
+                if policy.max_attempts and attempts >= policy.max_attempts:
+                    return False
+                delay = min(delay * policy.multiplier, policy.max_delay)
+
+        if self._closing.is_set():
+            websocket.close()
+            return False
+        self.websocket = websocket
+        self._connected.set()
+        self.logger.info("Reconnected.")
+
+        # Needs the receive loop running to get the responses.
+        self._restore_task = asyncio.ensure_future(self._restore_after_reconnection())
+        return True
+
+    async def _open_websocket(self):
+        if not self._transport.asynchronous:
+            loop = asyncio.get_running_loop()
+            websocket = await loop.run_in_executor(
+                None, lambda: self._transport(self._connection_config, on_close=None)
+            )
+            websocket.measure_frames = self.metrics is not None
+            websocket.stream_ids = self._streamed_ids
+            return websocket
+        websocket = self._transport(self._connection_config, on_close=None)
+        websocket.measure_frames = self.metrics is not None
+        websocket.stream_ids = self._streamed_ids
+        await websocket.connect()
+        if not websocket.is_alive():
+            raise ProtocolError("Connection closed while connecting.")
+        return websocket
+
+    def _abandon_in_flight(self) -> None:
+        """
+        Deal with commands awaiting a response from a dropped connection.
+        Those to be retried stay registered until reconnection.
+        """
+        if self._in_flight_requests is not None:
+            retried = {
+                future for (_, _, future) in self._in_flight_requests.values()
+            }
+        else:
+            retried = set()
+        pending = list(self._in_flight.values()) + list(self._promises.values())
+        self._in_flight.clear()
+        self._promises.clear()
+        self._abandoned.clear()  # Their responses can't arrive now.
+        for future in pending:
+            if future not in retried and not future.done():
+                future.set_exception(ProtocolError("Connection lost."))
+
+    async def _restore_after_reconnection(self) -> None:
+        for resource_id, (method, params) in list(self._server_subscriptions.items()):
+            try:
+                response = await self.command(method, params)
+                new_resource_id = response["resourceId"]
+            except Exception:
+                self.logger.exception(
+                    "Failed to restore subscription to %s(%s)", method, params
+                )
+                continue
+            old_resource_id = self._current_resource_ids.pop(resource_id, resource_id)
+            self._original_resource_ids.pop(old_resource_id, None)
+            if new_resource_id != resource_id:
+                self._current_resource_ids[resource_id] = new_resource_id
+                self._original_resource_ids[new_resource_id] = resource_id
+
+        if self._in_flight_requests:
+            for message_id, (method, params, future) in list(
+                self._in_flight_requests.items()
+            ):
+                if future.done():
+                    continue
+                self.logger.debug("Retrying %s(%s)", method, params)
+                self._in_flight[message_id] = future
+                try:
+                    await self._send(message_id, method, params)
+                except Exception as e:
+                    self._in_flight.pop(message_id, None)
+                    if not future.done():
+                        future.set_exception(e)
+
     # Give a nicer name for clients that don't need the details.
     background_processing = _receive_and_dispatch
 
+    async def _dispatch(self, message):
+        message_id = message.get("id")
+        if message_id is not None:
+            # This is a response to an explicit request.
+            future = self._in_flight.pop(message_id, None)
+            if future is not None:
+                if self.metrics is not None:
+                    self.metrics.response_received(future, *self._frame_share)
+                self._resolve_response(future, message)
+            elif message_id in self._abandoned:
+                self._late_message(message_id, message)
+            else:
+                # Not awaited. Let the hub deal with it.
+                await self.hub.publish(key=message_id, message=message)
+        elif "result" in message:
+            # This is a response to a subscription.
+            key = message["result"]["resourceId"]
+            data = message["result"].get("data", None)
+            if self._original_resource_ids:
+                key = self._original_resource_ids.get(key, key)
+            future = self._promises.pop(key, None)
+            if future is not None:
+                # A promise returned by an earlier command has been fulfilled.
+                if self.metrics is not None:
+                    self.metrics.response_received(future, *self._frame_share)
+                if not future.done():
+                    future.set_result(data)
+            elif key in self._abandoned:
+                self._late_message(key, data)
+            else:
+                await self.hub.publish(key=key, message=data)
+        elif "error" in message and self._unanswered_batches:
+            # Servers that don't support batches reply to the whole batch
+            # with a single error, without an id.
+            self.logger.debug("Batch rejected: %s", message)
+            for message_id in self._unanswered_batches.popleft():
+                future = self._in_flight.pop(message_id, None)
+                if future is not None and not future.done():
+                    future.set_exception(
+                        _BatchRejected("Server does not support batches.")
+                    )
+        else:
+            raise ProtocolError(
+                "Message from StreamLabs Desktop should "
+                "include `id` or `result`: %r",
+                message,
+            )
+
+    def _abandon(self, key, method) -> None:
+        self._abandoned[key] = (method, monotonic())
+        if len(self._abandoned) > self.MAX_ABANDONED:
+            self._abandoned.popitem(last=False)
+
+    def _late_message(self, key, message) -> None:
+        method, abandoned_at = self._abandoned.pop(key)
+        result = message.get("result") if isinstance(message, dict) else None
+        if isinstance(result, dict) and result.get("emitter") == "PROMISE":
+            # Its fulfilment will be late too.
+            self._abandon(result["resourceId"], method)
+        self.hub.late_message(
+            key, message, method=method, seconds_late=monotonic() - abandoned_at
+        )
+
+    def _resolve_response(self, future, response) -> None:
+        if future.done():
+            # Timed out or cancelled while the response was on its way.
+            return
+
+        if "error" in response:
+            future.set_exception(ProtocolError(response["error"]))
+            return
+
+        if "result" not in response:
+            future.set_exception(ProtocolError("No result found: %s" % response))
+            return
+
+        result = response["result"] or {}
+
+        if isinstance(result, dict) and result.get("emitter", "NA") == "PROMISE":
+            # Server is informing that the result may be some time.
+            # It will come as an event.
+            self._promises[result["resourceId"]] = future
+        else:
+            future.set_result(result)
+
+    def _batch_answered(self, responses):
+        answered_ids = {
+            response.get("id") for response in responses if isinstance(response, dict)
+        }
+        for message_ids in self._unanswered_batches:
+            if answered_ids.intersection(message_ids):
+                self._unanswered_batches.remove(message_ids)
+                return
+
+    def _register_command(self):
+        """
+        Allocate a message id, and the future its response will be delivered
+        to. Registered before sending, so the response can't beat it.
+        """
+        message_id = _message_id_factory.next()
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[message_id] = future
+        return message_id, future
+
     async def command(self, method, params):
         """
         Send a command that expects a response.
         Wait for result. If the result returns a promise, wait for the promise.
         """
-        self.logger.debug("Command being sent: %s(%s)", method, params)
-        message_id = await self._send(method, params)
-        final_response_queue = asyncio.Queue()  # Callback will push the response here.
+        if self.share_reads and method in self.IDEMPOTENT_METHODS:
+            key = _flight_key(method, params)
+            if key is not None:
+                return await self._shared_command(key, method, params)
+        return await self._command(method, params)
 
-        async def callback(key, value):
-            try:
-                await self._command_accept_result_of_promise(
-                    key, value, final_response_queue
+    async def _shared_command(self, key, method, params):
+        """
+        Await the result of the identical command in flight, else send one
+        that later identical commands can share. The request is only
+        cancelled if every caller awaiting it is.
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            task = asyncio.ensure_future(self._command(method, params))
+            flight = self._flights[key] = [task, 0]
+
+            def land(_):
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+
+            task.add_done_callback(land)
+        else:
+            self.commands_shared += 1
+            if self.metrics is not None:
+                self.metrics.shared(method)
+        task = flight[0]
+        flight[1] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.done() and flight[1] == 1:
+                task.cancel()
+            raise
+        finally:
+            flight[1] -= 1
+
+    async def _command(self, method, params):
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("Command being sent: %s(%s)", method, params)
+        if self.metrics is not None:
+            return await self._measured_command(method, params)
+        if self._window is not None:
+            return await self._windowed_command(method, params)
+        message_id, future = await self._register_and_send(method, params)
+        return await self._await_response(message_id, future, method)
+
+    async def _measured_command(self, method, params):
+        call = self.metrics.start_call(method)
+        outcome = "error"
+        try:
+            if self._window is not None:
+                result = await self._windowed_command(method, params, call)
+            else:
+                message_id, future = await self._register_and_send(
+                    method, params, call
                 )
-            except Exception:
-                self.logger.exception("command.callback has failed!")
+                result = await self._await_response(message_id, future, method)
+            outcome = "ok"
+            return result
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+            raise
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        finally:
+            self.metrics.finish(call, outcome)
 
-        assert asyncio.iscoroutinefunction(callback)
-        await self.hub.subscribe(key=message_id, callback_coroutine=callback)
+    async def _windowed_command(self, method, params, call=None):
+        """
+        Send a command once there is a free slot in the in-flight window.
+        Commands to the same resource are sent in the order they were issued.
+        """
+        resource = params.get("resource") if isinstance(params, dict) else None
+        entry = self._resource_locks.get(resource)
+        if entry is None:
+            entry = self._resource_locks[resource] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        self._queued += 1
+        queued = True
         try:
-            # Only wait for TIMEOUT seconds, else raise TimeoutError
-            response = await asyncio.wait_for(
-                final_response_queue.get(), timeout=self.TIMEOUT)
+            async with entry[0]:
+                await self._window.acquire()
+                self._queued -= 1
+                queued = False
+                try:
+                    message_id, future = await self._register_and_send(
+                        method, params, call
+                    )
+                except BaseException:
+                    self._window.release()
+                    raise
         finally:
-            if self.hub:
-                await self.hub.unsubscribe(key=message_id,
-                                           callback_coroutine=callback)
+            if queued:
+                self._queued -= 1
+            entry[1] -= 1
+            if not entry[1]:
+                del self._resource_locks[resource]
+        try:
+            return await self._await_response(message_id, future, method)
+        finally:
+            self._window.release()
+
+    async def _register_and_send(self, method, params, call=None, stream=False):
+        message_id, future = self._register_command()
+        if stream:
+            self._streamed_ids.add(message_id)
+        if self._in_flight_requests is not None:
+            self._in_flight_requests[message_id] = (method, params, future)
+        if call is not None:
+            self.metrics.track(future, call)
+        try:
+            await self._send(message_id, method, params, call)
+        except BaseException:
+            self._in_flight.pop(message_id, None)
+            self._streamed_ids.discard(message_id)
+            if self._in_flight_requests is not None:
+                self._in_flight_requests.pop(message_id, None)
+            raise
+        return message_id, future
 
-        if isinstance(response, Exception):
-            raise response
-        else:
-            return response
+    async def command_batch(self, calls):
+        """
+        Send several commands, each expecting a response, as one JSON-RPC 2.0
+        batch. calls is a list of (method, params) pairs.
 
-    async def _command_accept_result_of_promise(self, _, response, queue):
-        try:
-            if "error" in response:
-                await queue.put(ProtocolError(response["error"]))
-                return
+        Returns a list with one entry per call, in order. Promises are waited
+        for individually. A call that failed has its exception (ProtocolError
+        or asyncio.TimeoutError) as its entry, rather than raising, so one
+        failure doesn't lose the other results.
 
-            if "result" not in response:
-                await queue.put(ProtocolError("No result found: %s" % response))
-                return
+        If the server rejects batches, this (and later calls) fall back to
+        sending the commands as single frames, back to back, without waiting
+        for each response before sending the next.
 
-            result = response["result"] or {}
+        Batches are not subject to the max_in_flight window.
+        """
+        calls = list(calls)
+        if not calls:
+            return []
+        if self.batch_supported is not False:
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug("Batch being sent: %s", calls)
+            registrations = [self._register_command() for _ in calls]
+            message_ids = [message_id for message_id, _ in registrations]
+            try:
+                await self._send_batch(
+                    [
+                        (message_id, method, params)
+                        for message_id, (method, params) in zip(message_ids, calls)
+                    ]
+                )
+            except BaseException:
+                for message_id in message_ids:
+                    self._in_flight.pop(message_id, None)
+                raise
+            results = await self._await_responses(registrations, calls)
+            if message_ids in self._unanswered_batches:
+                # Never answered; don't blame the next rejection on it.
+                self._unanswered_batches.remove(message_ids)
+            if not all(isinstance(result, _BatchRejected) for result in results):
+                self.batch_supported = True
+                return results
+            self.logger.info("Server rejected a batch. Falling back to pipelining.")
+            self.batch_supported = False
+
+        registrations = []
+        try:
+            for method, params in calls:
+                message_id, future = self._register_command()
+                registrations.append((message_id, future))
+                await self._send(message_id, method, params)
+        except BaseException:
+            for message_id, _ in registrations:
+                self._in_flight.pop(message_id, None)
+            raise
+        return await self._await_responses(registrations, calls)
 
-            if isinstance(result, dict) and result.get("emitter",
-                                                       "NA") == "PROMISE":
-                # Server is informing that the result may be some time.
-                # It will come as an event.
-                key = result["resourceId"]
-                response_as_event_queue = asyncio.Queue()
+    STREAM_CHUNK = 100
+    # command_stream() lets other tasks run after every STREAM_CHUNK entries.
 
-                async def callback(k, v):
-                    try:
-                        await self._command_accept_event_as_response(
-                            k, v, response_as_event_queue
-                        )
-                    except Exception:
-                        self.logger.exception(
-                            "_command_accept_result_of_promise.callback has failed!"
-                        )
-
-                await self.hub.subscribe(key, callback)
-                response = await response_as_event_queue.get()
-                await self.hub.unsubscribe(key, callback)
-                await queue.put(response)
-            else:
-                await queue.put(result)
-        except Exception:
-            self.logger.exception(
-                "_command_accept_result_of_promise has failed!")
+    async def command_stream(self, method, params):
+        """
+        Send a command whose result is a list, and yield its entries one at
+        a time.
+
+        The response is not decoded as a whole when it arrives: each entry is
+        decoded only when it is reached, with the standard library's json
+        (whichever codec is configured). So the first entry is available
+        sooner, and the entries already handled can be freed while the rest
+        are decoded. Results that are promises (e.g. of
+        fetchSceneCollectionsSchema) arrive as events, and are decoded as
+        usual before being yielded.
+
+        Like batches, streamed commands are not subject to the max_in_flight
+        window, nor counted in the metrics.
+        """
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("Streamed command being sent: %s(%s)", method, params)
+        message_id, future = await self._register_and_send(method, params, stream=True)
+        try:
+            result = await self._await_response(message_id, future, method)
+        finally:
+            self._streamed_ids.discard(message_id)
+        try:
+            for index, entry in enumerate(result, 1):
+                yield entry
+                if not index % self.STREAM_CHUNK:
+                    await asyncio.sleep(0)
+        except ValueError as e:
+            raise ProtocolError("%s in the result of %s" % (e, method))
+
+    async def _await_responses(self, registrations, calls):
+        return await asyncio.gather(
+            *(
+                self._await_response(message_id, future, method)
+                for (message_id, future), (method, _) in zip(registrations, calls)
+            ),
+            return_exceptions=True,
+        )
 
-    async def _command_accept_event_as_response(self, _, response,
-                                                queue) -> None:
+    async def _await_response(self, message_id, future, method):
+        policy = self.timeout_policy
         try:
-            await queue.put(response)
-        except Exception:
-            self.logger.exception(
-                "_command_accept_event_as_response has failed!")
+            if policy is None:
+                # Only wait for TIMEOUT seconds, else raise TimeoutError
+                return await asyncio.wait_for(future, timeout=self.TIMEOUT)
+            timeout = policy.timeout(method)
+            started = perf_counter()
+            try:
+                result = await asyncio.wait_for(future, timeout=timeout)
+            except asyncio.TimeoutError:
+                policy.observe(method, timeout)
+                raise
+            policy.observe(method, perf_counter() - started)
+            return result
+        except BaseException:
+            if self._promises:
+                self._forget_promise(future, method)
+            raise
+        finally:
+            if self._in_flight.pop(message_id, None) is not None:
+                # Gave up waiting. Any response that arrives now is late.
+                self._abandon(message_id, method)
+            if self._in_flight_requests is not None:
+                self._in_flight_requests.pop(message_id, None)
+
+    def _forget_promise(self, future, method) -> None:
+        for key, promised in self._promises.items():
+            if promised is future:
+                del self._promises[key]
+                self._abandon(key, method)
+                return
 
     async def subscribe(
             self,
@@ -363,20 +1226,32 @@ class SlobsConnection:
         Wait for result. The result should include resource_id.
         Return the resource_id, and continue to have callback_coroutine called as the
         events trigger.
+
+        Subscriptions to the same event (resource and method, without args) share
+        one subscription on the server: only the first sends a command, and
+        unsubscribe() only tells the server when the last one ends.
         """
 
-        # Command may be unnecessary if there is already a subscription, but we don't
-        # know the resource_id here until we ask.
-        response = await self.command(method, params)
-        if response.get("_type") != "SUBSCRIPTION":
-            raise ProtocolError(
-                "Badly formed subscription response: %s" % response)
-        try:
-            resource_id = response["resourceId"]
-        except KeyError:
-            raise ProtocolError(
-                "Badly formed subscription response: %s" % response)
+        event = self._event_key(method, params)
+        while True:
+            resource_id = self._subscribed_events.get(event)
+            if resource_id is not None:
+                break
+            pending = self._pending_subscriptions.get(event)
+            if pending is None:
+                resource_id = await self._subscribe_on_server(method, params, event)
+                break
+            # Someone else is asking. If they fail, so do we. If they are
+            # cancelled, or the result is unsubscribed before we look, ask again.
+            try:
+                await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
 
+        self._subscription_counts[resource_id] = (
+            self._subscription_counts.get(resource_id, 0) + 1
+        )
         if not self.hub:
             raise ProtocolError("Connection already closed.")
         await self.hub.subscribe(
@@ -386,6 +1261,48 @@ class SlobsConnection:
         )
         return resource_id
 
+    @staticmethod
+    def _event_key(method, params) -> Optional[tuple[str, str]]:
+        """The registry key of a subscription that can be shared, else None."""
+        if params.get("args"):
+            return None
+        return params.get("resource"), method
+
+    async def _subscribe_on_server(self, method, params, event) -> Any:
+        pending = None
+        if event is not None:
+            pending = self._pending_subscriptions[event] = (
+                asyncio.get_running_loop().create_future()
+            )
+        try:
+            response = await self.command(method, params)
+            if response.get("_type") != "SUBSCRIPTION":
+                raise ProtocolError(
+                    "Badly formed subscription response: %s" % response)
+            try:
+                resource_id = response["resourceId"]
+            except KeyError:
+                raise ProtocolError(
+                    "Badly formed subscription response: %s" % response)
+        except asyncio.CancelledError:
+            if pending is not None:
+                pending.cancel()
+            raise
+        except Exception as e:
+            if pending is not None:
+                pending.set_exception(e)
+                pending.exception()  # Retrieved, in case no-one else was waiting.
+            raise
+        finally:
+            if event is not None:
+                del self._pending_subscriptions[event]
+
+        self._server_subscriptions[resource_id] = (method, params)
+        if event is not None:
+            self._subscribed_events[event] = resource_id
+            pending.set_result(resource_id)
+        return resource_id
+
     async def unsubscribe(self, resource_id, callback_coroutine) -> None:
         """
         Send a command that unsubscribes to events (resource should be provided
@@ -399,9 +1316,21 @@ class SlobsConnection:
             key=resource_id, callback_coroutine=callback_coroutine
         )
         # Only tell server if no-one else is interested.
-        if not self.hub.has_subscribers(resource_id):
+        count = self._subscription_counts.pop(resource_id, 0) - 1
+        if count > 0:
+            self._subscription_counts[resource_id] = count
+        else:
+            method, params = self._server_subscriptions.pop(resource_id, (None, None))
+            if method is not None:
+                event = self._event_key(method, params)
+                if self._subscribed_events.get(event) == resource_id:
+                    del self._subscribed_events[event]
+            server_resource_id = self._current_resource_ids.pop(
+                resource_id, resource_id
+            )
+            self._original_resource_ids.pop(server_resource_id, None)
             response = await self.command("unsubscribe",
-                                          {"resource": resource_id})
+                                          {"resource": server_resource_id})
             if not response:
                 raise ProtocolError("Unsubscribe failed.")
 
@@ -415,14 +1344,48 @@ class SlobsConnection:
             await self.hub.close()
             self.hub = None
 
+        # No responses are coming. Don't leave commands waiting for a timeout.
+        pending = list(self._in_flight.values()) + list(self._promises.values())
+        if self._in_flight_requests:
+            pending.extend(future for (_, _, future) in self._in_flight_requests.values())
+            self._in_flight_requests.clear()
+        self._in_flight.clear()
+        self._promises.clear()
+        for future in pending:
+            if not future.done():
+                future.set_exception(ProtocolError("SlobsConnection is closed."))
+        self._connected.set()  # Wake anyone waiting for a reconnection.
+
     def close(self):
         self.logger.debug("Request to close SlobsConnection.")
+        self._closing.set()
         if self.websocket:
             # This will trigger the _receive_and_dispatch thread to clean up.
             self.websocket.close()
             self.websocket = None
 
 
+def _flight_key(method, params) -> Optional[tuple]:
+    """What identical commands have in common, or None if the params are
+    unusual, or their args can't be compared."""
+    if type(params) is not dict or not params.keys() <= _FLIGHT_PARAMS:
+        return None
+    key = (
+        method,
+        params.get("resource"),
+        tuple(params.get("args") or ()),
+        params.get("compactMode", False),
+    )
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+_FLIGHT_PARAMS = frozenset({"resource", "args", "compactMode"})
+
+
 class _MessageIdFactory:
     def __init__(self):
         self._message_id = 0
@@ -0,0 +1,45 @@
+"""
+    An optional per-connection map from resource id to the SlobsClass instance
+    representing it, so that the factories return the same Python object
+    each time the same resource arrives, refreshed with the latest data.
+
+    Enable with ConnectionConfig.identity_map. Instances are held by weak
+    reference: one is kept only while something else still refers to it.
+"""
+from typing import Any
+from weakref import WeakValueDictionary
+
+
+class IdentityMap:
+    def __init__(self):
+        self._instances: WeakValueDictionary = WeakValueDictionary()
+        # Map from (class name, resource_id) -> instance.
+
+        # Counters
+        self.hits = 0
+        # Existing instances returned (and refreshed).
+        self.misses = 0
+        # New instances created.
+
+    def __len__(self):
+        return len(self._instances)
+
+    def get(self, class_name: str, resource_id) -> Any:
+        """The live instance for resource_id, or None."""
+        return self._instances.get((class_name, resource_id))
+
+    def instance(self, cls, connection, **fields):
+        """The live instance of cls for fields["resource_id"], refreshed with
+        fields, else a new one, which is remembered."""
+        key = (cls.__name__, fields["resource_id"])
+        existing = self._instances.get(key)
+        if existing is not None:
+            self.hits += 1
+            existing._refresh(**fields)
+            return existing
+        self.misses += 1
+        result = self._instances[key] = cls(connection, **fields)
+        return result
+
+    def clear(self) -> None:
+        self._instances.clear()
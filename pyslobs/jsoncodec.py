@@ -0,0 +1,224 @@
+"""
+    Codecs to convert JSON-RPC messages to and from the wire format.
+
+    The standard library codec is always available. The others depend on
+    optional packages, which are only imported when the codec is selected
+    (via ConnectionConfig.codec).
+
+    encode() returns str or bytes; either can be sent as a WebSocket text
+    frame. decode() accepts either.
+
+    Responses whose result is a long list can instead be decoded one entry at
+    a time, with the standard library, by streamed_response().
+"""
+import json
+import re
+from typing import Any, Iterator, Optional
+
+
+class JsonCodec:
+    """Base class for codecs."""
+
+    name = None
+
+    decode_errors: tuple[type[Exception], ...] = (ValueError,)
+    # Exceptions decode() raises when given malformed JSON.
+
+    cache_requests = False
+    # Whether RequestEncoder should cache the start of requests. Only worth
+    # it if encode() is slow, as the standard library's is.
+
+    def encode(self, obj) -> str | bytes:
+        raise NotImplementedError()
+
+    def decode(self, data: str | bytes) -> Any:
+        raise NotImplementedError()
+
+
+class StdlibJsonCodec(JsonCodec):
+    name = "json"
+
+    decode_errors = (json.JSONDecodeError,)
+
+    cache_requests = True
+
+    def __init__(self):
+        self._encoder = json.JSONEncoder()
+        self._decode = json.loads
+
+    def encode(self, obj) -> str:
+        return self._encoder.encode(obj)
+
+    def decode(self, data: str | bytes) -> Any:
+        return self._decode(data)
+
+
+class OrjsonCodec(JsonCodec):
+    name = "orjson"
+
+    def __init__(self):
+        try:
+            import orjson
+        except ImportError:
+            raise ImportError("The orjson codec requires the orjson package.")
+        self.decode_errors = (orjson.JSONDecodeError,)
+        self.encode = orjson.dumps
+        self.decode = orjson.loads
+
+
+class MsgspecCodec(JsonCodec):
+    name = "msgspec"
+
+    def __init__(self):
+        try:
+            import msgspec
+        except ImportError:
+            raise ImportError("The msgspec codec requires the msgspec package.")
+        self.decode_errors = (msgspec.DecodeError,)
+        self.encode = msgspec.json.Encoder().encode
+        self.decode = msgspec.json.Decoder().decode
+
+
+CODECS = {
+    codec.name: codec for codec in (StdlibJsonCodec, OrjsonCodec, MsgspecCodec)
+}
+
+
+_TEMPLATED_PARAMS = frozenset({"resource", "args"})
+# Requests with other params are encoded whole.
+
+
+class RequestEncoder:
+    """Encodes JSON-RPC requests with a codec, caching the constant start of
+    each (method, resource) pair's requests, so that only the id and the
+    arguments are encoded for each call.
+
+    Params other than the usual {"resource": ..., "args": ...} are encoded
+    whole, as are all requests if the codec's cache_requests is False.
+    """
+
+    MAX_TEMPLATES = 1000
+    # The cache is emptied when it reaches this many (method, resource) pairs.
+
+    def __init__(self, codec: JsonCodec):
+        self.codec = codec
+        self._templates: dict[tuple[str, Any], tuple] = dict()
+        # Map from (method, resource) -> (prefix, middle, end) of its
+        # requests, which go around the args and the id. Encoded in the
+        # codec's type (str or bytes).
+        if not codec.cache_requests:
+            self.encode = self._encode_whole
+
+    def _encode_whole(self, id_, method, params) -> str | bytes:
+        return self.codec.encode(_request(id_, method, params))
+
+    def encode(self, id_, method, params) -> str | bytes:
+        if type(params) is not dict or params.keys() != _TEMPLATED_PARAMS:
+            return self.codec.encode(_request(id_, method, params))
+        resource = params.get("resource")
+        try:
+            prefix, middle, end = self._templates[method, resource]
+        except KeyError:
+            prefix, middle, end = self._template(method, resource)
+        except TypeError:  # Unhashable resource.
+            return self.codec.encode(_request(id_, method, params))
+        args = self.codec.encode(params["args"])
+        if type(id_) is int:
+            id_json = str(id_)
+            if type(args) is bytes:
+                id_json = id_json.encode()
+        else:
+            id_json = self.codec.encode(id_)
+        return prefix + args + middle + id_json + end
+
+    def _template(self, method, resource) -> tuple:
+        # e.g. '{"jsonrpc":"2.0","method":"m","params":{"resource":"r","args":',
+        # '},"id":' and '}'.
+        start = self.codec.encode(
+            {"jsonrpc": "2.0", "method": method, "params": {"resource": resource}}
+        )
+        # Reopen the params object (dropping its "}}"), to add the args and id.
+        if type(start) is bytes:
+            template = (start[:-2] + b',"args":', b'},"id":', b"}")
+        else:
+            template = (start[:-2] + ',"args":', '},"id":', "}")
+        if len(self._templates) >= self.MAX_TEMPLATES:
+            self._templates.clear()
+        self._templates[method, resource] = template
+        return template
+
+
+def _request(id_, method, params) -> dict:
+    return {"jsonrpc": "2.0", "id": id_, "method": method, "params": params}
+
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_raw_decode = json.JSONDecoder().raw_decode
+
+
+class StreamedResult:
+    """The list result of a response, left undecoded in the text of the
+    message. Iterating over it decodes one entry at a time, so the entries
+    already handled can be freed, and the first is available at once.
+    Each iteration decodes the text again.
+    """
+
+    __slots__ = ("_text", "_start")
+
+    def __init__(self, text: str, start: int):
+        self._text = text
+        self._start = start
+        # Index of the list's opening bracket.
+
+    def __iter__(self) -> Iterator[Any]:
+        text = self._text
+        index = _WHITESPACE.match(text, self._start + 1).end()
+        if text.startswith("]", index):
+            return
+        while True:
+            entry, index = _raw_decode(text, index)
+            yield entry
+            index = _WHITESPACE.match(text, index).end()
+            if text.startswith("]", index):
+                return
+            if not text.startswith(",", index):
+                raise json.JSONDecodeError("Expecting ',' delimiter", text, index)
+            index = _WHITESPACE.match(text, index + 1).end()
+
+
+def streamed_response(payload: str | bytes, ids) -> Optional[dict]:
+    """If payload is a response to one of ids whose result is a list, return
+    it as {"id": id, "result": StreamedResult}, decoding only the members
+    that come before the result. Otherwise (an error, a non-list result, or
+    an id that comes after the result), return None, and the payload should
+    be decoded as usual.
+    """
+    text = payload.decode("utf-8") if isinstance(payload, bytes) else payload
+    try:
+        index = _WHITESPACE.match(text).end()
+        if text[index] != "{":
+            return None
+        index += 1
+        response = dict()
+        while True:
+            index = _WHITESPACE.match(text, index).end()
+            key, index = _raw_decode(text, index)
+            index = _WHITESPACE.match(text, index).end()
+            if text[index] != ":":
+                return None
+            index = _WHITESPACE.match(text, index + 1).end()
+            if key == "result":
+                if text[index] != "[" or response.get("id") not in ids:
+                    return None
+                response["result"] = StreamedResult(text, index)
+                return response
+            if key != "id" and key != "jsonrpc":
+                return None
+            response[key], index = _raw_decode(text, index)
+            index = _WHITESPACE.match(text, index).end()
+            if text[index] != ",":
+                return None
+            index += 1
+    except (ValueError, IndexError):
+        # Malformed: leave it to the codec to report.
+        return None
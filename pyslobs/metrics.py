@@ -0,0 +1,296 @@
+"""
+    Instrumentation of the commands sent by a SlobsConnection.
+
+    Enabled by setting ConnectionConfig.metrics. Each command is timed in
+    phases:
+        - encode: converting the request to JSON.
+        - send: writing the request to the socket.
+        - server_wait: from the request being sent until the (final) response
+          arrives. Includes the network round trip, and waiting for promises.
+        - decode: converting the response from JSON.
+        - total: from command() being called until it returns, including any
+          time waiting for a slot in the in-flight window.
+
+    Counters and latency histograms are kept per JSON-RPC method. calls counts
+    the requests actually sent; commands that fail or are cancelled before
+    sending are not counted in it, though they are timed (total) and counted
+    as errors or timeouts. Commands answered by an identical command's request
+    (ConnectionConfig.share_reads) are counted in shared instead, and are not
+    timed. They can be read as a dict (snapshot()) or in the Prometheus text
+    exposition format (to_prometheus()).
+"""
+from bisect import bisect_left
+from time import perf_counter
+
+DEFAULT_BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+# Upper bounds, in seconds. An implicit +Inf bucket follows.
+
+PHASES = ("encode", "send", "server_wait", "decode", "total")
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "count", "sum")
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative_counts(self) -> list[tuple[float, int]]:
+        """Return (upper bound, observations <= bound) pairs, Prometheus-style."""
+        result = []
+        running = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            running += count
+            result.append((bound, running))
+        return result
+
+    def snapshot(self) -> dict:
+        return dict(
+            count=self.count,
+            sum=self.sum,
+            buckets=self.cumulative_counts(),
+        )
+
+
+class MethodMetrics:
+    """Counters and histograms for a single JSON-RPC method."""
+
+    __slots__ = (
+        "calls",
+        "errors",
+        "timeouts",
+        "shared",
+        "bytes_sent",
+        "bytes_received",
+        "histograms",
+    )
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.shared = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.histograms = {phase: Histogram(buckets) for phase in PHASES}
+
+    def snapshot(self) -> dict:
+        return dict(
+            calls=self.calls,
+            errors=self.errors,
+            timeouts=self.timeouts,
+            shared=self.shared,
+            bytes_sent=self.bytes_sent,
+            bytes_received=self.bytes_received,
+            latency={
+                phase: histogram.snapshot()
+                for phase, histogram in self.histograms.items()
+            },
+        )
+
+
+class _Call:
+    """Measurements of one command, while it is in progress."""
+
+    __slots__ = (
+        "method",
+        "started",
+        "encode",
+        "send",
+        "sent",
+        "received",
+        "decode",
+        "bytes_sent",
+        "bytes_received",
+        "future",
+    )
+
+    def __init__(self, method):
+        self.method = method
+        self.started = perf_counter()
+        self.encode = None
+        self.send = None
+        self.sent = None
+        self.received = None
+        self.decode = 0.0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.future = None
+
+
+class ConnectionMetrics:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self._buckets = buckets
+        self._methods: dict[str, MethodMetrics] = dict()
+        self._calls_by_future = dict()
+        # Map from the future awaiting a response -> _Call
+        self.frames_received = 0
+        self.bytes_received = 0
+
+    def method(self, method: str) -> MethodMetrics:
+        try:
+            return self._methods[method]
+        except KeyError:
+            metrics = self._methods[method] = MethodMetrics(self._buckets)
+            return metrics
+
+    # Called by SlobsConnection, as a command progresses.
+
+    @staticmethod
+    def start_call(method: str) -> _Call:
+        return _Call(method)
+
+    @staticmethod
+    def sent(
+        call: _Call, encode_started: float, encoded_at: float, sent_at: float, size: int
+    ) -> None:
+        call.encode = encoded_at - encode_started
+        call.send = sent_at - encoded_at
+        call.sent = sent_at
+        call.bytes_sent = size
+
+    def track(self, future, call: _Call) -> None:
+        """Associate call with the future that will receive its response."""
+        call.future = future
+        self._calls_by_future[future] = call
+
+    def frame_received(self, size: int) -> None:
+        self.frames_received += 1
+        self.bytes_received += size
+
+    def response_received(self, future, size: int, decode_seconds: float) -> None:
+        call = self._calls_by_future.get(future)
+        if call is not None:
+            call.received = perf_counter()
+            call.bytes_received += size
+            call.decode += decode_seconds
+
+    def shared(self, method: str) -> None:
+        """Count a command answered by an identical command's request."""
+        self.method(method).shared += 1
+
+    def finish(self, call: _Call, outcome: str = "ok") -> None:
+        """outcome is one of "ok", "error", "timeout" or "cancelled"."""
+        self._calls_by_future.pop(call.future, None)
+        finished = perf_counter()
+        metrics = self.method(call.method)
+        if outcome == "error":
+            metrics.errors += 1
+        elif outcome == "timeout":
+            metrics.timeouts += 1
+        metrics.bytes_sent += call.bytes_sent
+        metrics.bytes_received += call.bytes_received
+        histograms = metrics.histograms
+        histograms["total"].observe(finished - call.started)
+        if call.sent is not None:
+            metrics.calls += 1
+            histograms["encode"].observe(call.encode)
+            histograms["send"].observe(call.send)
+            if call.received is not None:
+                histograms["server_wait"].observe(call.received - call.sent)
+                histograms["decode"].observe(call.decode)
+
+    # Reporting.
+
+    def snapshot(self) -> dict:
+        """Return the metrics of each method, keyed by method name."""
+        return {
+            method: metrics.snapshot()
+            for method, metrics in sorted(self._methods.items())
+        }
+
+    def reset(self) -> None:
+        self._methods.clear()
+        self.frames_received = 0
+        self.bytes_received = 0
+
+    def to_prometheus(self, prefix: str = "pyslobs") -> str:
+        """Return the metrics in the Prometheus text exposition format."""
+        lines = []
+        methods = sorted(self._methods.items())
+
+        counters = (
+            ("commands_total", "Commands sent.", "calls"),
+            ("command_errors_total", "Commands answered with an error.", "errors"),
+            ("command_timeouts_total", "Commands that timed out.", "timeouts"),
+            (
+                "commands_shared_total",
+                "Commands answered by an identical command's request.",
+                "shared",
+            ),
+            ("command_sent_bytes_total", "Bytes of requests sent.", "bytes_sent"),
+            (
+                "command_received_bytes_total",
+                "Bytes of responses received.",
+                "bytes_received",
+            ),
+        )
+        for name, help_text, attribute in counters:
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} counter")
+            for method, metrics in methods:
+                lines.append(
+                    f'{prefix}_{name}{{method="{_escape(method)}"}} '
+                    f"{getattr(metrics, attribute)}"
+                )
+
+        name = f"{prefix}_command_duration_seconds"
+        lines.append(f"# HELP {name} Time spent in each phase of a command.")
+        lines.append(f"# TYPE {name} histogram")
+        for method, metrics in methods:
+            for phase, histogram in metrics.histograms.items():
+                labels = f'method="{_escape(method)}",phase="{phase}"'
+                for bound, count in histogram.cumulative_counts():
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'{name}_bucket{{{labels},le="{le}"}} {count}')
+                lines.append(f"{name}_sum{{{labels}}} {histogram.sum!r}")
+                lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+
+        for name, help_text, value in (
+            ("frames_received_total", "WebSocket messages received.",
+             self.frames_received),
+            ("received_bytes_total", "Bytes of WebSocket messages received.",
+             self.bytes_received),
+        ):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} counter")
+            lines.append(f"{prefix}_{name} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+def encoded_size(data: str | bytes) -> int:
+    """Size in bytes of a message, once UTF-8 encoded."""
+    if isinstance(data, bytes) or data.isascii():
+        return len(data)
+    return len(data.encode("utf-8"))
+
+
+def _escape(label_value: str) -> str:
+    return (
+        label_value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    )
@@ -0,0 +1,400 @@
+"""
+    A live, in-memory copy of the current scene collection's scenes, scene
+    nodes and sources, kept up to date from events.
+
+        async with SceneGraphMirror(conn) as mirror:
+            ...
+            for item in mirror.visible_items():
+                ...
+
+    Loads everything once (getScenes, getSources and activeSceneId, in one
+    batch), then applies the ScenesService and SourcesService events as they
+    arrive, so reads are answered from memory, without a round trip.
+
+    Like the SlobsClass attributes, the mirror may lag the server a little.
+    In particular:
+        - events that arrive while a snapshot is being fetched are applied
+          after it, even if the snapshot already reflected them;
+        - StreamLabs Desktop doesn't report re-ordering of nodes, and new
+          nodes are assumed to go on top of their scene;
+        - events are not sent while the connection is being re-established.
+    So every check_interval seconds, the mirror fetches a fresh snapshot,
+    counts any differences from its own state, and adopts the snapshot.
+"""
+import asyncio
+import logging
+from typing import Any, Optional
+
+from .pubsubhub import Delivery, SubscriptionPreferences
+from .slobs.factories import scene_factory, scenenode_factory, source_factory
+
+EVENTS = {
+    "ScenesService": (
+        "itemAdded",
+        "itemRemoved",
+        "itemUpdated",
+        "sceneAdded",
+        "sceneRemoved",
+        "sceneSwitched",
+    ),
+    "SourcesService": ("sourceAdded", "sourceRemoved", "sourceUpdated"),
+}
+
+
+class SceneGraphMirror:
+    """See module docstring.
+
+    Reads return the same objects (Scene, SceneItem, SceneItemFolder, Source)
+    as the services, built on demand and reused until the mirrored data
+    changes. scene_id defaults to the active scene's.
+    """
+
+    logger = logging.getLogger("slobsapi.SceneGraphMirror")
+
+    def __init__(self, connection, check_interval: Optional[float] = 60):
+        self._connection = connection
+        self.check_interval = check_interval
+        # Seconds between consistency checks. None for no checks.
+
+        self.active_scene_id: Optional[str] = None
+        self._scenes: dict[str, dict] = dict()
+        # Map from scene id -> the scene's model, without its nodes.
+        self._nodes: dict[str, dict[str, dict]] = dict()
+        # Map from scene id -> node id -> node model, in the scene's order.
+        self._node_scenes: dict[str, str] = dict()
+        # Map from node id -> scene id.
+        self._sources: dict[str, dict] = dict()
+        # Map from source id -> source model.
+        self._objects: dict[tuple[str, str], Any] = dict()
+        # Map from (kind, id) -> the SlobsClass built from the mirrored model.
+        # Discarded when the model changes.
+
+        self._handlers = {
+            "itemAdded": self._item_added,
+            "itemRemoved": self._item_removed,
+            "itemUpdated": self._item_updated,
+            "sceneAdded": self._scene_added,
+            "sceneRemoved": self._scene_removed,
+            "sceneSwitched": self._scene_switched,
+            "sourceAdded": self._source_updated,
+            "sourceRemoved": self._source_removed,
+            "sourceUpdated": self._source_updated,
+        }
+        self._methods_by_resource_id: dict[Any, str] = dict()
+        self._loaded = False
+        self._backlog = []
+        # Events that arrived before the first snapshot.
+        self._check_task: Optional[asyncio.Task] = None
+
+        # Counters
+        self.events_applied = 0
+        self.checks = 0
+        self.discrepancies = 0
+        # Differences found by checks: scenes, nodes or sources missing,
+        # extra or changed, and a wrong active scene.
+
+    async def start(self) -> None:
+        """Subscribe, and load the initial state."""
+        prefs = SubscriptionPreferences(delivery=Delivery.QUEUED, queue_size=1000)
+        for resource, methods in EVENTS.items():
+            for method in methods:
+                resource_id = await self._connection.subscribe(
+                    method, dict(resource=resource, args=[]), self._on_event, prefs
+                )
+                self._methods_by_resource_id[resource_id] = method
+        self._adopt(await self._fetch())
+        self._loaded = True
+        backlog, self._backlog = self._backlog, []
+        for method, message in backlog:
+            self._apply(method, message)
+        if self.check_interval:
+            self._check_task = asyncio.create_task(self._check_periodically())
+
+    async def close(self) -> None:
+        """Stop checking and unsubscribe."""
+        if self._check_task:
+            self._check_task.cancel()
+            self._check_task = None
+        resource_ids, self._methods_by_resource_id = self._methods_by_resource_id, {}
+        for resource_id in resource_ids:
+            await self._connection.unsubscribe(resource_id, self._on_event)
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def check(self) -> int:
+        """Fetch a fresh snapshot, and adopt it. Returns how many differences
+        there were."""
+        snapshot = await self._fetch()
+        differences = self._compare(snapshot)
+        self.checks += 1
+        if differences:
+            self.discrepancies += differences
+            self.logger.warning("Mirror differed from server in %s ways.", differences)
+        self._adopt(snapshot)
+        return differences
+
+    # Reads.
+
+    def scene_ids(self) -> list[str]:
+        return list(self._scenes)
+
+    def scene(self, scene_id: Optional[str] = None):
+        """The Scene, with its nodes. None if unknown."""
+        scene_id = scene_id or self.active_scene_id
+        if scene_id not in self._scenes:
+            return None
+        return self._object(
+            "scene",
+            scene_id,
+            lambda: scene_factory(
+                self._connection,
+                dict(self._scenes[scene_id], nodes=list(self._nodes[scene_id].values())),
+            ),
+        )
+
+    def active_scene(self):
+        return self.scene()
+
+    def scenes(self) -> list:
+        return [self.scene(scene_id) for scene_id in self._scenes]
+
+    def node(self, node_id: str):
+        """The SceneItem or SceneItemFolder. None if unknown."""
+        scene_id = self._node_scenes.get(node_id)
+        if scene_id is None:
+            return None
+        return self._node_object(self._nodes[scene_id][node_id])
+
+    def nodes(self, scene_id: Optional[str] = None) -> list:
+        return [
+            self._node_object(model)
+            for model in self._nodes.get(scene_id or self.active_scene_id, {}).values()
+        ]
+
+    def items(self, scene_id: Optional[str] = None) -> list:
+        """The scene's SceneItems (not folders)."""
+        return [
+            self._node_object(model)
+            for model in self._nodes.get(scene_id or self.active_scene_id, {}).values()
+            if model["sceneNodeType"] == "item"
+        ]
+
+    def visible_items(self, scene_id: Optional[str] = None) -> list:
+        return [
+            self._node_object(model)
+            for model in self._nodes.get(scene_id or self.active_scene_id, {}).values()
+            if model["sceneNodeType"] == "item" and model.get("visible")
+        ]
+
+    def items_of_source(self, source_id: str) -> list:
+        """The SceneItems, in any scene, that show the source."""
+        return [
+            self._node_object(model)
+            for nodes in self._nodes.values()
+            for model in nodes.values()
+            if model.get("sourceId") == source_id and model["sceneNodeType"] == "item"
+        ]
+
+    def source(self, source_id: str):
+        """The Source. None if unknown."""
+        model = self._sources.get(source_id)
+        if model is None:
+            return None
+        return self._object(
+            "source", source_id, lambda: source_factory(self._connection, model)
+        )
+
+    def sources(self) -> list:
+        return [self.source(source_id) for source_id in self._sources]
+
+    # Events.
+
+    async def _on_event(self, key, message):
+        method = self._methods_by_resource_id.get(key)
+        if method is None:
+            return  # Unsubscribed meanwhile.
+        if not self._loaded:
+            self._backlog.append((method, message))
+            return
+        self._apply(method, message)
+
+    def _apply(self, method, message) -> None:
+        try:
+            self._handlers[method](message)
+        except (KeyError, TypeError):
+            self.logger.exception("Could not apply %s: %s", method, message)
+            return
+        self.events_applied += 1
+
+    def _item_added(self, model) -> None:
+        scene_id = model["sceneId"]
+        nodes = self._nodes.get(scene_id)
+        if nodes is None:
+            return  # Scene not known (yet); the next check will find it.
+        # New nodes go on top, i.e. first.
+        self._nodes[scene_id] = {model["id"]: model, **nodes}
+        self._node_scenes[model["id"]] = scene_id
+        self._forget("scene", scene_id)
+        self._update_children(scene_id, model.get("parentId"))
+
+    def _item_updated(self, model) -> None:
+        scene_id = model["sceneId"]
+        nodes = self._nodes.get(scene_id)
+        if nodes is None:
+            return
+        if model["id"] not in nodes:
+            self._item_added(model)
+            return
+        old_parent_id = nodes[model["id"]].get("parentId")
+        nodes[model["id"]] = model
+        self._forget("node", model["id"])
+        self._forget("scene", scene_id)
+        if model.get("parentId") != old_parent_id:
+            self._update_children(scene_id, old_parent_id)
+            self._update_children(scene_id, model.get("parentId"))
+
+    def _item_removed(self, model) -> None:
+        node_id = model["id"]
+        scene_id = self._node_scenes.pop(node_id, None)
+        if scene_id is None:
+            return
+        parent_id = self._nodes[scene_id].pop(node_id).get("parentId")
+        self._forget("node", node_id)
+        self._forget("scene", scene_id)
+        self._update_children(scene_id, parent_id)
+
+    def _scene_added(self, model) -> None:
+        self._set_scene(model)
+
+    def _scene_switched(self, model) -> None:
+        # Carries the scene's nodes; as good as a fresh copy.
+        self._set_scene(model)
+        self.active_scene_id = model["id"]
+
+    def _scene_removed(self, model) -> None:
+        scene_id = model["id"]
+        self._scenes.pop(scene_id, None)
+        for node_id in self._nodes.pop(scene_id, {}):
+            del self._node_scenes[node_id]
+            self._forget("node", node_id)
+        self._forget("scene", scene_id)
+
+    def _source_updated(self, model) -> None:
+        self._sources[model["sourceId"]] = model
+        self._forget("source", model["sourceId"])
+
+    def _source_removed(self, model) -> None:
+        self._sources.pop(model["sourceId"], None)
+        self._forget("source", model["sourceId"])
+
+    # State.
+
+    async def _fetch(self) -> tuple:
+        results = await self._connection.command_batch(
+            [
+                ("getScenes", dict(resource="ScenesService", args=[])),
+                ("getSources", dict(resource="SourcesService", args=[])),
+                ("activeSceneId", dict(resource="ScenesService", args=[])),
+            ]
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+        return tuple(results)
+
+    def _adopt(self, snapshot) -> None:
+        scenes, sources, active_scene_id = snapshot
+        self._scenes.clear()
+        self._nodes.clear()
+        self._node_scenes.clear()
+        self._objects.clear()
+        for scene in scenes:
+            self._set_scene(scene)
+        self._sources = {source["sourceId"]: source for source in sources}
+        self.active_scene_id = active_scene_id
+
+    def _compare(self, snapshot) -> int:
+        scenes, sources, active_scene_id = snapshot
+        differences = int(active_scene_id != self.active_scene_id)
+        scene_ids = set()
+        for scene in scenes:
+            scene_ids.add(scene["id"])
+            mirrored = self._scenes.get(scene["id"])
+            if mirrored is None or mirrored.get("name") != scene.get("name"):
+                differences += 1
+            differences += _count_differences(
+                {node["id"]: node for node in scene["nodes"]},
+                self._nodes.get(scene["id"], {}),
+            )
+        differences += len(self._scenes.keys() - scene_ids)
+        differences += _count_differences(
+            {source["sourceId"]: source for source in sources}, self._sources
+        )
+        return differences
+
+    def _set_scene(self, model) -> None:
+        scene_id = model["id"]
+        for node_id in self._nodes.get(scene_id, {}):
+            del self._node_scenes[node_id]
+            self._forget("node", node_id)
+        self._scenes[scene_id] = {
+            key: value for key, value in model.items() if key != "nodes"
+        }
+        self._nodes[scene_id] = {node["id"]: node for node in model["nodes"]}
+        for node_id in self._nodes[scene_id]:
+            self._node_scenes[node_id] = scene_id
+        self._forget("scene", scene_id)
+
+    def _update_children(self, scene_id, folder_id) -> None:
+        """Folders' models list their children. Keep that up to date, as no
+        event says when it changes."""
+        nodes = self._nodes[scene_id]
+        folder = nodes.get(folder_id) if folder_id else None
+        if folder is None or "childrenIds" not in folder:
+            return
+        nodes[folder_id] = dict(
+            folder,
+            childrenIds=[
+                node_id
+                for node_id, node in nodes.items()
+                if node.get("parentId") == folder_id
+            ],
+        )
+        self._forget("node", folder_id)
+
+    def _object(self, kind, id_, build):
+        try:
+            return self._objects[kind, id_]
+        except KeyError:
+            result = self._objects[kind, id_] = build()
+            return result
+
+    def _node_object(self, model):
+        return self._object(
+            "node", model["id"], lambda: scenenode_factory(self._connection, model)
+        )
+
+    def _forget(self, kind, id_) -> None:
+        self._objects.pop((kind, id_), None)
+
+    async def _check_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.check_interval)
+            try:
+                await self.check()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.logger.exception("Consistency check failed.")
+
+
+def _count_differences(expected: dict, actual: dict) -> int:
+    """How many keys are missing, extra, or have a different value."""
+    return len(expected.keys() ^ actual.keys()) + sum(
+        1 for key in expected.keys() & actual.keys() if expected[key] != actual[key]
+    )
@@ -8,6 +8,10 @@
         - Optionally informs subscriber that they have been unsubscribed.
         - Maintain a (limited) buffer of undelivered messages in case a message
           is received before subscriber can subscribe.
+            - Bounded overall and per key. Messages expire, and the least
+              recently used keys are evicted first.
+        - Late messages (e.g. responses to commands that timed out) are
+          counted and passed to a hook, rather than buffered.
         
         Only one asyncio mechanism is supported. Each subscriber must provide a 
         callback_coroutine co-routine.
@@ -16,31 +20,474 @@
             - Callback takes two parameters: key and message.
             - Unsubscribe notifications will have UNSUBSCRIBED as the message.
             - Close notifications will have CLOSED as the key and message.
+
+        Two delivery modes:
+            - Delivery.TASK (default): each message is delivered to each
+              subscriber in a task of its own. Cheap for occasional events, but
+              a burst may be handled out of order.
+            - Delivery.QUEUED: each subscriber (callback) has a bounded FIFO
+              and one worker task, which awaits the callback for one message
+              at a time, in the order they were published - across all the
+              keys the callback subscribes to. When the FIFO is full, the
+              Overflow policy applies.
+
+        Each subscription may also limit how often its callback is woken,
+        before any task is created or anything is queued:
+            - debounce: a message is held until no other has arrived for that
+              many seconds.
+            - max_rate: at most that many messages a second are delivered.
+            - coalesce_key: the field of the message (or a function of it)
+              that identifies what the message is about (e.g. "sceneItemId").
+              The limits above apply to each identity separately, and a held
+              message is replaced by a newer one with the same identity, so
+              only the latest is delivered. With Delivery.QUEUED, a queued
+              message is also replaced by a newer one with the same identity.
+              Without coalesce_key, all the messages of a subscription share
+              one identity.
+
+        A subscription may have a filter_, so only some messages are delivered
+        to it: a predicate taking the message, or a dict of fields the
+        message must have, with those values (e.g. {"sceneId": scene_id}).
+        Filters are checked on publishing, before anything else. Dict filters
+        are indexed, so a message is only checked against the subscriptions
+        that want its value of one of their fields.
 """
 from __future__ import annotations
 import asyncio
+from collections import OrderedDict, deque
 from dataclasses import dataclass
+from enum import Enum
 import logging
-from typing import Any, Callable, Coroutine
+from math import inf
+from time import monotonic
+from typing import Any, Callable, Coroutine, Iterator, Optional, Union
 
 LOGGER = logging.getLogger("slobsapi.pubsubhub")
 
 
+class Delivery(Enum):
+    TASK = "task"
+    QUEUED = "queued"
+
+
+class Overflow(Enum):
+    BLOCK = "block"
+    # Publisher waits for space. Note: the publisher is the connection's
+    # receive loop, so nothing else is received meanwhile; a callback that
+    # awaits a command's response would deadlock.
+    DROP_OLDEST = "drop_oldest"
+    # The oldest queued message is discarded.
+    COALESCE = "coalesce"
+    # The newest queued message with the same key (and coalesce_key
+    # identity, if any) is replaced by the new one, keeping its place in the
+    # queue. If there is none, the oldest queued message is discarded.
+
+
 @dataclass(frozen=True)
 class SubscriptionPreferences:
     notify_on_unsubscribe: bool = False
     notify_on_close: bool = False
+    delivery: Delivery = Delivery.TASK
+    queue_size: int = 100
+    # Delivery.QUEUED only. The queue and its overflow policy belong to the
+    # callback; they are set by its first queued subscription.
+    overflow: Overflow = Overflow.BLOCK
+    debounce: float = 0
+    # Seconds. 0 is no debouncing.
+    max_rate: float = 0
+    # Messages per second. 0 is unlimited.
+    coalesce_key: Union[str, Callable[[Any], Any], None] = None
+    # Field name, or function of the message. A message without the field (or
+    # for which the function returns None) is not coalesced with others.
+    # Messages let through by debounce or max_rate are queued even if
+    # Overflow.BLOCK would block, so they may exceed queue_size.
+    filter_: Union[Callable[[Any], bool], dict, None] = None
+    # Only messages for which the predicate returns True, or which are dicts
+    # with all the given fields and values, are delivered. Notifications
+    # (UNSUBSCRIBED, CLOSED) are not filtered.
+
+    def __post_init__(self):
+        if self.queue_size < 1:
+            raise ValueError("queue_size must be at least 1.")
+        if self.debounce < 0 or self.max_rate < 0:
+            raise ValueError("debounce and max_rate must not be negative.")
+
+    @property
+    def limited(self) -> bool:
+        """Whether messages are held back by debounce or max_rate."""
+        return bool(self.debounce or self.max_rate)
+
+    def accepts(self, message) -> bool:
+        """Whether message passes filter_."""
+        filter_ = self.filter_
+        if filter_ is None:
+            return True
+        if isinstance(filter_, dict):
+            return isinstance(message, dict) and all(
+                message.get(field, _NOTHING) == value
+                for field, value in filter_.items()
+            )
+        try:
+            return bool(filter_(message))
+        except Exception:
+            LOGGER.exception("Filter %s failed on %s", filter_, message)
+            return False
+
+    def identity(self, message) -> Any:
+        """What the message is about, according to coalesce_key, else None."""
+        coalesce_key = self.coalesce_key
+        if coalesce_key is None:
+            return None
+        if callable(coalesce_key):
+            return coalesce_key(message)
+        if isinstance(message, dict):
+            return message.get(coalesce_key)
+        return None
 
 
 UNSUBSCRIBED = object()
 CLOSED = object()
+_NOTHING = object()
+
+
+class UndeliveredStore:
+    """Messages published before anyone subscribed to their key.
+
+    At most max_messages are kept in total, and max_per_key per key. When full,
+    the oldest message of the least recently published-to key is evicted.
+    Messages are discarded ttl seconds after they arrive.
+    """
+
+    def __init__(
+        self, max_messages: int = 1000, max_per_key: int = 10, ttl: float = 60
+    ):
+        self.max_messages = max_messages
+        self.max_per_key = max_per_key
+        self.ttl = ttl
+
+        self._messages: OrderedDict[Any, deque] = OrderedDict()
+        # Map from key -> deque of (expiry time, message), oldest first.
+        # Least recently published-to key first.
+        self._count = 0
+
+        # Counters
+        self.stored = 0
+        self.delivered = 0
+        self.dropped = 0
+        # Rejected because the key already had max_per_key messages.
+        self.evicted = 0
+        # Removed to keep within max_messages.
+        self.expired = 0
+        self.late = 0
+        # Late messages reported to PubSubHub.late_message(). Not stored.
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, key):
+        return key in self._messages
+
+    def add(self, key, message) -> bool:
+        """Store message. Returns False if it was dropped instead."""
+        now = monotonic()
+        self.expire(now)
+        messages = self._messages.get(key)
+        if messages is None:
+            messages = self._messages[key] = deque()
+        else:
+            self._messages.move_to_end(key)
+            if len(messages) >= self.max_per_key:
+                self.dropped += 1
+                return False
+        messages.append((now + self.ttl, message))
+        self._count += 1
+        self.stored += 1
+        while self._count > self.max_messages:
+            self._evict_one()
+        return True
+
+    def pop(self, key) -> list:
+        """Remove and return the unexpired messages for key, oldest first."""
+        messages = self._messages.pop(key, None)
+        if not messages:
+            return []
+        self._count -= len(messages)
+        now = monotonic()
+        result = [message for expires, message in messages if expires > now]
+        self.expired += len(messages) - len(result)
+        self.delivered += len(result)
+        return result
+
+    def discard(self, key) -> None:
+        messages = self._messages.pop(key, None)
+        if messages:
+            self._count -= len(messages)
+
+    def expire(self, now: Optional[float] = None) -> None:
+        """Discard expired messages, starting from the least recently used key.
+
+        Stops at the first key whose newest message hasn't expired; the rest
+        are found when popped, or evicted.
+        """
+        now = monotonic() if now is None else now
+        while self._messages:
+            key, messages = next(iter(self._messages.items()))
+            while messages and messages[0][0] <= now:
+                messages.popleft()
+                self._count -= 1
+                self.expired += 1
+            if messages:
+                break
+            del self._messages[key]
+
+    def _evict_one(self) -> None:
+        key, messages = next(iter(self._messages.items()))
+        messages.popleft()
+        self._count -= 1
+        self.evicted += 1
+        if not messages:
+            del self._messages[key]
+
+    def stats(self) -> dict:
+        return dict(
+            size=self._count,
+            keys=len(self._messages),
+            stored=self.stored,
+            delivered=self.delivered,
+            dropped=self.dropped,
+            evicted=self.evicted,
+            expired=self.expired,
+            late=self.late,
+        )
+
+
+class DeliveryQueue:
+    """A subscriber's bounded FIFO of (key, message), emptied in order by one
+    worker task that awaits the callback for each."""
+
+    def __init__(
+        self,
+        callback_coroutine: PubSubHub.Callback,
+        maxsize: int = 100,
+        overflow: Overflow = Overflow.BLOCK,
+    ):
+        self.callback_coroutine = callback_coroutine
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.keys = set()
+        # Keys for which the callback is subscribed with Delivery.QUEUED.
+
+        self._items: deque[list] = deque()
+        # [key, message, identity], oldest first. Lists, so coalescing can
+        # replace a message in place.
+        self._ready = asyncio.Event()
+        self._space = asyncio.Event()
+        self._closing = False
+        self.task = asyncio.ensure_future(self._work())
+
+        # Counters
+        self.delivered = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.max_depth = 0
+
+    @property
+    def depth(self) -> int:
+        """Messages waiting to be delivered."""
+        return len(self._items)
+
+    async def put(self, key, message, identity=None) -> None:
+        while not self.try_put(key, message, identity):
+            self._space.clear()
+            await self._space.wait()
+
+    def try_put(self, key, message, identity=None) -> bool:
+        """Queue a message, unless the queue is full and the overflow policy is
+        BLOCK. identity is per SubscriptionPreferences.identity()."""
+        items = self._items
+        if identity is not None and self._coalesce(key, message, identity):
+            return True
+        if len(items) >= self.maxsize and not self._closing:
+            if self.overflow is Overflow.BLOCK:
+                return False
+            if self.overflow is Overflow.COALESCE and self._coalesce(
+                key, message, identity
+            ):
+                return True
+            items.popleft()
+            self.dropped += 1
+        self._append(key, message, identity)
+        return True
+
+    def put_nowait(self, key, message, identity=None) -> None:
+        """Queue a message regardless of maxsize."""
+        self._append(key, message, identity)
+
+    def close(self) -> None:
+        """Stop the worker once the queued messages have been delivered."""
+        self._closing = True
+        self._ready.set()
+        self._space.set()
+
+    def stats(self) -> dict:
+        return dict(
+            depth=len(self._items),
+            max_depth=self.max_depth,
+            maxsize=self.maxsize,
+            delivered=self.delivered,
+            dropped=self.dropped,
+            coalesced=self.coalesced,
+        )
+
+    def _append(self, key, message, identity) -> None:
+        self._items.append([key, message, identity])
+        self.max_depth = max(self.max_depth, len(self._items))
+        self._ready.set()
+
+    def _coalesce(self, key, message, identity) -> bool:
+        for item in reversed(self._items):
+            if item[0] == key and item[2] == identity:
+                item[1] = message
+                self.coalesced += 1
+                return True
+        return False
+
+    async def _work(self) -> None:
+        items = self._items
+        while True:
+            if not items:
+                if self._closing:
+                    return
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+            key, message, _ = items.popleft()
+            self._space.set()
+            try:
+                await self.callback_coroutine(key, message)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                LOGGER.exception("Subscriber %s failed on %s", self.callback_coroutine, key)
+            self.delivered += 1
+
+
+class _Gate:
+    """Holds back the messages of one subscription, per its debounce and
+    max_rate, tracking each identity separately. release is called with each
+    message let through."""
+
+    def __init__(self, prefs: SubscriptionPreferences, release: Callable[[Any], None]):
+        self.debounce = prefs.debounce
+        self.interval = 1 / prefs.max_rate if prefs.max_rate else 0
+        self.identity = prefs.identity
+        self.release = release
+        self._slots: dict[Any, list] = dict()
+        # Map from identity -> [held message or _NOTHING, time of last release,
+        # timer handle or None]. Removed once idle.
+
+        # Counters
+        self.released = 0
+        self.replaced = 0
+        # Held messages superseded by a newer one.
+
+    @property
+    def held(self) -> int:
+        return sum(slot[0] is not _NOTHING for slot in self._slots.values())
+
+    def offer(self, message) -> None:
+        identity = self.identity(message)
+        slot = self._slots.get(identity)
+        if slot is None:
+            slot = self._slots[identity] = [_NOTHING, -inf, None]
+        elif slot[0] is not _NOTHING:
+            self.replaced += 1
+        slot[0] = message
+        if self.debounce:
+            if slot[2] is not None:
+                slot[2].cancel()
+            slot[2] = asyncio.get_running_loop().call_later(
+                self.debounce, self._fire, identity
+            )
+        elif slot[2] is None:
+            self._fire(identity)
+
+    def close(self) -> None:
+        """Discard held messages."""
+        for slot in self._slots.values():
+            if slot[2] is not None:
+                slot[2].cancel()
+        self._slots.clear()
+
+    def _fire(self, identity) -> None:
+        slot = self._slots[identity]
+        slot[2] = None
+        message = slot[0]
+        if message is _NOTHING:
+            del self._slots[identity]
+            return
+        now = monotonic()
+        wait = slot[1] + self.interval - now
+        if wait > 0:
+            slot[2] = asyncio.get_running_loop().call_later(wait, self._fire, identity)
+            return
+        slot[0] = _NOTHING
+        slot[1] = now
+        if self.interval:
+            # Anything arriving meanwhile is held until then.
+            slot[2] = asyncio.get_running_loop().call_later(
+                self.interval, self._fire, identity
+            )
+        else:
+            del self._slots[identity]
+        self.released += 1
+        self.release(message)
+
+
+class _FilterIndex:
+    """The subscribers to one key, arranged to find quickly which want a
+    message. Rebuilt whenever they change."""
+
+    def __init__(self, subscribers: dict):
+        self.unindexed = []
+        # (callback, prefs) without a filter, or with a predicate (or a dict
+        # filter that can't be indexed).
+        self.by_field: dict[str, dict[Any, list]] = dict()
+        # Map from field -> value -> [(callback, prefs)] with a dict filter
+        # whose first field is that.
+        for callback, prefs in subscribers.items():
+            filter_ = prefs.filter_
+            if isinstance(filter_, dict) and filter_:
+                field, value = next(iter(filter_.items()))
+                try:
+                    self.by_field.setdefault(field, dict()).setdefault(
+                        value, []
+                    ).append((callback, prefs))
+                    continue
+                except TypeError:
+                    pass  # Unhashable value.
+            self.unindexed.append((callback, prefs))
+
+    def recipients(self, message) -> Iterator[tuple]:
+        for callback, prefs in self.unindexed:
+            if prefs.filter_ is None or prefs.accepts(message):
+                yield callback, prefs
+        if self.by_field and isinstance(message, dict):
+            for field, by_value in self.by_field.items():
+                try:
+                    candidates = by_value.get(message.get(field, _NOTHING), ())
+                except TypeError:
+                    continue  # Unhashable value; no filter can want it.
+                for callback, prefs in candidates:
+                    if len(prefs.filter_) == 1 or prefs.accepts(message):
+                        yield callback, prefs
 
 
 class PubSubHub:
 
     Callback = Callable[[Any, Any], Coroutine]  # The return value is a coroutine.
 
-    def __init__(self):
+    def __init__(self, undelivered: Optional[UndeliveredStore] = None):
 
         self._subscribers_by_key: dict[
             str, dict[PubSubHub.Callback, SubscriptionPreferences]
@@ -48,8 +495,21 @@ class PubSubHub:
         # Map from key ->
         #     (dict mapping from callback_coroutine -> SubscriptionPreferences)
 
-        self._undelivered_messages: dict[str, list[any]] = dict()
-        # Map from key -> list of messages
+        self.undelivered = undelivered or UndeliveredStore()
+        # Messages awaiting a subscriber.
+
+        self.on_late_message: Optional[Callable[[Any, Any, dict], None]] = None
+        # If set, called with (key, message, details) for each late message.
+
+        self._queues: dict[PubSubHub.Callback, DeliveryQueue] = dict()
+        # Map from callback_coroutine -> its queue, for Delivery.QUEUED.
+
+        self._indexes: dict[Any, _FilterIndex] = dict()
+        # Map from key -> index of its subscribers.
+
+        self._gates: dict[tuple[Any, PubSubHub.Callback], _Gate] = dict()
+        # Map from (key, callback_coroutine) -> its gate, for subscriptions
+        # with debounce or max_rate.
 
         self._background_tasks = set()  # Prevent tasks from being garbage-collected.
 
@@ -66,22 +526,44 @@ class PubSubHub:
             }
         else:
             self._subscribers_by_key[key][callback_coroutine] = subscription_preferences
+        self._indexes[key] = _FilterIndex(self._subscribers_by_key[key])
+
+        if subscription_preferences.delivery is Delivery.QUEUED:
+            queue = self._queues.get(callback_coroutine)
+            if queue is None:
+                queue = self._queues[callback_coroutine] = DeliveryQueue(
+                    callback_coroutine,
+                    subscription_preferences.queue_size,
+                    subscription_preferences.overflow,
+                )
+            queue.keys.add(key)
+        else:
+            self._release_queue(key, callback_coroutine)
+
+        old_gate = self._gates.pop((key, callback_coroutine), None)
+        if old_gate is not None:
+            old_gate.close()
+        if subscription_preferences.limited:
+            self._gates[key, callback_coroutine] = _Gate(
+                subscription_preferences,
+                lambda message: self._hand_over(
+                    key, message, callback_coroutine, subscription_preferences
+                ),
+            )
 
         # If we have any undelivered messages to this key, send them now.
 
         # Check if response already arrived.
-        if key in self._undelivered_messages:
+        if key in self.undelivered:
             # Response already arrived!
-            LOGGER.debug(
-                "Backlog of messages being cleared: %s", self._undelivered_messages[key]
-            )
-            for message in self._undelivered_messages[key]:
-                task = asyncio.ensure_future(callback_coroutine(key, message))
-                # Prevent garbage collection before being done.
-                self._background_tasks.add(task)
-                task.add_done_callback(self._background_tasks.discard)
-
-            del self._undelivered_messages[key]
+            backlog = self.undelivered.pop(key)
+            LOGGER.debug("Backlog of messages being cleared: %s", backlog)
+            for message in backlog:
+                if not subscription_preferences.accepts(message):
+                    continue
+                await self._deliver(
+                    key, message, callback_coroutine, subscription_preferences
+                )
 
     async def unsubscribe(self, key: Any, callback_coroutine: Callback):
         if key in self._subscribers_by_key:
@@ -90,41 +572,113 @@ class PubSubHub:
                 del self._subscribers_by_key[key][callback_coroutine]
                 if not self._subscribers_by_key[key]:
                     del self._subscribers_by_key[key]
+                    del self._indexes[key]
+                else:
+                    self._indexes[key] = _FilterIndex(self._subscribers_by_key[key])
+                gate = self._gates.pop((key, callback_coroutine), None)
+                if gate is not None:
+                    gate.close()
                 if prefs.notify_on_unsubscribe:
-                    task = asyncio.ensure_future(callback_coroutine(key, UNSUBSCRIBED))
-                    # Prevent garbage collection before being done.
-                    self._background_tasks.add(task)
-                    task.add_done_callback(self._background_tasks.discard)
+                    self._notify(callback_coroutine, key, UNSUBSCRIBED)
+                self._release_queue(key, callback_coroutine)
 
     def has_subscribers(self, key):
         return key in self._subscribers_by_key
 
+    def delivery_queue(self, callback_coroutine: Callback) -> Optional[DeliveryQueue]:
+        """The queue of a subscriber using Delivery.QUEUED, else None."""
+        return self._queues.get(callback_coroutine)
+
+    def queue_stats(self) -> dict:
+        """Map from each queued subscriber's name -> its queue's stats, e.g. depth."""
+        return {
+            getattr(callback, "__qualname__", repr(callback)): queue.stats()
+            for callback, queue in self._queues.items()
+        }
+
+    async def _deliver(self, key, message, callback_coroutine, prefs) -> None:
+        if prefs.limited:
+            gate = self._gates.get((key, callback_coroutine))
+            if gate is not None:  # Else unsubscribed while the publisher waited.
+                gate.offer(message)
+        elif prefs.delivery is Delivery.QUEUED:
+            queue = self._queues.get(callback_coroutine)
+            if queue is not None:  # Else unsubscribed while the publisher waited.
+                await queue.put(key, message, prefs.identity(message))
+        else:
+            task = asyncio.ensure_future(callback_coroutine(key, message))
+            # Prevent garbage collection before being done.
+            self._background_tasks.add(task)
+            task.add_done_callback(self._background_tasks.discard)
+
+    def _hand_over(self, key, message, callback_coroutine, prefs) -> None:
+        """Deliver a message let through by a gate, without waiting."""
+        if prefs.delivery is Delivery.QUEUED:
+            queue = self._queues.get(callback_coroutine)
+            if queue is not None:
+                identity = prefs.identity(message)
+                if not queue.try_put(key, message, identity):
+                    queue.put_nowait(key, message, identity)
+        else:
+            task = asyncio.ensure_future(callback_coroutine(key, message))
+            # Prevent garbage collection before being done.
+            self._background_tasks.add(task)
+            task.add_done_callback(self._background_tasks.discard)
+
+    def _notify(self, callback_coroutine, key, message) -> None:
+        """Deliver a notification, behind any queued messages, without waiting
+        for space."""
+        queue = self._queues.get(callback_coroutine)
+        if queue is not None:
+            queue.put_nowait(key, message)
+        else:
+            task = asyncio.ensure_future(callback_coroutine(key, message))
+            # Prevent garbage collection before being done.
+            self._background_tasks.add(task)
+            task.add_done_callback(self._background_tasks.discard)
+
+    def _release_queue(self, key, callback_coroutine) -> None:
+        """The callback no longer has a queued subscription to key. Once it has
+        none, its queue is drained and its worker stops."""
+        queue = self._queues.get(callback_coroutine)
+        if queue is None:
+            return
+        queue.keys.discard(key)
+        if not queue.keys:
+            del self._queues[callback_coroutine]
+            queue.close()
+            self._background_tasks.add(queue.task)
+            queue.task.add_done_callback(self._background_tasks.discard)
+
     async def publish(self, key: Any, message):
-        subscribers = self._subscribers_by_key.get(key, {})
+        index = self._indexes.get(key)
 
-        if not subscribers:
+        if index is None:
             # Add to undelivered list.
-            if key not in self._undelivered_messages:
-                self._undelivered_messages[key] = [message]
-            elif len(self._undelivered_messages[key]) >= 10:
+            if not self.undelivered.add(key, message):
                 LOGGER.warning(
                     "Discarding undelivered message to %s, due to backlog. "
                     "Likely server subscriptions don't match client "
                     "subscriptions.",
                     key,
                 )
-            else:
-                self._undelivered_messages[key].append(message)
         else:
-            coroutines = subscribers.keys()
-            assert all(
-                asyncio.iscoroutinefunction(coroutine) for coroutine in coroutines
-            )
-            for coroutine in coroutines:
-                task = asyncio.ensure_future(coroutine(key, message))
-                # Prevent garbage collection before being done.
-                self._background_tasks.add(task)
-                task.add_done_callback(self._background_tasks.discard)
+            # The index is replaced, not changed, if subscriptions change
+            # while a blocked queue makes this wait.
+            for coroutine, prefs in index.recipients(message):
+                await self._deliver(key, message, coroutine, prefs)
+
+    def late_message(self, key: Any, message, **details) -> None:
+        """Report a message that arrived after its recipient stopped waiting
+        (e.g. a response to a command that timed out). It is counted and passed
+        to on_late_message, but not stored or delivered."""
+        self.undelivered.late += 1
+        LOGGER.debug("Late message for %s: %s %s", key, message, details)
+        if self.on_late_message is not None:
+            try:
+                self.on_late_message(key, message, details)
+            except Exception:
+                LOGGER.exception("on_late_message failed.")
 
     async def close(self):
         subscribers_to_notify = [
@@ -133,8 +687,13 @@ class PubSubHub:
             for (callback, prefs) in self._subscribers_by_key[key].items()
             if prefs.notify_on_close
         ]
+        for gate in self._gates.values():
+            gate.close()
+        self._gates.clear()
         for coroutine in subscribers_to_notify:
-            task = asyncio.ensure_future(coroutine(CLOSED, CLOSED))
-            # Prevent garbage collection before being done.
-            self._background_tasks.add(task)
-            task.add_done_callback(self._background_tasks.discard)
+            self._notify(coroutine, CLOSED, CLOSED)
+        for queue in self._queues.values():
+            queue.close()
+            self._background_tasks.add(queue.task)
+            queue.task.add_done_callback(self._background_tasks.discard)
+        self._queues.clear()
@@ -6,6 +6,8 @@ from .factories import audiosource_factory
 
 
 class AudioService(SlobsService):
+    __slots__ = ()
+
     async def get_source(self, source_id) -> Optional[AudioSource]:
         response = await self._connection.command(
             "getSource", self._prepared_params([source_id])
@@ -1,26 +1,35 @@
 from ..apibase import SlobsClass
 from .typedefs import IFader, IAudioSourceModel, MonitoringType
+from .decoders import Field, compile_decoder
 from .factories import register
 
+ifader_decoder = compile_decoder(
+    "ifader_decoder", IFader, (Field("db"), Field("deflection"), Field("mul"))
+)
+
+IAUDIOSOURCEMODEL_SCHEMA = (
+    Field("audio_mixers"),
+    Field("fader", convert=ifader_decoder),
+    Field("force_mono"),
+    Field("mixer_hidden"),
+    Field("monitoring_type", convert=MonitoringType),
+    Field("muted"),
+    Field("name"),
+    Field("source_id"),
+    Field("sync_offset"),
+)
+
+iaudiosourcemodel_decoder = compile_decoder(
+    "iaudiosourcemodel_decoder", IAudioSourceModel, IAUDIOSOURCEMODEL_SCHEMA
+)
+
 
 class AudioSource(SlobsClass):
+    __slots__ = ()
+
     async def get_model(self):
         response = await self._connection.command("getModel", self._prepared_params())
-        return IAudioSourceModel(
-            audio_mixers=response["audioMixers"],
-            fader=IFader(
-                db=response["fader"]["db"],
-                deflection=response["fader"]["deflection"],
-                mul=response["fader"]["mul"],
-            ),
-            force_mono=response["forceMono"],
-            mixer_hidden=response["mixerHidden"],
-            monitoring_type=MonitoringType(response["monitoringType"]),
-            muted=response["muted"],
-            name=response["name"],
-            source_id=response["sourceId"],
-            sync_offset=response["syncOffset"],
-        )
+        return iaudiosourcemodel_decoder(response)
 
     async def set_deflection(self, deflection):
         # I don't know what legal values are (small integers?), but illegal values
@@ -0,0 +1,152 @@
+"""
+    Declarative decoders for the JSON dicts in replies.
+
+    Each model is described by a schema: a sequence of Fields, saying which
+    JSON key fills which Python argument, and how the value is converted.
+    compile_decoder() (or compile_class_decoder(), for SlobsClasses) turns a
+    schema into a specialised function, once, at import time, so decoding a
+    reply is one pass of plain subscripts with no interpretation of the
+    schema:
+
+        IFADER_SCHEMA = (Field("db"), Field("deflection"), Field("mul"))
+        ifader_decoder = compile_decoder("ifader_decoder", IFader, IFADER_SCHEMA)
+
+    This code should not be used by the client.
+"""
+import ast
+from enum import EnumMeta
+from typing import Any, Callable, NamedTuple, Optional
+
+REQUIRED = object()
+# The default of a Field whose key must be present.
+
+
+class Field(NamedTuple):
+    name: str
+    # The keyword argument it fills.
+    key: Optional[str] = None
+    # The JSON key. None: the camelCase form of name (source_id -> sourceId).
+    convert: Optional[Callable] = None
+    # Applied to the value, e.g. another decoder. Enums are looked up in
+    # their members by value, which is quicker than calling them.
+    default: Any = REQUIRED
+    # Used when the key is missing. Must be a literal (None, "", [], 0...):
+    # it is written into the decoder, so mutable defaults are not shared.
+    fallback: Optional[str] = None
+    # Another key to read when this one is missing, instead of default.
+    connection: bool = False
+    # If True, convert is called as convert(connection, value). Only for
+    # compile_class_decoder().
+
+
+def camel_case(name: str) -> str:
+    """source_id -> sourceId. Trailing underscores (id_, async_) are dropped."""
+    first, *rest = name.rstrip("_").split("_")
+    return first + "".join(word.capitalize() for word in rest)
+
+
+def compile_decoder(name: str, build: Callable, schema) -> Callable:
+    """Return a function that decodes a JSON dict into build(...).
+
+    If build is a namedtuple whose fields are exactly the schema's, the tuple
+    is built directly, which is quicker.
+    """
+    namespace = {"build": build}
+    arguments = _arguments(name, schema, namespace, connection=False)
+    names = [field_name for field_name, _ in arguments]
+    if getattr(build, "_fields", None) is not None and set(build._fields) == set(names):
+        # A namedtuple: build the tuple directly, skipping its __new__.
+        values = dict(arguments)
+        namespace["tuple_new"] = tuple.__new__
+        source = "\n".join(
+            [f"def {name}(json_dict):", "    return tuple_new(build, ("]
+            + [f"        {values[field_name]}," for field_name in build._fields]
+            + ["    ))"]
+        )
+    else:
+        source = "\n".join(
+            [f"def {name}(json_dict):", "    return build("]
+            + _keywords(arguments)
+            + ["    )"]
+        )
+    return _define(name, source, namespace)
+
+
+def compile_class_decoder(
+    name: str, classes: dict, class_name: str, schema, instance: Callable
+) -> Callable:
+    """Return a function that decodes (connection, json_dict) into
+    classes[class_name](connection, ...), or, if the connection has an
+    identity map, into instance(connection, class_name, ...).
+
+    The class is looked up on each call, as classes are registered after the
+    decoders are compiled.
+    """
+    namespace = {"classes": classes, "class_name": class_name, "instance": instance}
+    keywords = _keywords(_arguments(name, schema, namespace, connection=True))
+    source = "\n".join(
+        [
+            f"def {name}(connection, json_dict):",
+            '    if getattr(connection, "identity_map", None) is None:',
+            "        return classes[class_name](",
+            "            connection,",
+        ]
+        + ["    " + line for line in keywords]
+        + ["        )", "    return instance(", "        connection,", "        class_name,"]
+        + keywords
+        + ["    )"]
+    )
+    return _define(name, source, namespace)
+
+
+def _arguments(name: str, schema, namespace: dict, connection: bool) -> list:
+    """The (keyword, expression) of each field of schema. Adds the names the
+    expressions use to namespace."""
+    arguments = []
+    for index, field in enumerate(schema):
+        key = field.key or camel_case(field.name)
+        if field.fallback is not None:
+            value = f"json_dict.get({key!r}, json_dict[{field.fallback!r}])"
+        elif field.default is not REQUIRED:
+            if not _is_literal(field.default):
+                raise ValueError(f"{name}: default of {field.name} is not a literal.")
+            value = f"json_dict.get({key!r}, {field.default!r})"
+        else:
+            value = f"json_dict[{key!r}]"
+        if field.convert is not None:
+            namespace[f"convert_{index}"] = field.convert
+            if isinstance(field.convert, EnumMeta):
+                # Look the member up by value; the Enum call is much slower.
+                namespace[f"members_{index}"] = field.convert._value2member_map_
+                value = (
+                    f"members_{index}[value_{index}] "
+                    f"if (value_{index} := {value}) in members_{index} "
+                    f"else convert_{index}(value_{index})"
+                )
+            elif field.connection:
+                if not connection:
+                    raise ValueError(f"{name}: {field.name} needs a connection.")
+                value = f"convert_{index}(connection, {value})"
+            else:
+                value = f"convert_{index}({value})"
+        arguments.append((field.name, value))
+    return arguments
+
+
+def _keywords(arguments) -> list[str]:
+    return [f"        {field_name}={value}," for field_name, value in arguments]
+
+
+def _define(name: str, source: str, namespace: dict) -> Callable:
+    exec(compile(source, f"<decoder {name}>", "exec"), namespace)
+    decoder = namespace[name]
+    decoder.__source__ = source
+    # Kept for debugging.
+    return decoder
+
+
+def _is_literal(value) -> bool:
+    try:
+        return ast.literal_eval(repr(value)) == value
+    except (ValueError, SyntaxError):
+        return False
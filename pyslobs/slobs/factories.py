@@ -5,7 +5,11 @@
     This code should not be used by the client, but it is shared between a
     number of SlobsService and SlobsClasses so it has been grouped together.
 """
-from .typedefs import TSceneNodeType, ITransform, IVec2, ICrop
+import json
+from collections.abc import Sequence
+
+from .decoders import Field, compile_class_decoder, compile_decoder
+from .typedefs import TSceneNodeType, ITransform, IVec2, ICrop, CompactTransform
 
 CLASSES = {}
 
@@ -14,12 +18,13 @@ def register(cls):
     CLASSES[cls.__name__] = cls
 
 
-def audiosource_factory(conn, json_dict):
-    return CLASSES["AudioSource"](
-        conn,
-        source_id=json_dict["sourceId"],
-        resource_id=json_dict["resourceId"],
-    )
+def _instance(connection, class_name, **fields):
+    # With an identity map, the same resource gives the same (refreshed) object.
+    cls = CLASSES[class_name]
+    identity_map = getattr(connection, "identity_map", None)
+    if identity_map is None or fields.get("resource_id") is None:
+        return cls(connection, **fields)
+    return identity_map.instance(cls, connection, **fields)
 
 
 def scenenode_factory(connection, json_dict):
@@ -30,104 +35,331 @@ def scenenode_factory(connection, json_dict):
         return sceneitemfolder_factory(connection, json_dict)
 
 
-def sceneitem_factory(connection, json_dict):
+def _class_decoder(name, class_name, schema):
+    return compile_class_decoder(name, CLASSES, class_name, schema, _instance)
+
+
+AUDIOSOURCE_SCHEMA = (Field("source_id"), Field("resource_id"))
+
+audiosource_factory = _class_decoder(
+    "audiosource_factory", "AudioSource", AUDIOSOURCE_SCHEMA
+)
+
+
+def _position(position):
     # We see an inconsistency in the API here.
     # Sometimes the position is a list [x, y] and sometimes a dict(x=_, y=_)
-    if isinstance(json_dict["transform"]["position"], list):
-        transform_position = (
-            IVec2(
-                x=json_dict["transform"]["position"][0],
-                y=json_dict["transform"]["position"][1],
-            ),
-        )
+    if position.__class__ is list:
+        return IVec2(*position)
+    return IVec2(position["x"], position["y"])
+
+
+ivec2_decoder = compile_decoder("ivec2_decoder", IVec2, (Field("x"), Field("y")))
+
+icrop_decoder = compile_decoder(
+    "icrop_decoder",
+    ICrop,
+    (Field("bottom"), Field("left"), Field("right"), Field("top")),
+)
+
+ITRANSFORM_SCHEMA = (
+    Field("crop", convert=icrop_decoder),
+    Field("position", convert=_position),
+    Field("rotation"),
+    Field("scale", convert=ivec2_decoder),
+)
+
+itransform_decoder = compile_decoder(
+    "itransform_decoder", ITransform, ITRANSFORM_SCHEMA
+)
+
+
+def _compact_transform(transform):
+    crop = transform["crop"]
+    position = transform["position"]
+    if position.__class__ is list:
+        position_x, position_y = position
     else:
-        transform_position = IVec2(**json_dict["transform"]["position"])
+        position_x, position_y = position["x"], position["y"]
+    scale = transform["scale"]
+    return CompactTransform(
+        crop["bottom"],
+        crop["left"],
+        crop["right"],
+        crop["top"],
+        position_x,
+        position_y,
+        transform["rotation"],
+        scale["x"],
+        scale["y"],
+    )
 
-    return CLASSES["SceneItem"](
-        connection=connection,
-        resource_id=json_dict["resourceId"],
-        source_id=json_dict["sourceId"],
-        id_=json_dict["id"],
+
+def _sceneitem_schema(transform_decoder):
+    return (
+        Field("resource_id"),
+        Field("source_id"),
+        Field("id_"),
         # Spec says nodeId should be present, but found it wasn't.
-        node_id=json_dict.get("nodeId", None),
-        parent_id=json_dict["parentId"],
-        scene_id=json_dict["sceneId"],
-        scene_node_type=TSceneNodeType(json_dict["sceneNodeType"]),
-        name=json_dict["name"],
-        locked=json_dict["locked"],
-        recording_visible=json_dict["recordingVisible"],
-        scene_item_id=json_dict["sceneItemId"],
-        stream_visible=json_dict["streamVisible"],
-        transform=ITransform(
-            crop=ICrop(**json_dict["transform"]["crop"]),
-            position=transform_position,
-            rotation=json_dict["transform"]["rotation"],
-            scale=IVec2(**json_dict["transform"]["scale"]),
-        ),
-        visible=json_dict["visible"],
+        Field("node_id", default=None),
+        Field("parent_id"),
+        Field("scene_id"),
+        Field("scene_node_type", convert=TSceneNodeType),
+        Field("name"),
+        Field("locked"),
+        Field("recording_visible"),
+        Field("scene_item_id"),
+        Field("stream_visible"),
+        Field("transform", convert=transform_decoder),
+        Field("visible"),
     )
 
 
-def sceneitemfolder_factory(connection, json_dict):
-    # Found children_ids as part of the dict, but not the spec.
-    # Might like to add in if useful to avoid a call.
-    return CLASSES["SceneItemFolder"](
-        connection=connection,
-        # resourceId/sourceId oddly not part of the returned dict.
-        # fall back to id? Doesn't seem to work.
-        resource_id=json_dict.get("resourceId", json_dict["id"]),
-        source_id=json_dict.get("sourceId"),
-        id_=json_dict["id"],
-        name=json_dict["name"],
-        # Spec says nodeId should be present, but found it wasn't.
-        node_id=json_dict.get("nodeId", None),
-        parent_id=json_dict["parentId"],
-        scene_id=json_dict["sceneId"],
-        scene_node_type=TSceneNodeType(json_dict["sceneNodeType"]),
+_sceneitem_decoder = _class_decoder(
+    "sceneitem_decoder", "SceneItem", _sceneitem_schema(itransform_decoder)
+)
+_compact_sceneitem_decoder = _class_decoder(
+    "compact_sceneitem_decoder", "SceneItem", _sceneitem_schema(_compact_transform)
+)
+
+
+def sceneitem_factory(connection, json_dict):
+    if getattr(connection, "compact_transforms", False):
+        return _compact_sceneitem_decoder(connection, json_dict)
+    return _sceneitem_decoder(connection, json_dict)
+
+
+# Found children_ids as part of the dict, but not the spec.
+# Might like to add in if useful to avoid a call.
+SCENEITEMFOLDER_SCHEMA = (
+    # resourceId/sourceId oddly not part of the returned dict.
+    # fall back to id? Doesn't seem to work.
+    Field("resource_id", fallback="id"),
+    Field("source_id", default=None),
+    Field("id_"),
+    Field("name"),
+    # Spec says nodeId should be present, but found it wasn't.
+    Field("node_id", default=None),
+    Field("parent_id"),
+    Field("scene_id"),
+    Field("scene_node_type", convert=TSceneNodeType),
+)
+
+sceneitemfolder_factory = _class_decoder(
+    "sceneitemfolder_factory", "SceneItemFolder", SCENEITEMFOLDER_SCHEMA
+)
+
+SOURCE_SCHEMA = (
+    # resource_ids are missing after a deletion.
+    Field("resource_id", default=None),
+    Field("source_id", default=None),
+    Field("async_"),
+    Field("audio"),
+    Field("channel", default=None),
+    Field("configurable", default=None),
+    Field("do_not_duplicate"),
+    Field("height"),
+    Field("id_"),
+    Field("muted"),
+    Field("name_"),
+    Field("type_"),
+    Field("video"),
+    Field("width"),
+)
+
+source_factory = _class_decoder("source_factory", "Source", SOURCE_SCHEMA)
+
+
+class LazyNodes(Sequence):
+    """A Scene's nodes, as a read-only list. Each node is only built from its
+    JSON dict when it is first read, as many callers only want the scene's
+    name or id.
+
+    With an identity map, the nodes are built at once: built later, they would
+    refresh the shared objects with what the scene held when it was fetched.
+    """
+
+    __slots__ = ("_connection", "_json_nodes", "_nodes")
+
+    def __init__(self, connection, json_nodes: list):
+        self._connection = connection
+        if getattr(connection, "identity_map", None) is not None:
+            self._json_nodes = None
+            self._nodes = [scenenode_factory(connection, node) for node in json_nodes]
+        else:
+            self._json_nodes = list(json_nodes)
+            # A copy, as the reply may be shared. Entries are dropped once built.
+            self._nodes = [None] * len(json_nodes)
+        # Built nodes, by index; None until read.
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self._nodes)))]
+        node = self._nodes[index]
+        if node is None:
+            node = self._nodes[index] = scenenode_factory(
+                self._connection, self._json_nodes[index]
+            )
+            self._json_nodes[index] = None
+        return node
+
+    def __iter__(self):
+        for index in range(len(self._nodes)):
+            yield self[index]
+
+    def __eq__(self, other):
+        if isinstance(other, (LazyNodes, list)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({list(self)!r})"
+
+
+SCENE_SCHEMA = (
+    # resource_ids are missing after a deletion.
+    Field("resource_id", default=None),
+    Field("source_id", key="id"),
+    # Names are sometimes missing. Fill in an empty name.
+    Field("name", default=""),
+    Field("id"),
+    # Having trouble with these nodes not being gettable. Not sure why.
+    Field("nodes", convert=LazyNodes, connection=True),
+)
+
+scene_factory = _class_decoder("scene_factory", "Scene", SCENE_SCHEMA)
+
+# getModel replies hold a model, which has no resourceId. It is taken from the
+# object the model was fetched for or, for a scene's nodes, built from the ids.
+
+
+def _node_resource_id(json_node):
+    if json_node["sceneNodeType"] == "folder":
+        class_name, ids = "SceneItemFolder", [json_node["sceneId"], json_node["id"]]
+    else:
+        class_name = "SceneItem"
+        ids = [json_node["sceneId"], json_node["id"], json_node["sourceId"]]
+    return class_name + json.dumps(ids, separators=(",", ":"))
+
+
+def scene_model_factory(connection, json_dict, resource_id):
+    nodes = [
+        node if "resourceId" in node else dict(node, resourceId=_node_resource_id(node))
+        for node in json_dict["nodes"]
+    ]
+    return scene_factory(
+        connection, dict(json_dict, resourceId=resource_id, nodes=nodes)
     )
 
 
-def source_factory(connection, json_dict):
-    return CLASSES["Source"](
+def scenenode_model_factory(connection, json_dict, resource_id):
+    return scenenode_factory(connection, dict(json_dict, resourceId=resource_id))
+
+
+def source_model_factory(connection, json_dict, resource_id):
+    return source_factory(connection, dict(json_dict, resourceId=resource_id))
+
+
+# CompactMode replies hold little more than the resourceId. The ids are taken
+# from it; other fields are None (a Scene's nodes, empty) until hydrated. An
+# object already in the identity map is returned as it is, rather than emptied.
+
+
+def _resource_ids(resource_id):
+    # e.g. 'SceneItem["a","b","c"]' -> ["a", "b", "c"]
+    return json.loads(resource_id[resource_id.index("[") :])
+
+
+def _compact_instance(connection, class_name, resource_id, **fields):
+    identity_map = getattr(connection, "identity_map", None)
+    if identity_map is not None:
+        existing = identity_map.get(class_name, resource_id)
+        if existing is not None:
+            return existing
+    return _instance(connection, class_name, resource_id=resource_id, **fields)
+
+
+def compact_scene_factory(connection, json_dict):
+    resource_id = json_dict["resourceId"]
+    (id_,) = _resource_ids(resource_id)
+    return _compact_instance(
         connection,
-        # resource_ids are missing after a deletion.
-        resource_id=json_dict.get("resourceId", None),
-        source_id=json_dict.get("sourceId", None),
-        async_=json_dict["async"],
-        audio=json_dict["audio"],
-        channel=json_dict.get("channel", None),
-        configurable=json_dict.get("configurable", None),
-        do_not_duplicate=json_dict["doNotDuplicate"],
-        height=json_dict["height"],
-        id_=json_dict["id"],
-        muted=json_dict["muted"],
-        name_=json_dict["name"],
-        type_=json_dict["type"],
-        video=json_dict["video"],
-        width=json_dict["width"],
+        "Scene",
+        resource_id,
+        source_id=id_,
+        name=json_dict.get("name"),
+        id=id_,
+        nodes=[],
     )
 
 
-def scene_factory(connection, json_dict):
-    return CLASSES["Scene"](
+def compact_source_factory(connection, json_dict):
+    resource_id = json_dict["resourceId"]
+    (source_id,) = _resource_ids(resource_id)
+    return _compact_instance(
         connection,
-        # resource_ids are missing after a deletion.
-        resource_id=json_dict.get("resourceId", None),
-        source_id=json_dict["id"],
-        # Names are sometimes missing. Fill in an empty name.
-        name=json_dict.get("name", ""),
-        id=json_dict["id"],
-        nodes=[
-            # Having trouble with these nodes not being gettable. Not sure why.
-            scenenode_factory(connection, node)
-            for node in json_dict["nodes"]
-        ],
+        "Source",
+        resource_id,
+        source_id=source_id,
+        async_=None,
+        audio=None,
+        channel=None,
+        configurable=None,
+        do_not_duplicate=None,
+        height=None,
+        id_=source_id,
+        muted=None,
+        name_=json_dict.get("name"),
+        type_=None,
+        video=None,
+        width=None,
     )
 
 
-def selection_factory(connection, json_dict):
-    return CLASSES["Selection"](
+def compact_scenenode_factory(connection, json_dict):
+    resource_id = json_dict["resourceId"]
+    ids = _resource_ids(resource_id)
+    if resource_id.startswith("SceneItemFolder["):
+        scene_id, id_ = ids
+        return _compact_instance(
+            connection,
+            "SceneItemFolder",
+            resource_id,
+            source_id=None,
+            id_=id_,
+            name=json_dict.get("name"),
+            node_id=None,
+            parent_id=None,
+            scene_id=scene_id,
+            scene_node_type=TSceneNodeType.FOLDER,
+        )
+    scene_id, id_, source_id = ids
+    return _compact_instance(
         connection,
-        # resource_ids are missing after a deletion.
-        resource_id=json_dict.get("resourceId", None),
+        "SceneItem",
+        resource_id,
+        source_id=source_id,
+        id_=id_,
+        node_id=None,
+        parent_id=None,
+        scene_id=scene_id,
+        scene_node_type=TSceneNodeType.ITEM,
+        name=json_dict.get("name"),
+        locked=None,
+        recording_visible=None,
+        scene_item_id=id_,
+        stream_visible=None,
+        transform=None,
+        visible=None,
     )
+
+
+SELECTION_SCHEMA = (
+    # resource_ids are missing after a deletion.
+    Field("resource_id", default=None),
+)
+
+selection_factory = _class_decoder("selection_factory", "Selection", SELECTION_SCHEMA)
@@ -2,6 +2,7 @@ from datetime import datetime
 from typing import Dict
 
 from ..apibase import SlobsService
+from .decoders import Field, compile_decoder
 from .typedefs import (
     INotificationModel,
     NotificationType,
@@ -14,23 +15,40 @@ from .typedefs import (
 )
 
 
+def _from_milliseconds(timestamp):
+    return datetime.fromtimestamp(timestamp / 1000)
+
+
+INOTIFICATIONMODEL_SCHEMA = (
+    Field("action", default=None),
+    Field("code", default=None),
+    Field("data", default=None),
+    Field("date", convert=_from_milliseconds),
+    Field("id"),
+    Field("lifetime", key="lifeTime"),
+    Field("message"),
+    Field("play_sound"),
+    Field("show_time"),
+    Field("subtype", key="subType", convert=NotificationSubType),
+    Field("type", convert=NotificationType),
+    Field("unread"),
+)
+
+inotificationmodel_decoder = compile_decoder(
+    "inotificationmodel_decoder", INotificationModel, INOTIFICATIONMODEL_SCHEMA
+)
+
+inotificationsettings_decoder = compile_decoder(
+    "inotificationsettings_decoder",
+    INotificationSettings,
+    (Field("enabled"), Field("play_sound")),
+)
+
+
 class NotificationsService(SlobsService):
-    @staticmethod
-    def _inotification_model_factory(json_dict):
-        return INotificationModel(
-            action=json_dict.get("action", None),
-            code=json_dict.get("code", None),
-            data=json_dict.get("data", None),
-            date=datetime.fromtimestamp(json_dict["date"] / 1000),
-            id=json_dict["id"],
-            lifetime=json_dict["lifeTime"],
-            message=json_dict["message"],
-            play_sound=json_dict["playSound"],
-            show_time=json_dict["showTime"],
-            subtype=NotificationSubType(json_dict["subType"]),
-            type=NotificationType(json_dict["type"]),
-            unread=json_dict["unread"],
-        )
+    __slots__ = ()
+
+    _inotification_model_factory = staticmethod(inotificationmodel_decoder)
 
     async def apply_action(self, notification_id):
         response = await self._connection.command(
@@ -60,9 +78,7 @@ class NotificationsService(SlobsService):
         response = await self._connection.command(
             "getSettings", self._prepared_params()
         )
-        return INotificationSettings(
-            enabled=response["enabled"], play_sound=response["playSound"]
-        )
+        return inotificationsettings_decoder(response)
 
     async def get_unread(self, type_: NotificationType):
         response = await self._connection.command(
@@ -1,14 +1,23 @@
 from ..apibase import SlobsService
+from .decoders import Field, compile_decoder
 from .typedefs import IPerformanceState
 
+IPERFORMANCESTATE_SCHEMA = (
+    Field("cpu", key="CPU"),
+    Field("bandwidth", key="numberDroppedFrames"),
+    Field("frame_rate", key="numberDroppedFrames"),
+    Field("number_dropped_frames"),
+    Field("percentage_dropped_frames"),
+)
+
+iperformancestate_decoder = compile_decoder(
+    "iperformancestate_decoder", IPerformanceState, IPERFORMANCESTATE_SCHEMA
+)
+
 
 class PerformanceService(SlobsService):
+    __slots__ = ()
+
     async def get_model(self):
         response = await self._connection.command("getModel", self._prepared_params())
-        return IPerformanceState(
-            cpu=response["CPU"],
-            bandwidth=response["numberDroppedFrames"],
-            frame_rate=response["numberDroppedFrames"],
-            number_dropped_frames=response["numberDroppedFrames"],
-            percentage_dropped_frames=response["percentageDroppedFrames"],
-        )
+        return iperformancestate_decoder(response)
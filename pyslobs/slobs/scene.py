@@ -12,7 +12,9 @@ else:
 
 from .source import Source
 from .factories import (
+    compact_scenenode_factory,
     scene_factory,
+    scene_model_factory,
     scenenode_factory,
     sceneitem_factory,
     sceneitemfolder_factory,
@@ -24,6 +26,10 @@ from .typedefs import ISceneNodeAddOptions, TSourceType
 
 
 class Scene(SlobsClass):
+    __slots__ = ("_name", "_id", "_nodes")
+
+    _model_factory = staticmethod(scene_model_factory)
+
     def __init__(
         self,
         connection,
@@ -132,7 +138,7 @@ class Scene(SlobsClass):
 
     async def get_model(self):
         response = await self._connection.command("getModel", self._prepared_params())
-        return scene_factory(self._connection, response)
+        return scene_model_factory(self._connection, response, self._resource_id)
 
     async def get_nested_items(self):  # -> Source
         response = await self._connection.command(
@@ -152,6 +158,14 @@ class Scene(SlobsClass):
         )
         return [source_factory(self._connection, source) for source in response]
 
+    async def iter_nested_sources(self):
+        # As get_nested_sources, one at a time (see
+        # SlobsConnection.command_stream).
+        async for source in self._connection.command_stream(
+            "getNestedSources", self._prepared_params()
+        ):
+            yield source_factory(self._connection, source)
+
     async def get_node(self, scene_node_id):  # -> Source
         response = await self._connection.command(
             "getNode", self._prepared_params([scene_node_id])
@@ -167,13 +181,28 @@ class Scene(SlobsClass):
         else:
             return scenenode_factory(self._connection, response)
 
-    async def get_nodes(self):  # -> Source
-        response = await self._connection.command("getNodes", self._prepared_params())
-        result = [scenenode_factory(self._connection, source) for source in response]
+    async def get_nodes(self, compact: Optional[bool] = None):  # -> Source
+        # compact: use CompactMode (see hydrate). None: the connection's default.
+        compact = self._compact(compact)
+        response = await self._connection.command(
+            "getNodes", self._prepared_params(compact=compact)
+        )
+        factory = compact_scenenode_factory if compact else scenenode_factory
+        result = [factory(self._connection, source) for source in response]
         # Update attributes as a side effect
         self._nodes = result
         return result
 
+    async def iter_nodes(self, compact: Optional[bool] = None):
+        # As get_nodes, one at a time (see SlobsConnection.command_stream).
+        # Doesn't update the nodes attribute.
+        compact = self._compact(compact)
+        factory = compact_scenenode_factory if compact else scenenode_factory
+        async for node in self._connection.command_stream(
+            "getNodes", self._prepared_params(compact=compact)
+        ):
+            yield factory(self._connection, node)
+
     async def get_root_nodes(self):
         response = await self._connection.command(
             "getRootNodes", self._prepared_params()
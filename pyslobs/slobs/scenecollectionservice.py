@@ -5,27 +5,46 @@ from .typedefs import (
     ISceneCollectionSchema,
     ISceneCollectionCreateOptions,
 )
+from .decoders import Field, compile_decoder
 from .factories import source_factory, sceneitem_factory
 
+iscenecollectionmanifestentry_factory = compile_decoder(
+    "iscenecollectionmanifestentry_factory",
+    ISceneCollectionsManifestEntry,
+    (Field("id"), Field("name")),
+)
+
+ISCENECOLLECTIONSCHEMA_SCHEMA = (
+    Field("id"),
+    Field("name"),
+    # The field is called scenes, but doesn't actually contain scenes.
+    # Appears to be a novel type that references scenes. Returning the raw dict.
+    Field("scenes"),
+    # The field is called sources, but doesn't actually contain sources.
+    # Appears to be a novel type that references sources. Returning the raw dict.
+    Field("sources", convert=lambda sources: [sources]),
+)
 
-def iscenecollectionmanifestentry_factory(json_dict):
-    return ISceneCollectionsManifestEntry(id=json_dict["id"], name=json_dict["name"])
+_iscenecollectionschema_decoder = compile_decoder(
+    "iscenecollectionschema_decoder",
+    ISceneCollectionSchema,
+    ISCENECOLLECTIONSCHEMA_SCHEMA,
+)
 
 
 def iscenecollectionschema_factory(connection, json_dict):
-    return ISceneCollectionSchema(
-        id=json_dict["id"],
-        name=json_dict["name"],
-        # The field is called scenes, but doesn't actually contain scenes.
-        # Appears to be a novel type that references scenes. Returning the raw dict.
-        scenes=json_dict["scenes"],
-        # The field is called sources, but doesn't actually contain sources.
-        # Appears to be a novel type that references sources. Returning the raw dict.
-        sources=[json_dict["sources"]],
-    )
+    return _iscenecollectionschema_decoder(json_dict)
 
 
 class SceneCollectionsService(SlobsService):
+    __slots__ = (
+        "collection_added",
+        "collection_removed",
+        "collection_switched",
+        "collection_updated",
+        "collection_will_switch",
+    )
+
     def __init__(self, connection):
         super().__init__(connection)
 
@@ -78,6 +97,14 @@ class SceneCollectionsService(SlobsService):
             for subitem in response
         ]
 
+    async def iter_scene_collections_schema(self):
+        # As fetch_scene_collections_schema, one at a time (see
+        # SlobsConnection.command_stream).
+        async for subitem in self._connection.command_stream(
+            "fetchSceneCollectionsSchema", self._prepared_params([])
+        ):
+            yield iscenecollectionschema_factory(self._connection, subitem)
+
     async def load(self, id: str) -> None:
         response = await self._connection.command("load", self._prepared_params([id]))
         self._check_empty(response)
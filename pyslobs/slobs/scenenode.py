@@ -4,6 +4,7 @@ from typing import Any, Optional, TYPE_CHECKING
 
 from .factories import (
     scenenode_factory,
+    scenenode_model_factory,
     sceneitem_factory,
     sceneitemfolder_factory,
     scene_factory,
@@ -12,12 +13,22 @@ from .factories import (
     register,
 )
 from ..apibase import SlobsClass
-from .typedefs import ITransform, TSceneNodeType, ISceneNodeModel, IVec2
+from .typedefs import (
+    CompactTransform,
+    ISceneNodeModel,
+    ITransform,
+    IVec2,
+    TSceneNodeType,
+)
 if TYPE_CHECKING:
     from .selection import Selection
 
 
 class SceneNode(SlobsClass):
+    __slots__ = ("_id", "_node_id", "_parent_id", "_scene_id", "_scene_node_type")
+
+    _model_factory = staticmethod(scenenode_model_factory)
+
     def __init__(
         self,
         connection,
@@ -84,7 +95,7 @@ class SceneNode(SlobsClass):
 
     async def get_model(self):  # -> ISceneNodeModel:
         response = await self._connection.command("getModel", self._prepared_params())
-        return scenenode_factory(self._connection, response)
+        return scenenode_model_factory(self._connection, response, self._resource_id)
 
     async def get_next_item(self):  # -> ISceneItem:
         response = await self._connection.command(
@@ -176,6 +187,8 @@ class SceneNode(SlobsClass):
 
 
 class SceneItemFolder(SceneNode):
+    __slots__ = ("_name",)
+
     def __init__(
         self,
         connection,
@@ -260,6 +273,16 @@ class SceneItemFolder(SceneNode):
 
 
 class SceneItem(SceneNode):
+    __slots__ = (
+        "_locked",
+        "_name",
+        "_recording_visible",
+        "_scene_item_id",
+        "_stream_visible",
+        "_transform",
+        "_visible",
+    )
+
     def __init__(
         self,
         connection,
@@ -387,12 +410,19 @@ class SceneItem(SceneNode):
             "setScale", self._prepared_params(params)
         )
         self._check_empty(response)
-        self._transform = ITransform(
+        if self._transform is None:
+            return  # From a CompactMode reply: unknown until hydrated.
+        transform = ITransform(
             crop=self._transform.crop,
             position=origin if origin else self.transform.position,
             rotation=self._transform.rotation,
             scale=new_scale_model,
         )
+        if isinstance(self._transform, CompactTransform):
+            transform = CompactTransform(
+                *transform.crop, *transform.position, transform.rotation, *transform.scale
+            )
+        self._transform = transform
 
     async def set_settings(self, settings: dict[Any, Any]) -> None:
         params = {}
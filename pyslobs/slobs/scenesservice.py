@@ -1,10 +1,21 @@
+from typing import Optional
+
 from ..apibase import SlobsService, Event
 from .scene import Scene
-from .factories import scene_factory
+from .factories import compact_scene_factory, scene_factory
 from .typedefs import ISceneModel
 
 
 class ScenesService(SlobsService):
+    __slots__ = (
+        "item_added",
+        "item_removed",
+        "item_updated",
+        "scene_added",
+        "scene_removed",
+        "scene_switched",
+    )
+
     def __init__(self, connection):
         super().__init__(connection)
 
@@ -41,9 +52,24 @@ class ScenesService(SlobsService):
         )
         return scene_factory(self._connection, response)
 
-    async def get_scenes(self):
-        response = await self._connection.command("getScenes", self._prepared_params())
-        return [scene_factory(self._connection, subitem) for subitem in response]
+    async def get_scenes(self, compact: Optional[bool] = None):
+        # compact: use CompactMode (see hydrate). None: the connection's default.
+        compact = self._compact(compact)
+        response = await self._connection.command(
+            "getScenes", self._prepared_params(compact=compact)
+        )
+        factory = compact_scene_factory if compact else scene_factory
+        return [factory(self._connection, subitem) for subitem in response]
+
+    async def iter_scenes(self, compact: Optional[bool] = None):
+        # As get_scenes, but yields each scene as soon as it is decoded, without
+        # decoding the whole response first (see SlobsConnection.command_stream).
+        compact = self._compact(compact)
+        factory = compact_scene_factory if compact else scene_factory
+        async for subitem in self._connection.command_stream(
+            "getScenes", self._prepared_params(compact=compact)
+        ):
+            yield factory(self._connection, subitem)
 
     # Warning: In Studio Mode, this won't take immediate effect.
     # See TransitionsService to detect Studio Mode and to execute the transition.
@@ -20,6 +20,8 @@ from .factories import register
 
 
 class Selection(SlobsBase, SelectionBase):
+    __slots__ = ()
+
     def __init__(self, connection, resource_id):
         SlobsBase.__init__(self, connection, resource_id=resource_id)
         SelectionBase.__init__(self)
@@ -1,6 +1,7 @@
 from __future__ import annotations  # Postponed eval of annotations. Fixed in 3.10
 from typing import Optional
 
+from .decoders import Field, compile_decoder
 from .typedefs import IRectangle, ISelectionModel, IVec2, _translate_dict
 from .scenenode import SceneNode
 from .factories import (
@@ -14,8 +15,22 @@ from .factories import (
 """ SelectionService and Selection share a lot in common.
     A mixin to support both. """
 
+irectangle_decoder = compile_decoder(
+    "irectangle_decoder",
+    IRectangle,
+    (Field("x"), Field("y"), Field("width"), Field("height")),
+)
+
+iselectionmodel_decoder = compile_decoder(
+    "iselectionmodel_decoder",
+    ISelectionModel,
+    (Field("last_selected_id", default=[]), Field("selected_ids")),
+)
+
 
 class SelectionBase:
+    __slots__ = ()
+
     async def scene_id(self) -> str:
         response = await self._connection.command("sceneId", self._prepared_params())
         return response
@@ -70,12 +85,7 @@ class SelectionBase:
             "getBoundingRect", self._prepared_params([])
         )
         if response:
-            return IRectangle(
-                x=response["x"],
-                y=response["y"],
-                width=response["width"],
-                height=response["height"],
-            )
+            return irectangle_decoder(response)
         else:
             return None
 
@@ -121,10 +131,7 @@ class SelectionBase:
 
     async def get_model(self) -> ISelectionModel:
         response = await self._connection.command("getModel", self._prepared_params())
-        return ISelectionModel(
-            last_selected_id=response.get("lastSelectedId", []),
-            selected_ids=response["selectedIds"],
-        )
+        return iselectionmodel_decoder(response)
 
     async def get_root_nodes(self) -> list[SceneNode]:
         response = await self._connection.command(
@@ -232,10 +239,7 @@ class SelectionBase:
         response = await self._connection.command(
             "selectAll", self._prepared_params([])
         )
-        return ISelectionModel(
-            last_selected_id=response.get("lastSelectedId", []),
-            selected_ids=response["selectedIds"],
-        )
+        return iselectionmodel_decoder(response)
 
     async def set_content_crop(self) -> None:
         response = await self._connection.command(
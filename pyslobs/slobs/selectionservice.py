@@ -4,6 +4,8 @@ from .selection import Selection  # For the side-effects
 
 
 class SelectionService(SlobsService, SelectionBase):
+    __slots__ = ()
+
     def __init__(self, connection):
         SlobsService.__init__(self, connection)
         SelectionBase.__init__(self)
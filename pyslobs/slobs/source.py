@@ -3,13 +3,50 @@ from typing import Optional, Any, Dict
 
 from .typedefs import TObsFormData, TSourceType, ISourceModel
 from ..apibase import SlobsClass
-from .factories import source_factory, register
+from .decoders import Field, compile_decoder
+from .factories import source_factory, source_model_factory, register
+
+ISOURCEMODEL_SCHEMA = (
+    Field("async_"),
+    Field("audio"),
+    Field("channel", default=None),
+    Field("do_not_duplicate"),
+    Field("height"),
+    Field("id"),
+    Field("muted"),
+    Field("name"),
+    Field("source_id"),
+    Field("type_"),
+    Field("video"),
+    Field("width"),
+)
+
+isourcemodel_decoder = compile_decoder(
+    "isourcemodel_decoder", ISourceModel, ISOURCEMODEL_SCHEMA
+)
 
 
 class Source(SlobsClass):
     # There is an undocumented Configurable field. Sharing here without knowing what
     # it means.
 
+    __slots__ = (
+        "_async",
+        "_audio",
+        "_channel",
+        "_configurable",
+        "_do_not_duplicate",
+        "_height",
+        "_id",
+        "_muted",
+        "_name",
+        "_type",
+        "_video",
+        "_width",
+    )
+
+    _model_factory = staticmethod(source_model_factory)
+
     def __init__(
         self,
         connection,
@@ -101,20 +138,7 @@ class Source(SlobsClass):
 
     async def get_model(self) -> ISourceModel:
         response = await self._connection.command("getModel", self._prepared_params())
-        return ISourceModel(
-            async_=response["async"],
-            audio=response["audio"],
-            channel=response.get("channel", None),
-            do_not_duplicate=response["doNotDuplicate"],
-            height=response["height"],
-            id=response["id"],
-            muted=response["muted"],
-            name=response["name"],
-            source_id=response["sourceId"],
-            type_=response["type"],
-            video=response["video"],
-            width=response["width"],
-        )
+        return isourcemodel_decoder(response)
 
     async def get_properties_form_data(self) -> TObsFormData:
         response = await self._connection.command(
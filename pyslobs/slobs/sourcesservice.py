@@ -3,10 +3,17 @@ from typing import Optional, Dict, List
 from ..apibase import SlobsService, Event
 from .source import Source
 from .typedefs import TSourceType, IObsListOption, ISourceAddOptions
-from .factories import source_factory
+from .decoders import Field, compile_decoder
+from .factories import compact_source_factory, source_factory
+
+iobslistoption_decoder = compile_decoder(
+    "iobslistoption_decoder", IObsListOption, (Field("value"), Field("description"))
+)
 
 
 class SourcesService(SlobsService):
+    __slots__ = ("source_added", "source_removed", "source_updated")
+
     def __init__(self, connection):
         super().__init__(connection)
 
@@ -48,10 +55,7 @@ class SourcesService(SlobsService):
         response = await self._connection.command(
             "getAvailableSourcesTypesList", self._prepared_params([])
         )
-        return [
-            IObsListOption(value=subitem["value"], description=subitem["description"])
-            for subitem in response
-        ]
+        return [iobslistoption_decoder(subitem) for subitem in response]
 
     async def get_source(self, source_id: str) -> Source:
         response = await self._connection.command(
@@ -59,11 +63,23 @@ class SourcesService(SlobsService):
         )
         return source_factory(self._connection, response)
 
-    async def get_sources(self) -> List[Source]:
+    async def get_sources(self, compact: Optional[bool] = None) -> List[Source]:
+        # compact: use CompactMode (see hydrate). None: the connection's default.
+        compact = self._compact(compact)
         response = await self._connection.command(
-            "getSources", self._prepared_params([])
+            "getSources", self._prepared_params([], compact=compact)
         )
-        return [source_factory(self._connection, subitem) for subitem in response]
+        factory = compact_source_factory if compact else source_factory
+        return [factory(self._connection, subitem) for subitem in response]
+
+    async def iter_sources(self, compact: Optional[bool] = None):
+        # As get_sources, one at a time (see SlobsConnection.command_stream).
+        compact = self._compact(compact)
+        factory = compact_source_factory if compact else source_factory
+        async for subitem in self._connection.command_stream(
+            "getSources", self._prepared_params([], compact=compact)
+        ):
+            yield factory(self._connection, subitem)
 
     async def get_sources_by_name(self, name: str) -> List[Source]:
         response = await self._connection.command(
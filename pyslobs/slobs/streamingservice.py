@@ -1,8 +1,28 @@
 from ..apibase import SlobsService, Event
+from .decoders import Field, compile_decoder
 from .typedefs import IStreamingState, _convert_time
 
+ISTREAMINGSTATE_SCHEMA = (
+    Field("recording_status"),
+    Field("recording_status_time", convert=_convert_time),
+    Field("replay_buffer_status"),
+    Field("replay_buffer_status_time", convert=_convert_time),
+    Field("streaming_status"),
+    Field("streaming_status_time", convert=_convert_time),
+)
+
+istreamingstate_decoder = compile_decoder(
+    "istreamingstate_decoder", IStreamingState, ISTREAMINGSTATE_SCHEMA
+)
+
 
 class StreamingService(SlobsService):
+    __slots__ = (
+        "recording_status_change",
+        "replay_buffer_status_change",
+        "streaming_status_change",
+    )
+
     def __init__(self, connection):
         super().__init__(connection)
 
@@ -19,14 +39,7 @@ class StreamingService(SlobsService):
 
     async def get_model(self):
         response = await self._connection.command("getModel", self._prepared_params())
-        return IStreamingState(
-            recording_status=response["recordingStatus"],
-            recording_status_time=_convert_time(response["recordingStatusTime"]),
-            replay_buffer_status=response["replayBufferStatus"],
-            replay_buffer_status_time=_convert_time(response["replayBufferStatusTime"]),
-            streaming_status=response["streamingStatus"],
-            streaming_status_time=_convert_time(response["streamingStatusTime"]),
-        )
+        return istreamingstate_decoder(response)
 
     async def save_replay(self):
         response = await self._connection.command("saveReplay", self._prepared_params())
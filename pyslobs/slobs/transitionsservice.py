@@ -1,8 +1,17 @@
 from ..apibase import SlobsService, Event
+from .decoders import Field, compile_decoder
 from .typedefs import ITransitionsServiceState
 
+itransitionsservicestate_decoder = compile_decoder(
+    "itransitionsservicestate_decoder",
+    ITransitionsServiceState,
+    (Field("studio_mode"),),
+)
+
 
 class TransitionsService(SlobsService):
+    __slots__ = ("studio_mode_changed",)
+
     def __init__(self, connection):
         super().__init__(connection)
 
@@ -32,4 +41,4 @@ class TransitionsService(SlobsService):
 
     async def get_model(self) -> ITransitionsServiceState:
         response = await self._connection.command("getModel", self._prepared_params())
-        return ITransitionsServiceState(studio_mode=response["studioMode"])
+        return itransitionsservicestate_decoder(response)
@@ -145,3 +145,76 @@ ISelectionModel = namedtuple("ISelectionModel", "last_selected_id selected_ids")
 
 IVec2 = namedtuple("IVec2", "x y")
 ICrop = namedtuple("ICrop", "bottom left right top")
+
+
+class CompactTransform:
+    """A scene item's transform, stored as nine numbers in one slotted object,
+    rather than as an ITransform holding an ICrop and two IVec2s.
+
+    Used instead of ITransform when ConnectionConfig.compact_transforms is set.
+    Reads like an ITransform (crop, position, rotation, scale, and unpacking),
+    but crop, position and scale are built on each access.
+    """
+
+    __slots__ = (
+        "crop_bottom",
+        "crop_left",
+        "crop_right",
+        "crop_top",
+        "position_x",
+        "position_y",
+        "rotation",
+        "scale_x",
+        "scale_y",
+    )
+
+    def __init__(
+        self,
+        crop_bottom,
+        crop_left,
+        crop_right,
+        crop_top,
+        position_x,
+        position_y,
+        rotation,
+        scale_x,
+        scale_y,
+    ):
+        self.crop_bottom = crop_bottom
+        self.crop_left = crop_left
+        self.crop_right = crop_right
+        self.crop_top = crop_top
+        self.position_x = position_x
+        self.position_y = position_y
+        self.rotation = rotation
+        self.scale_x = scale_x
+        self.scale_y = scale_y
+
+    @property
+    def crop(self) -> ICrop:
+        return ICrop(self.crop_bottom, self.crop_left, self.crop_right, self.crop_top)
+
+    @property
+    def position(self) -> IVec2:
+        return IVec2(self.position_x, self.position_y)
+
+    @property
+    def scale(self) -> IVec2:
+        return IVec2(self.scale_x, self.scale_y)
+
+    def to_itransform(self) -> ITransform:
+        return ITransform(self.crop, self.position, self.rotation, self.scale)
+
+    def __iter__(self):
+        return iter(self.to_itransform())
+
+    def __eq__(self, other):
+        if isinstance(other, (CompactTransform, ITransform)):
+            return tuple(self) == tuple(other)
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(tuple(self))
+
+    def __repr__(self):
+        return repr(self.to_itransform()).replace("ITransform", "CompactTransform", 1)
@@ -0,0 +1,4 @@
+from .model import ModelError, SceneCollection, StandinModel
+from .server import StandinServer, StandinThread
+
+__all__ = ["ModelError", "SceneCollection", "StandinModel", "StandinServer", "StandinThread"]
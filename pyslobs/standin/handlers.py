@@ -0,0 +1,1246 @@
+"""
+    Implementations of the JSON-RPC methods of each resource type, acting on
+    a StandinModel.
+
+    Each handler is called with the server (for its model, and to emit
+    events), the ids parsed from the resource (e.g. Scene["abc"] -> ["abc"])
+    and the args of the request. It returns the JSON-able result.
+"""
+from .model import ModelError, SOURCE_TYPES, timestamp
+
+HANDLERS = {}
+# Map from (resource type, method) -> handler.
+
+EVENTS = {
+    "ScenesService": {
+        "itemAdded",
+        "itemRemoved",
+        "itemUpdated",
+        "sceneAdded",
+        "sceneRemoved",
+        "sceneSwitched",
+    },
+    "SourcesService": {"sourceAdded", "sourceRemoved", "sourceUpdated"},
+    "SceneCollectionsService": {
+        "collectionAdded",
+        "collectionRemoved",
+        "collectionSwitched",
+        "collectionUpdated",
+        "collectionWillSwitch",
+    },
+    "StreamingService": {
+        "recordingStatusChange",
+        "replayBufferStatusChange",
+        "streamingStatusChange",
+    },
+    "TransitionsService": {"studioModeChanged"},
+}
+# The events that can be subscribed to, by service.
+
+
+def handles(resource_type, *methods):
+    def decorate(function):
+        for method in methods:
+            HANDLERS[resource_type, method] = function
+        return function
+
+    return decorate
+
+
+def _arg(args, index, default=None):
+    return args[index] if len(args) > index and args[index] is not None else default
+
+
+def _scene_models(server, scenes):
+    model = server.model
+    return [model.scene_model(scene) for scene in scenes]
+
+
+def _node_models(server, nodes):
+    model = server.model
+    return [model.node_model(node) for node in nodes]
+
+
+def _get_model_reply(model):
+    # getModel answers with the model alone, as in typedefs: unlike the helpers
+    # returned elsewhere, it has no _type or resourceId (nor do a scene's nodes).
+    reply = {
+        key: value for key, value in model.items() if key not in ("_type", "resourceId")
+    }
+    if "nodes" in reply:
+        reply["nodes"] = [_get_model_reply(node) for node in reply["nodes"]]
+    return reply
+
+
+def _item_updated(server, node):
+    server.emit("ScenesService", "itemUpdated", server.model.node_model(node))
+
+
+# ScenesService
+
+
+@handles("ScenesService", "activeScene")
+def _active_scene(server, ids, args):
+    return server.model.scene_model(server.model.active_scene())
+
+
+@handles("ScenesService", "activeSceneId")
+def _active_scene_id(server, ids, args):
+    return server.model.active_scene()["id"]
+
+
+@handles("ScenesService", "createScene")
+def _create_scene(server, ids, args):
+    model = server.model
+    scene = model.create_scene(_arg(args, 0, "Scene"))
+    result = model.scene_model(scene)
+    # The scene's source, too.
+    source = model.collection().sources[scene["id"]]
+    server.emit("SourcesService", "sourceAdded", model.source_model(source))
+    server.emit("ScenesService", "sceneAdded", result)
+    return result
+
+
+@handles("ScenesService", "getScene")
+def _get_scene(server, ids, args):
+    return server.model.scene_model(server.model.scene(_arg(args, 0)))
+
+
+@handles("ScenesService", "getScenes")
+def _get_scenes(server, ids, args):
+    return _scene_models(server, server.model.collection().scenes.values())
+
+
+@handles("ScenesService", "makeSceneActive")
+def _make_scene_active(server, ids, args):
+    scene = server.model.make_scene_active(_arg(args, 0))
+    server.emit("ScenesService", "sceneSwitched", server.model.scene_model(scene))
+    return True
+
+
+@handles("ScenesService", "removeScene")
+def _remove_scene(server, ids, args):
+    model = server.model
+    result = model.scene_model(model.scene(_arg(args, 0)))
+    was_active = model.active_scene()["id"] == result["id"]
+    source = model.source_model(model.collection().sources[result["id"]])
+    model.remove_scene(result["id"])
+    del result["resourceId"]
+    server.emit("ScenesService", "sceneRemoved", result)
+    server.emit("SourcesService", "sourceRemoved", source)
+    if was_active:
+        server.emit(
+            "ScenesService", "sceneSwitched", model.scene_model(model.active_scene())
+        )
+    return result
+
+
+# Scene
+
+
+@handles("Scene", "addSource")
+def _scene_add_source(server, ids, args):
+    item = server.model.add_source(ids[0], _arg(args, 0))
+    result = server.model.node_model(item)
+    server.emit("ScenesService", "itemAdded", result)
+    return result
+
+
+@handles("Scene", "canAddSource")
+def _scene_can_add_source(server, ids, args):
+    source_id = _arg(args, 0)
+    return source_id in server.model.collection().sources and source_id != ids[0]
+
+
+@handles("Scene", "clear")
+def _scene_clear(server, ids, args):
+    model = server.model
+    for node in model.root_nodes(model.scene(ids[0])):
+        for removed in model.remove_node(node["id"]):
+            server.emit("ScenesService", "itemRemoved", dict(removed))
+
+
+@handles("Scene", "createAndAddSource")
+def _scene_create_and_add_source(server, ids, args):
+    model = server.model
+    model.scene(ids[0])
+    source = model.create_source(_arg(args, 0), _arg(args, 1), _arg(args, 2))
+    server.emit("SourcesService", "sourceAdded", model.source_model(source))
+    return _scene_add_source(server, ids, [source["id"]])
+
+
+@handles("Scene", "createFolder")
+def _scene_create_folder(server, ids, args):
+    folder = server.model.create_folder(ids[0], _arg(args, 0, "Folder"))
+    result = server.model.node_model(folder)
+    server.emit("ScenesService", "itemAdded", result)
+    return result
+
+
+def _scene_nodes(server, scene_id, node_type=None):
+    model = server.model
+    collection = model.collection()
+    return [
+        collection.nodes[node_id]
+        for node_id in model.scene(scene_id)["nodes"]
+        if node_type is None or collection.nodes[node_id]["sceneNodeType"] == node_type
+    ]
+
+
+def _scene_node(server, scene_id, node_id, node_type=None):
+    node = server.model.collection().nodes.get(node_id)
+    if node is None or node["sceneId"] != scene_id:
+        return None
+    if node_type is not None and node["sceneNodeType"] != node_type:
+        return None
+    return server.model.node_model(node)
+
+
+@handles("Scene", "getFolder")
+def _scene_get_folder(server, ids, args):
+    return _scene_node(server, ids[0], _arg(args, 0), "folder")
+
+
+@handles("Scene", "getFolders")
+def _scene_get_folders(server, ids, args):
+    return _node_models(server, _scene_nodes(server, ids[0], "folder"))
+
+
+@handles("Scene", "getItem")
+def _scene_get_item(server, ids, args):
+    return _scene_node(server, ids[0], _arg(args, 0), "item")
+
+
+@handles("Scene", "getItems")
+def _scene_get_items(server, ids, args):
+    return _node_models(server, _scene_nodes(server, ids[0], "item"))
+
+
+@handles("Scene", "getModel")
+def _scene_get_model(server, ids, args):
+    return _get_model_reply(server.model.scene_model(server.model.scene(ids[0])))
+
+
+@handles("Scene", "getNestedItems")
+def _scene_get_nested_items(server, ids, args):
+    # Scenes within scenes are not modelled, so there is no nesting to follow.
+    return _scene_get_items(server, ids, args)
+
+
+@handles("Scene", "getNestedScenes")
+def _scene_get_nested_scenes(server, ids, args):
+    model = server.model
+    collection = model.collection()
+    return [
+        model.scene_model(collection.scenes[node["sourceId"]])
+        for node in _scene_nodes(server, ids[0], "item")
+        if node["sourceId"] in collection.scenes
+    ]
+
+
+@handles("Scene", "getNestedSources")
+def _scene_get_nested_sources(server, ids, args):
+    model = server.model
+    seen = dict()
+    for node in _scene_nodes(server, ids[0], "item"):
+        seen[node["sourceId"]] = model.source_model(model.source(node["sourceId"]))
+    return list(seen.values())
+
+
+@handles("Scene", "getNode")
+def _scene_get_node(server, ids, args):
+    return _scene_node(server, ids[0], _arg(args, 0))
+
+
+@handles("Scene", "getNodeByName")
+def _scene_get_node_by_name(server, ids, args):
+    name = _arg(args, 0)
+    for node in _scene_nodes(server, ids[0]):
+        if node["name"] == name:
+            return server.model.node_model(node)
+    return None
+
+
+@handles("Scene", "getNodes")
+def _scene_get_nodes(server, ids, args):
+    return _node_models(server, _scene_nodes(server, ids[0]))
+
+
+@handles("Scene", "getRootNodes")
+def _scene_get_root_nodes(server, ids, args):
+    model = server.model
+    return _node_models(server, model.root_nodes(model.scene(ids[0])))
+
+
+@handles("Scene", "getSelection")
+def _scene_get_selection(server, ids, args):
+    server.model.scene(ids[0])
+    if args:
+        server.model.selected_ids = list(args)
+    return _selection_model(server)
+
+
+@handles("Scene", "getSource")
+def _scene_get_source(server, ids, args):
+    return server.model.source_model(server.model.source(ids[0]))
+
+
+@handles("Scene", "makeActive")
+def _scene_make_active(server, ids, args):
+    _make_scene_active(server, [], [ids[0]])
+
+
+@handles("Scene", "remove")
+def _scene_remove(server, ids, args):
+    _remove_scene(server, [], [ids[0]])
+
+
+@handles("Scene", "removeFolder", "removeItem")
+def _scene_remove_node(server, ids, args):
+    node = _scene_node(server, ids[0], _arg(args, 0))
+    if node is None:
+        raise ModelError(f"Scene node {_arg(args, 0)!r} not found.")
+    for removed in server.model.remove_node(node["id"]):
+        server.emit("ScenesService", "itemRemoved", dict(removed))
+
+
+@handles("Scene", "setName")
+def _scene_set_name(server, ids, args):
+    model = server.model
+    scene = model.scene(ids[0])
+    scene["name"] = _arg(args, 0, "")
+    model.source(ids[0])["name"] = scene["name"]
+
+
+# SceneItem, SceneItemFolder (and the methods they share, as SceneNodes)
+
+
+def _node(server, ids):
+    # SceneItem["sceneId","itemId","sourceId"], SceneItemFolder["sceneId","folderId"]
+    return server.model.node(ids[1])
+
+
+def _node_handler(*methods):
+    def decorate(function):
+        for resource_type in ("SceneItem", "SceneItemFolder"):
+            handles(resource_type, *methods)(function)
+        return function
+
+    return decorate
+
+
+@_node_handler("addToSelection")
+def _node_add_to_selection(server, ids, args):
+    if ids[1] not in server.model.selected_ids:
+        server.model.selected_ids.append(ids[1])
+
+
+@_node_handler("deselect")
+def _node_deselect(server, ids, args):
+    if ids[1] in server.model.selected_ids:
+        server.model.selected_ids.remove(ids[1])
+
+
+@_node_handler("select")
+def _node_select(server, ids, args):
+    server.model.selected_ids = [ids[1]]
+
+
+@_node_handler("isSelected")
+def _node_is_selected(server, ids, args):
+    return ids[1] in server.model.selected_ids
+
+
+@_node_handler("detachParent")
+def _node_detach_parent(server, ids, args):
+    _item_updated(server, server.model.set_parent(ids[1], None))
+
+
+@_node_handler("setParent")
+def _node_set_parent(server, ids, args):
+    _item_updated(server, server.model.set_parent(ids[1], _arg(args, 0)))
+
+
+@_node_handler("getItemIndex", "getNodeIndex")
+def _node_get_index(server, ids, args):
+    return server.model.node_index(_node(server, ids))
+
+
+@_node_handler("getModel")
+def _node_get_model(server, ids, args):
+    return _get_model_reply(server.model.node_model(_node(server, ids)))
+
+
+def _neighbour(step, items_only):
+    def handler(server, ids, args):
+        node = server.model.neighbour(_node(server, ids), step, items_only)
+        return server.model.node_model(node) if node else None
+
+    return handler
+
+
+_node_handler("getNextItem")(_neighbour(1, True))
+_node_handler("getNextNode")(_neighbour(1, False))
+_node_handler("getPrevItem")(_neighbour(-1, True))
+_node_handler("getPrevNode")(_neighbour(-1, False))
+
+
+@_node_handler("getParent")
+def _node_get_parent(server, ids, args):
+    parent_id = _node(server, ids)["parentId"]
+    return server.model.node_model(server.model.node(parent_id)) if parent_id else None
+
+
+@_node_handler("getPath")
+def _node_get_path(server, ids, args):
+    return server.model.node_path(_node(server, ids))
+
+
+@_node_handler("getScene")
+def _node_get_scene(server, ids, args):
+    return server.model.scene_model(server.model.scene(ids[0]))
+
+
+@_node_handler("hasParent")
+def _node_has_parent(server, ids, args):
+    return bool(_node(server, ids)["parentId"])
+
+
+@_node_handler("isFolder")
+def _node_is_folder(server, ids, args):
+    return _node(server, ids)["sceneNodeType"] == "folder"
+
+
+@_node_handler("isItem")
+def _node_is_item(server, ids, args):
+    return _node(server, ids)["sceneNodeType"] == "item"
+
+
+@_node_handler("placeAfter")
+def _node_place_after(server, ids, args):
+    server.model.place_node(ids[1], _arg(args, 0), after=True)
+    _item_updated(server, _node(server, ids))
+
+
+@_node_handler("placeBefore")
+def _node_place_before(server, ids, args):
+    server.model.place_node(ids[1], _arg(args, 0), after=False)
+    _item_updated(server, _node(server, ids))
+
+
+@_node_handler("remove")
+def _node_remove(server, ids, args):
+    for removed in server.model.remove_node(ids[1]):
+        server.emit("ScenesService", "itemRemoved", dict(removed))
+
+
+@handles("SceneItemFolder", "add")
+def _folder_add(server, ids, args):
+    _item_updated(server, server.model.set_parent(_arg(args, 0), ids[1]))
+
+
+@handles("SceneItemFolder", "getFolders")
+def _folder_get_folders(server, ids, args):
+    return [
+        server.model.node_model(node)
+        for node in server.model.children(_node(server, ids))
+        if node["sceneNodeType"] == "folder"
+    ]
+
+
+@handles("SceneItemFolder", "getItems")
+def _folder_get_items(server, ids, args):
+    return [
+        server.model.node_model(node)
+        for node in server.model.children(_node(server, ids))
+        if node["sceneNodeType"] == "item"
+    ]
+
+
+@handles("SceneItemFolder", "getNestedNodes")
+def _folder_get_nested_nodes(server, ids, args):
+    return _node_models(server, server.model.nested_nodes(_node(server, ids)))
+
+
+@handles("SceneItemFolder", "getNodes")
+def _folder_get_nodes(server, ids, args):
+    return _node_models(server, server.model.children(_node(server, ids)))
+
+
+@handles("SceneItemFolder", "getSelection")
+def _folder_get_selection(server, ids, args):
+    server.model.selected_ids = [
+        node["id"] for node in server.model.nested_nodes(_node(server, ids))
+    ]
+    return _selection_model(server)
+
+
+@handles("SceneItemFolder", "setName")
+def _folder_set_name(server, ids, args):
+    folder = _node(server, ids)
+    folder["name"] = _arg(args, 0, "")
+    _item_updated(server, folder)
+
+
+@handles("SceneItemFolder", "ungroup")
+def _folder_ungroup(server, ids, args):
+    folder = dict(_node(server, ids))
+    server.model.ungroup(ids[1])
+    server.emit("ScenesService", "itemRemoved", folder)
+
+
+def _transform_handler(method, update):
+    def handler(server, ids, args):
+        item = _node(server, ids)
+        update(item["transform"], args)
+        _item_updated(server, item)
+
+    handles("SceneItem", method)(handler)
+
+
+def _flip(axis):
+    def update(transform, args):
+        transform["scale"][axis] = -transform["scale"][axis]
+
+    return update
+
+
+def _reset(transform, args):
+    for key, value in (
+        ("position", {"x": 0, "y": 0}),
+        ("scale", {"x": 1, "y": 1}),
+        ("crop", {"top": 0, "bottom": 0, "left": 0, "right": 0}),
+        ("rotation", 0),
+    ):
+        transform[key] = value
+
+
+def _rotate(transform, args):
+    transform["rotation"] = (transform["rotation"] + _arg(args, 0, 0)) % 360
+
+
+def _set_scale(transform, args):
+    transform["scale"] = dict(_arg(args, 0, transform["scale"]))
+    if _arg(args, 1):
+        transform["position"] = dict(args[1])
+
+
+def _no_change(transform, args):
+    # The effect depends on the video canvas, which isn't modelled.
+    pass
+
+
+_transform_handler("flipX", _flip("x"))
+_transform_handler("flipY", _flip("y"))
+_transform_handler("resetTransform", _reset)
+_transform_handler("rotate", _rotate)
+_transform_handler("setScale", _set_scale)
+for _method in ("centerOnScreen", "fitToScreen", "setContentCrop", "stretchToScreen"):
+    _transform_handler(_method, _no_change)
+
+
+@handles("SceneItem", "setTransform")
+def _item_set_transform(server, ids, args):
+    item = _node(server, ids)
+    server.model.update_transform(item, _arg(args, 0, {}))
+    _item_updated(server, item)
+
+
+@handles("SceneItem", "getSource")
+def _item_get_source(server, ids, args):
+    return server.model.source_model(server.model.source(_node(server, ids)["sourceId"]))
+
+
+_ITEM_SETTINGS = ("locked", "visible", "streamVisible", "recordingVisible")
+
+
+@handles("SceneItem", "setSettings")
+def _item_set_settings(server, ids, args):
+    item = _node(server, ids)
+    settings = _arg(args, 0, {})
+    for key in _ITEM_SETTINGS:
+        if settings.get(key) is not None:
+            item[key] = settings[key]
+    if settings.get("transform"):
+        server.model.update_transform(item, settings["transform"])
+    _item_updated(server, item)
+
+
+@handles("SceneItem", "setVisibility")
+def _item_set_visibility(server, ids, args):
+    _item_set_settings(server, ids, [{"visible": bool(_arg(args, 0))}])
+
+
+# SourcesService and Source
+
+
+def _source_added(server, source):
+    server.emit("SourcesService", "sourceAdded", server.model.source_model(source))
+
+
+@handles("SourcesService", "addFile")
+def _sources_add_file(server, ids, args):
+    path = str(_arg(args, 0, ""))
+    name = path.replace("\\", "/").rsplit("/", 1)[-1]
+    source = server.model.create_source(name, "image_source", {"file": path})
+    _source_added(server, source)
+    return server.model.source_model(source)
+
+
+@handles("SourcesService", "createSource")
+def _sources_create_source(server, ids, args):
+    options = _arg(args, 3, {})
+    source = server.model.create_source(
+        _arg(args, 0, ""), _arg(args, 1), _arg(args, 2), options.get("channel")
+    )
+    _source_added(server, source)
+    return server.model.source_model(source)
+
+
+@handles("SourcesService", "getAvailableSourcesTypesList")
+def _sources_get_types(server, ids, args):
+    return [
+        {"value": value, "description": description}
+        for value, description in SOURCE_TYPES
+        if value != "scene"
+    ]
+
+
+@handles("SourcesService", "getSource")
+def _sources_get_source(server, ids, args):
+    return server.model.source_model(server.model.source(_arg(args, 0)))
+
+
+@handles("SourcesService", "getSources")
+def _sources_get_sources(server, ids, args):
+    model = server.model
+    return [model.source_model(source) for source in model.collection().sources.values()]
+
+
+@handles("SourcesService", "getSourcesByName")
+def _sources_get_sources_by_name(server, ids, args):
+    model = server.model
+    name = _arg(args, 0)
+    return [
+        model.source_model(source)
+        for source in model.collection().sources.values()
+        if source["name"] == name
+    ]
+
+
+@handles("SourcesService", "removeSource")
+def _sources_remove_source(server, ids, args):
+    source, removed = server.model.remove_source(_arg(args, 0))
+    for node in removed:
+        server.emit("ScenesService", "itemRemoved", dict(node))
+    result = server.model.source_model(source)
+    del result["resourceId"]
+    server.emit("SourcesService", "sourceRemoved", result)
+
+
+@handles("SourcesService", "showAddSource", "showShowcase", "showSourceProperties")
+def _sources_show_ui(server, ids, args):
+    # There is no UI.
+    pass
+
+
+def _source(server, ids):
+    return server.model.source(ids[0])
+
+
+def _source_updated(server, source):
+    server.emit("SourcesService", "sourceUpdated", server.model.source_model(source))
+
+
+@handles("Source", "duplicate")
+def _source_duplicate(server, ids, args):
+    original = _source(server, ids)
+    if original["doNotDuplicate"]:
+        raise ModelError("Source cannot be duplicated.")
+    source = server.model.create_source(
+        original["name"], original["type"], original["settings"], original["channel"]
+    )
+    _source_added(server, source)
+    return server.model.source_model(source)
+
+
+@handles("Source", "getModel")
+def _source_get_model(server, ids, args):
+    return _get_model_reply(server.model.source_model(_source(server, ids)))
+
+
+@handles("Source", "getPropertiesFormData")
+def _source_get_properties_form_data(server, ids, args):
+    return [
+        {"name": key, "value": value, "type": type(value).__name__}
+        for key, value in _source(server, ids)["settings"].items()
+    ]
+
+
+@handles("Source", "setPropertiesFormData")
+def _source_set_properties_form_data(server, ids, args):
+    source = _source(server, ids)
+    for field in _arg(args, 0, []):
+        source["settings"][field["name"]] = field.get("value")
+    _source_updated(server, source)
+
+
+@handles("Source", "getSettings")
+def _source_get_settings(server, ids, args):
+    return dict(_source(server, ids)["settings"])
+
+
+@handles("Source", "hasProps")
+def _source_has_props(server, ids, args):
+    return _source(server, ids)["configurable"]
+
+
+@handles("Source", "refresh")
+def _source_refresh(server, ids, args):
+    _source(server, ids)
+
+
+@handles("Source", "setName")
+def _source_set_name(server, ids, args):
+    source = _source(server, ids)
+    source["name"] = _arg(args, 0, "")
+    _source_updated(server, source)
+
+
+@handles("Source", "updateSettings")
+def _source_update_settings(server, ids, args):
+    source = _source(server, ids)
+    source["settings"].update(_arg(args, 0, {}))
+    _source_updated(server, source)
+
+
+# AudioService and AudioSource
+
+
+def _audio_sources(server, sources):
+    return [
+        server.model.audio_source_model(source) for source in sources if source["audio"]
+    ]
+
+
+@handles("AudioService", "getSource")
+def _audio_get_source(server, ids, args):
+    source = server.model.collection().sources.get(_arg(args, 0))
+    if source is None or not source["audio"]:
+        return None
+    return server.model.audio_source_model(source)
+
+
+@handles("AudioService", "getSources")
+def _audio_get_sources(server, ids, args):
+    return _audio_sources(server, server.model.collection().sources.values())
+
+
+@handles("AudioService", "getSourcesForCurrentScene")
+def _audio_get_sources_for_current_scene(server, ids, args):
+    model = server.model
+    return _audio_sources(server, model.scene_audio_sources(model.active_scene()))
+
+
+@handles("AudioService", "getSourcesForScene")
+def _audio_get_sources_for_scene(server, ids, args):
+    model = server.model
+    return _audio_sources(server, model.scene_audio_sources(model.scene(_arg(args, 0))))
+
+
+@handles("AudioSource", "getModel")
+def _audio_source_get_model(server, ids, args):
+    return server.model.audio_source_model(_source(server, ids))
+
+
+@handles("AudioSource", "setDeflection")
+def _audio_source_set_deflection(server, ids, args):
+    source = _source(server, ids)
+    deflection = _arg(args, 0, 1)
+    if isinstance(deflection, (int, float)) and 0 <= deflection <= 1:
+        source["audioSettings"]["fader"]["deflection"] = deflection
+        source["audioSettings"]["fader"]["mul"] = deflection
+    _source_updated(server, source)
+
+
+@handles("AudioSource", "setMuted")
+def _audio_source_set_muted(server, ids, args):
+    source = _source(server, ids)
+    source["muted"] = bool(_arg(args, 0))
+    _source_updated(server, source)
+
+
+# SceneCollectionsService
+
+
+@handles("SceneCollectionsService", "activeCollection")
+def _collections_active(server, ids, args):
+    return server.model.collection().manifest_entry()
+
+
+@handles("SceneCollectionsService", "collections")
+def _collections_list(server, ids, args):
+    return [
+        collection.manifest_entry()
+        for collection in server.model.collections.values()
+    ]
+
+
+@handles("SceneCollectionsService", "create")
+def _collections_create(server, ids, args):
+    model = server.model
+    options = _arg(args, 0, {})
+    server.emit(
+        "SceneCollectionsService",
+        "collectionWillSwitch",
+        model.collection().manifest_entry(),
+    )
+    collection = model.add_collection(options.get("name", "Scenes"))
+    model.load_collection(collection.id)
+    model.create_scene("Scene")
+    result = collection.manifest_entry()
+    server.emit("SceneCollectionsService", "collectionAdded", result)
+    server.emit("SceneCollectionsService", "collectionSwitched", result)
+    return result
+
+
+@handles("SceneCollectionsService", "delete")
+def _collections_delete(server, ids, args):
+    model = server.model
+    collection = model.remove_collection(_arg(args, 0))
+    server.emit(
+        "SceneCollectionsService", "collectionRemoved", collection.manifest_entry()
+    )
+    if model.active_collection is None:
+        model.add_collection("Scenes")
+        model.create_scene("Scene")
+        server.emit(
+            "SceneCollectionsService",
+            "collectionAdded",
+            model.collection().manifest_entry(),
+        )
+
+
+@handles("SceneCollectionsService", "fetchSceneCollectionsSchema")
+def _collections_schema(server, ids, args):
+    model = server.model
+    return [
+        model.collection_schema(collection)
+        for collection in model.collections.values()
+    ]
+
+
+@handles("SceneCollectionsService", "load")
+def _collections_load(server, ids, args):
+    model = server.model
+    server.emit(
+        "SceneCollectionsService",
+        "collectionWillSwitch",
+        model.collection().manifest_entry(),
+    )
+    collection = model.load_collection(_arg(args, 0))
+    server.emit(
+        "SceneCollectionsService", "collectionSwitched", collection.manifest_entry()
+    )
+
+
+@handles("SceneCollectionsService", "rename")
+def _collections_rename(server, ids, args):
+    collection = server.model.collection(_arg(args, 1))
+    collection.name = _arg(args, 0, "")
+    server.emit(
+        "SceneCollectionsService", "collectionUpdated", collection.manifest_entry()
+    )
+
+
+# StreamingService, TransitionsService, PerformanceService
+
+
+def _set_status(server, kind, status):
+    model = server.model
+    model.streaming[kind + "Status"] = status
+    model.streaming[kind + "StatusTime"] = timestamp()
+    server.emit("StreamingService", kind + "StatusChange", status)
+
+
+def _toggle(kind, on):
+    def handler(server, ids, args):
+        current = server.model.streaming[kind + "Status"]
+        _set_status(server, kind, "offline" if current != "offline" else on)
+
+    return handler
+
+
+handles("StreamingService", "toggleRecording")(_toggle("recording", "recording"))
+handles("StreamingService", "toggleStreaming")(_toggle("streaming", "live"))
+
+
+@handles("StreamingService", "getModel")
+def _streaming_get_model(server, ids, args):
+    return dict(server.model.streaming)
+
+
+@handles("StreamingService", "startReplayBuffer")
+def _streaming_start_replay_buffer(server, ids, args):
+    _set_status(server, "replayBuffer", "running")
+
+
+@handles("StreamingService", "stopReplayBuffer")
+def _streaming_stop_replay_buffer(server, ids, args):
+    _set_status(server, "replayBuffer", "offline")
+
+
+@handles("StreamingService", "saveReplay")
+def _streaming_save_replay(server, ids, args):
+    if server.model.streaming["replayBufferStatus"] != "running":
+        raise ModelError("The replay buffer is not running.")
+
+
+def _set_studio_mode(server, enabled):
+    if server.model.studio_mode != enabled:
+        server.model.studio_mode = enabled
+        server.emit("TransitionsService", "studioModeChanged", enabled)
+
+
+@handles("TransitionsService", "disableStudioMode")
+def _transitions_disable(server, ids, args):
+    _set_studio_mode(server, False)
+
+
+@handles("TransitionsService", "enableStudioMode")
+def _transitions_enable(server, ids, args):
+    _set_studio_mode(server, True)
+
+
+@handles("TransitionsService", "executeStudioModeTransition")
+def _transitions_execute(server, ids, args):
+    if not server.model.studio_mode:
+        raise ModelError("Studio mode is not enabled.")
+
+
+@handles("TransitionsService", "getModel")
+def _transitions_get_model(server, ids, args):
+    return {"studioMode": server.model.studio_mode}
+
+
+@handles("PerformanceService", "getModel")
+def _performance_get_model(server, ids, args):
+    return dict(server.model.performance)
+
+
+# NotificationsService
+
+
+def _notifications(server, type_, unread=None):
+    return [
+        dict(notification)
+        for notification in server.model.notifications
+        if notification["type"] == type_
+        and (unread is None or notification["unread"] == unread)
+    ]
+
+
+@handles("NotificationsService", "applyAction")
+def _notifications_apply_action(server, ids, args):
+    server.model.notification(_arg(args, 0))
+
+
+@handles("NotificationsService", "getAll")
+def _notifications_get_all(server, ids, args):
+    return _notifications(server, _arg(args, 0))
+
+
+@handles("NotificationsService", "getRead")
+def _notifications_get_read(server, ids, args):
+    return _notifications(server, _arg(args, 0), unread=False)
+
+
+@handles("NotificationsService", "getUnread")
+def _notifications_get_unread(server, ids, args):
+    return _notifications(server, _arg(args, 0), unread=True)
+
+
+@handles("NotificationsService", "getNotification")
+def _notifications_get(server, ids, args):
+    return dict(server.model.notification(_arg(args, 0)))
+
+
+@handles("NotificationsService", "getSettings")
+def _notifications_get_settings(server, ids, args):
+    return dict(server.model.notification_settings)
+
+
+@handles("NotificationsService", "markAllAsRead")
+def _notifications_mark_all_as_read(server, ids, args):
+    for notification in server.model.notifications:
+        notification["unread"] = False
+
+
+@handles("NotificationsService", "markAsRead")
+def _notifications_mark_as_read(server, ids, args):
+    server.model.notification(_arg(args, 0))["unread"] = False
+
+
+@handles("NotificationsService", "push")
+def _notifications_push(server, ids, args):
+    return dict(server.model.push_notification(_arg(args, 0, {})))
+
+
+@handles("NotificationsService", "restoreDefaultSettings")
+def _notifications_restore_default_settings(server, ids, args):
+    server.model.notification_settings = server.model.default_notification_settings()
+
+
+@handles("NotificationsService", "setSettings")
+def _notifications_set_settings(server, ids, args):
+    server.model.notification_settings.update(_arg(args, 0, {}))
+
+
+@handles("NotificationsService", "showNotifications")
+def _notifications_show(server, ids, args):
+    pass
+
+
+# SelectionService and Selection
+
+
+def _selection_model(server):
+    selected = server.model.selected_ids
+    return {
+        "_type": "HELPER",
+        "resourceId": "Selection[]",
+        "lastSelectedId": selected[-1] if selected else None,
+        "selectedIds": list(selected),
+    }
+
+
+def _selection_handler(*methods):
+    def decorate(function):
+        for resource_type in ("SelectionService", "Selection"):
+            handles(resource_type, *methods)(function)
+        return function
+
+    return decorate
+
+
+def _selected_nodes(server, node_type=None):
+    model = server.model
+    collection = model.collection()
+    return [
+        collection.nodes[node_id]
+        for node_id in model.selected_ids
+        if node_id in collection.nodes
+        and (node_type is None or collection.nodes[node_id]["sceneNodeType"] == node_type)
+    ]
+
+
+def _unselected_nodes(server):
+    selected = set(server.model.selected_ids)
+    return [
+        node
+        for node in _scene_nodes(server, server.model.active_scene()["id"])
+        if node["id"] not in selected
+    ]
+
+
+@_selection_handler("sceneId")
+def _selection_scene_id(server, ids, args):
+    return server.model.active_scene()["id"]
+
+
+@_selection_handler("getScene")
+def _selection_get_scene(server, ids, args):
+    return server.model.scene_model(server.model.active_scene())
+
+
+@_selection_handler("add")
+def _selection_add(server, ids, args):
+    selected = server.model.selected_ids
+    selected.extend(node_id for node_id in _arg(args, 0, []) if node_id not in selected)
+    return _selection_model(server)
+
+
+@_selection_handler("deselect")
+def _selection_deselect(server, ids, args):
+    removing = set(_arg(args, 0, []))
+    server.model.selected_ids = [
+        node_id for node_id in server.model.selected_ids if node_id not in removing
+    ]
+    return _selection_model(server)
+
+
+@_selection_handler("select")
+def _selection_select(server, ids, args):
+    server.model.selected_ids = list(_arg(args, 0, []))
+    return _selection_model(server)
+
+
+@_selection_handler("selectAll")
+def _selection_select_all(server, ids, args):
+    server.model.selected_ids = [
+        node["id"] for node in _scene_nodes(server, server.model.active_scene()["id"])
+    ]
+    return _selection_model(server)
+
+
+@_selection_handler("reset")
+def _selection_reset(server, ids, args):
+    server.model.selected_ids = []
+    return _selection_model(server)
+
+
+@_selection_handler("invert")
+def _selection_invert(server, ids, args):
+    server.model.selected_ids = [node["id"] for node in _unselected_nodes(server)]
+    return _selection_model(server)
+
+
+@_selection_handler("clone")
+def _selection_clone(server, ids, args):
+    return _selection_model(server)
+
+
+@_selection_handler("getModel")
+def _selection_get_model(server, ids, args):
+    return _selection_model(server)
+
+
+@_selection_handler("getIds")
+def _selection_get_ids(server, ids, args):
+    return list(server.model.selected_ids)
+
+
+@_selection_handler("getInverted")
+def _selection_get_inverted(server, ids, args):
+    return _node_models(server, _unselected_nodes(server))
+
+
+@_selection_handler("getInvertedIds")
+def _selection_get_inverted_ids(server, ids, args):
+    return [node["id"] for node in _unselected_nodes(server)]
+
+
+@_selection_handler("getLastSelectedId")
+def _selection_get_last_selected_id(server, ids, args):
+    return _selection_model(server)["lastSelectedId"]
+
+
+@_selection_handler("getLastSelected")
+def _selection_get_last_selected(server, ids, args):
+    selected = _selected_nodes(server)
+    return server.model.node_model(selected[-1]) if selected else None
+
+
+@_selection_handler("getSize")
+def _selection_get_size(server, ids, args):
+    return len(server.model.selected_ids)
+
+
+@_selection_handler("getItems", "getVisualItems")
+def _selection_get_items(server, ids, args):
+    return _node_models(server, _selected_nodes(server, "item"))
+
+
+@_selection_handler("getFolders")
+def _selection_get_folders(server, ids, args):
+    return _node_models(server, _selected_nodes(server, "folder"))
+
+
+@_selection_handler("getNodes")
+def _selection_get_nodes(server, ids, args):
+    return _node_models(server, _selected_nodes(server))
+
+
+@_selection_handler("getRootNodes")
+def _selection_get_root_nodes(server, ids, args):
+    selected = set(server.model.selected_ids)
+    return _node_models(
+        server,
+        [node for node in _selected_nodes(server) if node["parentId"] not in selected],
+    )
+
+
+@_selection_handler("getSources")
+def _selection_get_sources(server, ids, args):
+    model = server.model
+    seen = dict()
+    for node in _selected_nodes(server, "item"):
+        seen[node["sourceId"]] = model.source_model(model.source(node["sourceId"]))
+    return list(seen.values())
+
+
+@_selection_handler("isSceneFolder")
+def _selection_is_scene_folder(server, ids, args):
+    nodes = _selected_nodes(server)
+    return len(nodes) == 1 and nodes[0]["sceneNodeType"] == "folder"
+
+
+@_selection_handler("isSceneItem")
+def _selection_is_scene_item(server, ids, args):
+    nodes = _selected_nodes(server)
+    return len(nodes) == 1 and nodes[0]["sceneNodeType"] == "item"
+
+
+@_selection_handler("isSelected")
+def _selection_is_selected(server, ids, args):
+    return _arg(args, 0) in server.model.selected_ids
+
+
+@_selection_handler("remove")
+def _selection_remove(server, ids, args):
+    for node in _selected_nodes(server):
+        if node["id"] in server.model.collection().nodes:
+            for removed in server.model.remove_node(node["id"]):
+                server.emit("ScenesService", "itemRemoved", dict(removed))
+
+
+@_selection_handler("setSettings")
+def _selection_set_settings(server, ids, args):
+    for node in _selected_nodes(server, "item"):
+        _item_set_settings(server, [node["sceneId"], node["id"]], args)
+
+
+@_selection_handler("setVisibility")
+def _selection_set_visibility(server, ids, args):
+    _selection_set_settings(server, ids, [{"visible": bool(_arg(args, 0))}])
+
+
+@_selection_handler("setStreamVisible")
+def _selection_set_stream_visible(server, ids, args):
+    _selection_set_settings(server, ids, [{"streamVisible": bool(_arg(args, 0))}])
+
+
+@_selection_handler("setRecordingVisible")
+def _selection_set_recording_visible(server, ids, args):
+    _selection_set_settings(server, ids, [{"recordingVisible": bool(_arg(args, 0))}])
+
+
+@_selection_handler("setParent")
+def _selection_set_parent(server, ids, args):
+    for node in _selected_nodes(server):
+        _item_updated(server, server.model.set_parent(node["id"], _arg(args, 0)))
+
+
+@_selection_handler("setTransform")
+def _selection_set_transform(server, ids, args):
+    for node in _selected_nodes(server, "item"):
+        server.model.update_transform(node, _arg(args, 0, {}))
+        _item_updated(server, node)
+
+
+def _selection_transform(update):
+    def handler(server, ids, args):
+        for node in _selected_nodes(server, "item"):
+            update(node["transform"], args)
+            _item_updated(server, node)
+
+    return handler
+
+
+_selection_handler("flipX")(_selection_transform(_flip("x")))
+_selection_handler("flipY")(_selection_transform(_flip("y")))
+_selection_handler("resetTransform")(_selection_transform(_reset))
+_selection_handler("rotate")(_selection_transform(_rotate))
+_selection_handler("scale")(_selection_transform(_set_scale))
+for _method in ("centerOnScreen", "fitToScreen", "setContentCrop", "stretchToScreen"):
+    _selection_handler(_method)(_selection_transform(_no_change))
@@ -0,0 +1,569 @@
+"""
+    The in-memory state of a stand-in StreamLabs Desktop: scene collections,
+    scenes, scene nodes, sources and the service-level settings.
+
+    Records are kept as dicts in the shape the JSON-RPC API returns them, so
+    serving a request is mostly a matter of copying.
+"""
+from __future__ import annotations
+
+import random
+import time
+import uuid
+from typing import Optional
+
+DEFAULT_TRANSFORM = {
+    "position": {"x": 0, "y": 0},
+    "scale": {"x": 1, "y": 1},
+    "crop": {"top": 0, "bottom": 0, "left": 0, "right": 0},
+    "rotation": 0,
+}
+
+SOURCE_TYPES = (
+    ("image_source", "Image"),
+    ("color_source", "Color Source"),
+    ("browser_source", "Browser Source"),
+    ("ffmpeg_source", "Media Source"),
+    ("text_gdiplus", "Text (GDI+)"),
+    ("wasapi_input_capture", "Audio Input Capture"),
+    ("wasapi_output_capture", "Audio Output Capture"),
+    ("scene", "Scene"),
+)
+
+_AUDIO_SOURCE_TYPES = {"ffmpeg_source", "wasapi_input_capture", "wasapi_output_capture"}
+
+
+class ModelError(Exception):
+    """The request refers to something that doesn't exist, or is invalid.
+    Reported to the client as a JSON-RPC error."""
+
+
+def timestamp() -> str:
+    # The format StreamLabs Desktop uses for status times.
+    return time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime())
+
+
+class SceneCollection:
+    """One scene collection: its scenes, their nodes and its sources."""
+
+    def __init__(self, id_: str, name: str):
+        self.id = id_
+        self.name = name
+        self.scenes: dict[str, dict] = dict()
+        # Map from scene id -> {"id", "name", "nodes": [node ids, in order]}
+        self.nodes: dict[str, dict] = dict()
+        # Map from node id -> node record (sceneNodeType "item" or "folder").
+        self.sources: dict[str, dict] = dict()
+        # Map from source id -> source record.
+        self.active_scene_id: Optional[str] = None
+
+    def manifest_entry(self) -> dict:
+        return {"id": self.id, "name": self.name}
+
+
+class StandinModel:
+    """State shared by everyone connected to a StandinServer."""
+
+    def __init__(self, seed: Optional[int] = None):
+        self._random = random.Random(seed)
+        self.collections: dict[str, SceneCollection] = dict()
+        self.active_collection: Optional[SceneCollection] = None
+
+        self.studio_mode = False
+        self.streaming = {
+            "streamingStatus": "offline",
+            "streamingStatusTime": timestamp(),
+            "recordingStatus": "offline",
+            "recordingStatusTime": timestamp(),
+            "replayBufferStatus": "offline",
+            "replayBufferStatusTime": timestamp(),
+        }
+        self.performance = {
+            "CPU": 1.5,
+            "numberDroppedFrames": 0,
+            "percentageDroppedFrames": 0,
+            "bandwidth": 0,
+            "frameRate": 60,
+        }
+        self.notification_settings = self.default_notification_settings()
+        self.notifications: list[dict] = []
+        self.selected_ids: list[str] = []
+
+    @classmethod
+    def seeded(
+        cls,
+        scenes: int = 3,
+        items_per_scene: int = 5,
+        folders_per_scene: int = 0,
+        collections: int = 1,
+        seed: int = 0,
+    ) -> StandinModel:
+        """Return a model with the given number of scene collections, each
+        containing the given number of scenes. Each scene has its own items
+        (each using its own source), spread across its folders.
+
+        The same seed always produces the same ids.
+        """
+        model = cls(seed)
+        for collection_index in range(collections):
+            collection = model.add_collection(f"Collection {collection_index + 1}")
+            for scene_index in range(scenes):
+                scene = model.create_scene(
+                    f"Scene {scene_index + 1}", collection=collection
+                )
+                folder_ids = [
+                    model.create_folder(
+                        scene["id"], f"Folder {folder_index + 1}", collection
+                    )["id"]
+                    for folder_index in range(folders_per_scene)
+                ]
+                for item_index in range(items_per_scene):
+                    source_type = SOURCE_TYPES[item_index % 5][0]
+                    source = model.create_source(
+                        f"Source {scene_index + 1}.{item_index + 1}",
+                        source_type,
+                        collection=collection,
+                    )
+                    item = model.add_source(scene["id"], source["id"], collection)
+                    if folder_ids:
+                        model.set_parent(
+                            item["id"],
+                            folder_ids[item_index % len(folder_ids)],
+                            collection,
+                        )
+        if model.collections:
+            model.active_collection = next(iter(model.collections.values()))
+        return model
+
+    def new_id(self) -> str:
+        return str(uuid.UUID(int=self._random.getrandbits(128), version=4))
+
+    # Scene collections.
+
+    def add_collection(self, name: str) -> SceneCollection:
+        collection = SceneCollection(self.new_id(), name)
+        self.collections[collection.id] = collection
+        if self.active_collection is None:
+            self.active_collection = collection
+        return collection
+
+    def collection(self, id_: Optional[str] = None) -> SceneCollection:
+        """The collection with id_, or the active collection if None."""
+        if id_ is None:
+            if self.active_collection is None:
+                self.add_collection("Scenes")
+            return self.active_collection
+        try:
+            return self.collections[id_]
+        except KeyError:
+            raise ModelError(f"Scene collection {id_!r} not found.")
+
+    def load_collection(self, id_: str) -> SceneCollection:
+        self.active_collection = self.collection(id_)
+        self.selected_ids = []
+        return self.active_collection
+
+    def remove_collection(self, id_: Optional[str] = None) -> SceneCollection:
+        collection = self.collection(id_)
+        del self.collections[collection.id]
+        if collection is self.active_collection:
+            self.active_collection = next(iter(self.collections.values()), None)
+        return collection
+
+    def collection_schema(self, collection: SceneCollection) -> dict:
+        return {
+            "id": collection.id,
+            "name": collection.name,
+            "scenes": [
+                {
+                    "id": scene["id"],
+                    "name": scene["name"],
+                    "sceneItems": [
+                        {"sceneItemId": node_id, "sourceId": node["sourceId"]}
+                        for node_id in scene["nodes"]
+                        for node in (collection.nodes[node_id],)
+                        if node["sceneNodeType"] == "item"
+                    ],
+                }
+                for scene in collection.scenes.values()
+            ],
+            "sources": [
+                {"sourceId": source["sourceId"], "name": source["name"],
+                 "type": source["type"], "channel": source.get("channel")}
+                for source in collection.sources.values()
+                if source["type"] != "scene"
+            ],
+        }
+
+    # Scenes.
+
+    def scene(self, scene_id: str, collection: SceneCollection = None) -> dict:
+        collection = collection or self.collection()
+        try:
+            return collection.scenes[scene_id]
+        except KeyError:
+            raise ModelError(f"Scene {scene_id!r} not found.")
+
+    def scene_model(self, scene: dict, collection: SceneCollection = None) -> dict:
+        collection = collection or self.collection()
+        return {
+            "_type": "HELPER",
+            "resourceId": f'Scene["{scene["id"]}"]',
+            "id": scene["id"],
+            "name": scene["name"],
+            "nodes": [
+                self.node_model(collection.nodes[node_id], collection)
+                for node_id in scene["nodes"]
+            ],
+        }
+
+    def create_scene(self, name: str, collection: SceneCollection = None) -> dict:
+        collection = collection or self.collection()
+        scene_id = f"scene_{self.new_id()}"
+        scene = collection.scenes[scene_id] = {
+            "id": scene_id,
+            "name": name,
+            "nodes": [],
+        }
+        # Every scene is also a source, which can be nested in other scenes.
+        collection.sources[scene_id] = self._source_record(
+            scene_id, name, "scene", audio=False
+        )
+        if collection.active_scene_id is None:
+            collection.active_scene_id = scene_id
+        return scene
+
+    def remove_scene(self, scene_id: str) -> dict:
+        collection = self.collection()
+        scene = self.scene(scene_id)
+        if len(collection.scenes) == 1:
+            raise ModelError("Cannot remove the last scene.")
+        for node_id in scene["nodes"]:
+            del collection.nodes[node_id]
+        del collection.scenes[scene_id]
+        collection.sources.pop(scene_id, None)
+        if collection.active_scene_id == scene_id:
+            collection.active_scene_id = next(iter(collection.scenes))
+        return scene
+
+    def make_scene_active(self, scene_id: str) -> dict:
+        scene = self.scene(scene_id)
+        self.collection().active_scene_id = scene_id
+        return scene
+
+    def active_scene(self) -> dict:
+        collection = self.collection()
+        if collection.active_scene_id is None:
+            self.create_scene("Scene")
+        return collection.scenes[collection.active_scene_id]
+
+    # Scene nodes.
+
+    def node(self, node_id: str, collection: SceneCollection = None) -> dict:
+        collection = collection or self.collection()
+        try:
+            return collection.nodes[node_id]
+        except KeyError:
+            raise ModelError(f"Scene node {node_id!r} not found.")
+
+    def node_model(self, node: dict, collection: SceneCollection = None) -> dict:
+        result = dict(node)
+        if node["sceneNodeType"] == "folder":
+            result["childrenIds"] = [
+                child["id"] for child in self.children(node, collection)
+            ]
+        return result
+
+    def children(self, folder: dict, collection: SceneCollection = None) -> list:
+        collection = collection or self.collection()
+        scene = collection.scenes[folder["sceneId"]]
+        return [
+            collection.nodes[node_id]
+            for node_id in scene["nodes"]
+            if collection.nodes[node_id]["parentId"] == folder["id"]
+        ]
+
+    def nested_nodes(self, folder: dict, collection: SceneCollection = None) -> list:
+        result = []
+        for child in self.children(folder, collection):
+            result.append(child)
+            if child["sceneNodeType"] == "folder":
+                result.extend(self.nested_nodes(child, collection))
+        return result
+
+    def root_nodes(self, scene: dict, collection: SceneCollection = None) -> list:
+        collection = collection or self.collection()
+        return [
+            collection.nodes[node_id]
+            for node_id in scene["nodes"]
+            if not collection.nodes[node_id]["parentId"]
+        ]
+
+    def add_source(
+        self,
+        scene_id: str,
+        source_id: str,
+        collection: SceneCollection = None,
+    ) -> dict:
+        collection = collection or self.collection()
+        scene = self.scene(scene_id, collection)
+        try:
+            source = collection.sources[source_id]
+        except KeyError:
+            raise ModelError(f"Source {source_id!r} not found.")
+        item_id = self.new_id()
+        item = collection.nodes[item_id] = {
+            "_type": "HELPER",
+            "resourceId": f'SceneItem["{scene_id}","{item_id}","{source_id}"]',
+            "sceneItemId": item_id,
+            "sourceId": source_id,
+            "sceneId": scene_id,
+            "id": item_id,
+            "parentId": "",
+            "sceneNodeType": "item",
+            "name": source["name"],
+            "locked": False,
+            "visible": True,
+            "streamVisible": True,
+            "recordingVisible": True,
+            "transform": {
+                key: dict(value) if isinstance(value, dict) else value
+                for key, value in DEFAULT_TRANSFORM.items()
+            },
+        }
+        scene["nodes"].insert(0, item_id)
+        return item
+
+    def create_folder(
+        self, scene_id: str, name: str, collection: SceneCollection = None
+    ) -> dict:
+        collection = collection or self.collection()
+        scene = self.scene(scene_id, collection)
+        folder_id = self.new_id()
+        folder = collection.nodes[folder_id] = {
+            "_type": "HELPER",
+            "resourceId": f'SceneItemFolder["{scene_id}","{folder_id}"]',
+            "id": folder_id,
+            "sceneId": scene_id,
+            "parentId": "",
+            "sceneNodeType": "folder",
+            "name": name,
+        }
+        scene["nodes"].insert(0, folder_id)
+        return folder
+
+    def remove_node(self, node_id: str) -> list[dict]:
+        """Remove node_id (and, if a folder, everything in it). Return the
+        removed nodes."""
+        collection = self.collection()
+        node = self.node(node_id)
+        removed = [node]
+        if node["sceneNodeType"] == "folder":
+            removed.extend(self.nested_nodes(node))
+        scene = collection.scenes[node["sceneId"]]
+        removed_ids = {each["id"] for each in removed}
+        scene["nodes"] = [each for each in scene["nodes"] if each not in removed_ids]
+        for each in removed_ids:
+            del collection.nodes[each]
+        self.selected_ids = [
+            each for each in self.selected_ids if each not in removed_ids
+        ]
+        return removed
+
+    def set_parent(
+        self, node_id: str, parent_id: Optional[str], collection=None
+    ) -> dict:
+        collection = collection or self.collection()
+        node = self.node(node_id, collection)
+        if parent_id:
+            parent = self.node(parent_id, collection)
+            if parent["sceneNodeType"] != "folder" or parent["sceneId"] != node["sceneId"]:
+                raise ModelError(f"{parent_id!r} is not a folder in the same scene.")
+            if parent is node or parent in self.nested_nodes(node, collection):
+                raise ModelError("A folder cannot contain itself.")
+        node["parentId"] = parent_id or ""
+        return node
+
+    def ungroup(self, folder_id: str) -> None:
+        folder = self.node(folder_id)
+        for child in self.children(folder):
+            child["parentId"] = folder["parentId"]
+        self.remove_node(folder_id)
+
+    def place_node(self, node_id: str, other_id: str, after: bool) -> None:
+        collection = self.collection()
+        node = self.node(node_id)
+        other = self.node(other_id)
+        if node["sceneId"] != other["sceneId"]:
+            raise ModelError("Nodes are in different scenes.")
+        nodes = collection.scenes[node["sceneId"]]["nodes"]
+        nodes.remove(node_id)
+        nodes.insert(nodes.index(other_id) + (1 if after else 0), node_id)
+        node["parentId"] = other["parentId"]
+
+    def node_index(self, node: dict) -> int:
+        return self.collection().scenes[node["sceneId"]]["nodes"].index(node["id"])
+
+    def neighbour(self, node: dict, step: int, items_only: bool) -> Optional[dict]:
+        collection = self.collection()
+        nodes = collection.scenes[node["sceneId"]]["nodes"]
+        index = nodes.index(node["id"]) + step
+        while 0 <= index < len(nodes):
+            candidate = collection.nodes[nodes[index]]
+            if not items_only or candidate["sceneNodeType"] == "item":
+                return candidate
+            index += step
+        return None
+
+    def node_path(self, node: dict) -> list[str]:
+        path = [node["id"]]
+        while node["parentId"]:
+            node = self.node(node["parentId"])
+            path.insert(0, node["id"])
+        return path
+
+    @staticmethod
+    def update_transform(item: dict, patch: dict) -> None:
+        transform = item["transform"]
+        for key, value in patch.items():
+            if value is None:
+                continue
+            if isinstance(value, dict):
+                transform[key] = {**transform.get(key, {}), **value}
+            else:
+                transform[key] = value
+
+    # Sources.
+
+    def _source_record(self, source_id, name, type_, audio=None, channel=None):
+        if audio is None:
+            audio = type_ in _AUDIO_SOURCE_TYPES
+        video = type_ not in ("wasapi_input_capture", "wasapi_output_capture")
+        return {
+            "_type": "HELPER",
+            "resourceId": f'Source["{source_id}"]',
+            "sourceId": source_id,
+            "id": source_id,
+            "name": name,
+            "type": type_,
+            "async": type_ in ("ffmpeg_source", "browser_source"),
+            "audio": audio,
+            "video": video,
+            "muted": False,
+            "width": 1920 if video else 0,
+            "height": 1080 if video else 0,
+            "doNotDuplicate": False,
+            "channel": channel,
+            "configurable": True,
+            "settings": dict(),
+            "audioSettings": {
+                "fader": {"db": 0, "deflection": 1, "mul": 1},
+                "forceMono": False,
+                "mixerHidden": False,
+                "monitoringType": 0,
+                "syncOffset": 0,
+                "audioMixers": 255,
+            },
+        }
+
+    def source(self, source_id: str, collection: SceneCollection = None) -> dict:
+        collection = collection or self.collection()
+        try:
+            return collection.sources[source_id]
+        except KeyError:
+            raise ModelError(f"Source {source_id!r} not found.")
+
+    @staticmethod
+    def source_model(source: dict) -> dict:
+        return {
+            key: value
+            for key, value in source.items()
+            if key not in ("settings", "audioSettings")
+        }
+
+    @staticmethod
+    def audio_source_model(source: dict) -> dict:
+        audio_settings = source["audioSettings"]
+        return {
+            "_type": "HELPER",
+            "resourceId": f'AudioSource["{source["sourceId"]}"]',
+            "sourceId": source["sourceId"],
+            "name": source["name"],
+            "muted": source["muted"],
+            **audio_settings,
+            "fader": dict(audio_settings["fader"]),
+        }
+
+    def create_source(
+        self,
+        name: str,
+        type_: str,
+        settings: Optional[dict] = None,
+        channel: Optional[int] = None,
+        collection: SceneCollection = None,
+    ) -> dict:
+        collection = collection or self.collection()
+        if type_ not in {value for value, _ in SOURCE_TYPES}:
+            raise ModelError(f"Unknown source type {type_!r}.")
+        source_id = f"{type_}_{self.new_id()}"
+        source = collection.sources[source_id] = self._source_record(
+            source_id, name, type_, channel=channel
+        )
+        source["settings"] = dict(settings or {})
+        return source
+
+    def remove_source(self, source_id: str) -> tuple[dict, list[dict]]:
+        """Remove a source, and every scene item using it. Return the source
+        and the removed items."""
+        collection = self.collection()
+        source = self.source(source_id)
+        if source["type"] == "scene":
+            raise ModelError("Remove scenes with ScenesService.removeScene.")
+        removed = []
+        for node in list(collection.nodes.values()):
+            if node.get("sourceId") == source_id and node["id"] in collection.nodes:
+                removed.extend(self.remove_node(node["id"]))
+        del collection.sources[source_id]
+        return source, removed
+
+    def scene_audio_sources(self, scene: dict) -> list[dict]:
+        collection = self.collection()
+        seen = dict()
+        for node_id in scene["nodes"]:
+            node = collection.nodes[node_id]
+            if node["sceneNodeType"] == "item":
+                source = collection.sources[node["sourceId"]]
+                if source["audio"]:
+                    seen[source["sourceId"]] = source
+        return list(seen.values())
+
+    # Notifications.
+
+    @staticmethod
+    def default_notification_settings() -> dict:
+        return {"enabled": True, "playSound": True}
+
+    def push_notification(self, options: dict) -> dict:
+        notification = {
+            "id": len(self.notifications) + 1,
+            "type": "INFO",
+            "subType": "DEFAULT",
+            "message": "",
+            "action": None,
+            "code": None,
+            "data": None,
+            "unread": True,
+            "date": int(time.time() * 1000),
+            "lifeTime": 8000,
+            "showTime": False,
+            "playSound": True,
+        }
+        notification.update(options)
+        self.notifications.append(notification)
+        return notification
+
+    def notification(self, id_) -> dict:
+        for notification in self.notifications:
+            if notification["id"] == id_:
+                return notification
+        raise ModelError(f"Notification {id_!r} not found.")
@@ -0,0 +1,373 @@
+"""
+    An in-process asyncio WebSocket server that speaks StreamLabs Desktop's
+    JSON-RPC dialect, backed by a StandinModel.
+
+    Intended for tests and benchmarks on machines without StreamLabs Desktop:
+
+        async with StandinServer(StandinModel.seeded(scenes=100)) as server:
+            conn = SlobsConnection(server.connection_config(transport="asyncio"))
+            ...
+
+    The "thread" transport connects synchronously in SlobsConnection's
+    constructor, which would block the loop the server runs on. Use
+    StandinThread to run the server on its own loop instead:
+
+        with StandinThread(StandinServer()) as server:
+            conn = SlobsConnection(server.connection_config())
+
+    Covered:
+        - authentication (auth on TcpServerService),
+        - the methods of the services and classes in pyslobs.slobs (see
+          handlers.py), acting on the model,
+        - subscriptions to the services' events, and the events that the
+          methods trigger,
+        - PROMISE results, for the methods listed in promise_methods,
+        - CompactMode (compactMode in the params), which reduces the helper
+          objects in a result to their _type and resourceId,
+        - JSON-RPC batches, unless disabled.
+"""
+import asyncio
+import json
+import logging
+import threading
+from typing import Optional
+
+from .. import wsframing
+from ..config import ConnectionConfig
+from .handlers import EVENTS, HANDLERS
+from .model import ModelError, StandinModel
+
+DEFAULT_TOKEN = "standin"
+
+DEFAULT_PROMISE_METHODS = frozenset(
+    {"create", "delete", "fetchSceneCollectionsSchema", "load", "rename"}
+)
+# Methods that StreamLabs Desktop implements asynchronously, and so answers
+# with a PROMISE that is fulfilled by a later event.
+
+# JSON-RPC error codes.
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INTERNAL_ERROR = -32603
+
+
+def parse_resource(resource: str) -> tuple[str, list]:
+    """Split a resource id into its type and ids.
+    e.g. 'SceneItem["a","b","c"]' -> ("SceneItem", ["a", "b", "c"])
+    """
+    resource_type, bracket, rest = resource.partition("[")
+    if not bracket:
+        return resource, []
+    try:
+        ids = json.loads(bracket + rest)
+    except ValueError:
+        raise ModelError(f"Malformed resource {resource!r}.")
+    return resource_type, ids
+
+
+class _Session:
+    """One client connection."""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.authenticated = False
+        self.subscriptions: set[str] = set()
+        # Resource ids of the events this client has subscribed to.
+
+    def send(self, message) -> None:
+        if self.writer.is_closing():
+            return
+        payload = json.dumps(message, separators=(",", ":")).encode("utf-8")
+        self.writer.write(
+            wsframing.encode_frame(wsframing.OPCODE_TEXT, payload, mask=False)
+        )
+
+
+class StandinServer:
+    """Imitates the StreamLabs Desktop WebSocket API.
+
+    port=0 picks a free port; read the port attribute once started.
+    latency delays every response (and promise fulfilment) by that many
+    seconds, without holding up the requests that follow it.
+    """
+
+    logger = logging.getLogger("slobsapi.StandinServer")
+
+    def __init__(
+        self,
+        model: Optional[StandinModel] = None,
+        token: str = DEFAULT_TOKEN,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        batches: bool = True,
+        promise_methods=DEFAULT_PROMISE_METHODS,
+        latency: float = 0,
+    ):
+        self.model = model or StandinModel.seeded()
+        self.token = token
+        self.host = host
+        self.port = port
+        self.batches = batches
+        # If False, batches are rejected, as older versions of StreamLabs
+        # Desktop do.
+        self.promise_methods = frozenset(promise_methods)
+        self.latency = latency
+
+        self.requests_received = 0
+        self.batches_received = 0
+
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._sessions: set[_Session] = set()
+        self._next_promise = 0
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(
+            self._handle_client, self.host, self.port
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def close(self) -> None:
+        if self._server:
+            self._server.close()
+            self.drop_connections()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    def connection_config(self, **kwargs) -> ConnectionConfig:
+        """A ConnectionConfig for connecting to this server. kwargs are passed
+        through (e.g. transport="asyncio")."""
+        return ConnectionConfig(self.token, self.host, self.port, **kwargs)
+
+    @property
+    def connections(self) -> int:
+        return len(self._sessions)
+
+    def drop_connections(self) -> None:
+        """Abruptly close every client connection, as if the network failed."""
+        for session in list(self._sessions):
+            session.writer.transport.abort()
+
+    def emit(self, service: str, event: str, data) -> None:
+        """Send an event to every client subscribed to service.event."""
+        resource_id = f"{service}.{event}"
+        message = None
+        for session in self._sessions:
+            if resource_id in session.subscriptions:
+                if message is None:
+                    message = {
+                        "jsonrpc": "2.0",
+                        "result": {
+                            "_type": "EVENT",
+                            "emitter": "STREAM",
+                            "resourceId": resource_id,
+                            "data": data,
+                        },
+                    }
+                session.send(message)
+
+    # Connection handling.
+
+    async def _handle_client(self, reader, writer):
+        try:
+            await wsframing.server_handshake(reader, writer)
+        except (wsframing.FramingError, OSError, asyncio.IncompleteReadError) as e:
+            self.logger.debug("Handshake failed: %s", e)
+            writer.close()
+            return
+        session = _Session(reader, writer)
+        self._sessions.add(session)
+        message_reader = wsframing.MessageReader(reader)
+        try:
+            while True:
+                opcode, payload = await message_reader.read()
+                if opcode == wsframing.OPCODE_CLOSE:
+                    writer.write(
+                        wsframing.encode_frame(wsframing.OPCODE_CLOSE, payload[:2], False)
+                    )
+                    break
+                if opcode == wsframing.OPCODE_PING:
+                    writer.write(
+                        wsframing.encode_frame(wsframing.OPCODE_PONG, payload, False)
+                    )
+                elif opcode in (wsframing.OPCODE_TEXT, wsframing.OPCODE_BINARY):
+                    self._handle_message(session, payload)
+                await writer.drain()
+        except (wsframing.FramingError, OSError, asyncio.IncompleteReadError) as e:
+            self.logger.debug("Connection ended: %s", e)
+        finally:
+            self._sessions.discard(session)
+            writer.close()
+
+    def _handle_message(self, session: _Session, payload: bytes) -> None:
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            self._respond(session, _error(None, PARSE_ERROR, "Parse error"))
+            return
+        if isinstance(message, list):
+            self.batches_received += 1
+            if not self.batches or not message:
+                self._respond(session, _error(None, INVALID_REQUEST, "Invalid Request"))
+                return
+            self._respond(
+                session, [self._handle_request(session, request) for request in message]
+            )
+        else:
+            self._respond(session, self._handle_request(session, message))
+
+    def _respond(self, session: _Session, response) -> None:
+        if self.latency:
+            asyncio.get_running_loop().call_later(self.latency, session.send, response)
+        else:
+            session.send(response)
+
+    def _handle_request(self, session: _Session, request) -> dict:
+        self.requests_received += 1
+        if not isinstance(request, dict) or "method" not in request:
+            return _error(None, INVALID_REQUEST, "Invalid Request")
+        id_ = request.get("id")
+        method = request["method"]
+        params = request.get("params") or {}
+        resource = params.get("resource", "")
+        args = params.get("args") or []
+
+        if method == "auth":
+            if resource == "TcpServerService" and args == [self.token]:
+                session.authenticated = True
+                return _result(id_, True)
+            return _error(id_, INVALID_REQUEST, "INVALID_TOKEN")
+        if not session.authenticated:
+            return _error(id_, INVALID_REQUEST, "AUTHORIZATION_REQUIRED")
+
+        if method == "unsubscribe":
+            session.subscriptions.discard(resource)
+            return _result(id_, True)
+
+        try:
+            resource_type, ids = parse_resource(resource)
+            handler = HANDLERS.get((resource_type, method))
+            if handler is None:
+                if method in EVENTS.get(resource_type, ()):
+                    return _result(id_, self._subscribe(session, resource, method))
+                return _error(
+                    id_, METHOD_NOT_FOUND, f"Method not found: {resource}.{method}"
+                )
+            result = handler(self, ids, args)
+        except ModelError as e:
+            return _error(id_, INVALID_REQUEST, str(e))
+        except (LookupError, TypeError, ValueError, AttributeError) as e:
+            self.logger.debug("Bad request %s", request, exc_info=True)
+            return _error(id_, INTERNAL_ERROR, f"{type(e).__name__}: {e}")
+
+        if params.get("compactMode"):
+            result = _compact(result)
+        if method in self.promise_methods:
+            return _result(id_, self._promise(session, result))
+        return _result(id_, result)
+
+    @staticmethod
+    def _subscribe(session: _Session, service: str, event: str) -> dict:
+        resource_id = f"{service}.{event}"
+        session.subscriptions.add(resource_id)
+        return {"_type": "SUBSCRIPTION", "resourceId": resource_id, "emitter": "STREAM"}
+
+    def _promise(self, session: _Session, result) -> dict:
+        self._next_promise += 1
+        resource_id = f"Promise[{self._next_promise}]"
+        fulfilment = {
+            "jsonrpc": "2.0",
+            "result": {
+                "_type": "EVENT",
+                "emitter": "PROMISE",
+                "resourceId": resource_id,
+                "isRejected": False,
+                "data": result,
+            },
+        }
+        # Sent after the response that carries the promise.
+        loop = asyncio.get_running_loop()
+        loop.call_later(self.latency, self._respond, session, fulfilment)
+        return {"_type": "SUBSCRIPTION", "resourceId": resource_id, "emitter": "PROMISE"}
+
+
+class StandinThread:
+    """Runs a StandinServer on its own event loop, in a daemon thread.
+
+    Use call() to run code that touches the server or its model (e.g. emit())
+    on the server's loop.
+    """
+
+    def __init__(self, server: Optional[StandinServer] = None):
+        self.server = server or StandinServer()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> StandinServer:
+        started = threading.Event()
+        failure = []
+
+        def run():
+            loop = self._loop = asyncio.new_event_loop()
+            try:
+                loop.run_until_complete(self.server.start())
+            except BaseException as e:
+                failure.append(e)
+                started.set()
+                loop.close()
+                return
+            started.set()
+            loop.run_forever()
+            loop.run_until_complete(self.server.close())
+            loop.close()
+
+        self._thread = threading.Thread(target=run, name="StandinServer", daemon=True)
+        self._thread.start()
+        started.wait()
+        if failure:
+            raise failure[0]
+        return self.server
+
+    def call(self, function, *args):
+        """Call function(*args) on the server's loop; return its result."""
+
+        async def wrapper():
+            return function(*args)
+
+        return asyncio.run_coroutine_threadsafe(wrapper(), self._loop).result()
+
+    def stop(self) -> None:
+        if self._thread:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> StandinServer:
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+
+def _compact(result):
+    if isinstance(result, list):
+        return [_compact(entry) for entry in result]
+    if isinstance(result, dict) and result.get("_type") == "HELPER":
+        return {"_type": "HELPER", "resourceId": result["resourceId"]}
+    return result
+
+
+def _result(id_, result) -> dict:
+    return {"jsonrpc": "2.0", "id": id_, "result": result}
+
+
+def _error(id_, code: int, message: str) -> dict:
+    return {"jsonrpc": "2.0", "id": id_, "error": {"code": code, "message": message}}
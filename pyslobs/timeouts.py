@@ -0,0 +1,121 @@
+"""
+    Policies deciding how long a command waits for its response.
+
+    Set ConnectionConfig.timeout_policy to use one. Without a policy, every
+    command waits SlobsConnection.TIMEOUT seconds.
+"""
+from collections import deque
+from math import ceil
+from typing import Optional
+
+
+class TimeoutPolicy:
+    """Base class for timeout policies."""
+
+    def timeout(self, method: str) -> Optional[float]:
+        """Seconds a command to method may wait for a response. None is forever."""
+        raise NotImplementedError()
+
+    def observe(self, method: str, seconds: float) -> None:
+        """Called with how long each command took to be answered."""
+
+
+class FixedTimeoutPolicy(TimeoutPolicy):
+    """A fixed timeout, which may be overridden for particular methods.
+
+    e.g. FixedTimeoutPolicy(1, {"getScenes": 20, "fetchSceneCollectionsSchema": 20})
+    """
+
+    def __init__(
+        self,
+        default: Optional[float] = 5,
+        per_method: Optional[dict[str, Optional[float]]] = None,
+    ):
+        self.default = default
+        self.per_method = dict(per_method or {})
+
+    def timeout(self, method: str) -> Optional[float]:
+        return self.per_method.get(method, self.default)
+
+
+class AdaptiveTimeoutPolicy(TimeoutPolicy):
+    """Derives each method's timeout from the latencies it has been observed
+    to have: the given percentile of the most recent `window` responses,
+    multiplied by `factor`, and kept between `floor` and `ceiling`.
+
+    Until a method has `min_samples` observations, its timeout is taken from
+    `per_method`, else `initial`.
+
+    A command that times out counts as having taken its whole timeout, so a
+    method that has become slower earns a longer timeout as it keeps timing
+    out, up to the ceiling.
+    """
+
+    def __init__(
+        self,
+        factor: float = 3,
+        floor: float = 0.5,
+        ceiling: float = 60,
+        percentile: float = 99,
+        min_samples: int = 20,
+        window: int = 200,
+        initial: float = 5,
+        per_method: Optional[dict[str, float]] = None,
+    ):
+        if not 0 < percentile <= 100:
+            raise ValueError("percentile must be in (0, 100].")
+        if floor > ceiling:
+            raise ValueError("floor must not exceed ceiling.")
+        self.factor = factor
+        self.floor = floor
+        self.ceiling = ceiling
+        self.percentile = percentile
+        self.min_samples = max(1, min_samples)
+        self.window = window
+        self.initial = initial
+        self.per_method = dict(per_method or {})
+        self._samples: dict[str, deque] = dict()
+        # Map from method -> recent latencies, oldest first.
+        self._timeouts: dict[str, float] = dict()
+        # Map from method -> timeout derived from its current samples.
+        # Discarded when a new sample arrives; recalculated on demand.
+
+    def timeout(self, method: str) -> Optional[float]:
+        try:
+            return self._timeouts[method]
+        except KeyError:
+            pass
+        samples = self._samples.get(method)
+        if samples is None or len(samples) < self.min_samples:
+            return self.per_method.get(method, self.initial)
+        result = self._timeouts[method] = min(
+            self.ceiling,
+            max(self.floor, self.latency_percentile(method) * self.factor),
+        )
+        return result
+
+    def observe(self, method: str, seconds: float) -> None:
+        samples = self._samples.get(method)
+        if samples is None:
+            samples = self._samples[method] = deque(maxlen=self.window)
+        samples.append(seconds)
+        self._timeouts.pop(method, None)
+
+    def latency_percentile(self, method: str) -> Optional[float]:
+        """The configured percentile of the method's recent latencies, or None
+        if none have been observed."""
+        samples = self._samples.get(method)
+        if not samples:
+            return None
+        ordered = sorted(samples)
+        rank = ceil(len(ordered) * self.percentile / 100)
+        return ordered[max(0, rank - 1)]
+
+    def reset(self, method: Optional[str] = None) -> None:
+        """Forget the observations of method (or of all methods)."""
+        if method is None:
+            self._samples.clear()
+            self._timeouts.clear()
+        else:
+            self._samples.pop(method, None)
+            self._timeouts.pop(method, None)
@@ -0,0 +1,199 @@
+"""
+    Minimal WebSocket (RFC 6455) framing over asyncio streams.
+
+    This code should not be used by the client. It is shared by the asyncio
+    transport in connection.py and the stand-in server in standin/, so it only
+    implements what a JSON-RPC conversation with StreamLabs Desktop needs:
+        - the HTTP upgrade handshake,
+        - text, binary and control frames, with or without masking,
+        - reassembly of fragmented messages.
+
+    Extensions (e.g. permessage-deflate) and subprotocols are not negotiated.
+"""
+import asyncio
+import base64
+import hashlib
+import os
+import struct
+
+OPCODE_CONTINUATION = 0x0
+OPCODE_TEXT = 0x1
+OPCODE_BINARY = 0x2
+OPCODE_CLOSE = 0x8
+OPCODE_PING = 0x9
+OPCODE_PONG = 0xA
+
+_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+_MAX_HEADER_BYTES = 16384
+
+
+class FramingError(Exception):
+    """The peer broke the WebSocket protocol."""
+
+
+def accept_key(client_key: bytes) -> bytes:
+    return base64.b64encode(hashlib.sha1(client_key + _GUID).digest())
+
+
+def _apply_mask(payload: bytes, mask: bytes) -> bytes:
+    # XOR with a repeated 4-byte key. Done as one big-integer operation, which
+    # is much faster in CPython than looping over the bytes.
+    length = len(payload)
+    if not length:
+        return payload
+    repeated = (mask * (length // 4 + 1))[:length]
+    return (
+        int.from_bytes(payload, "big") ^ int.from_bytes(repeated, "big")
+    ).to_bytes(length, "big")
+
+
+def encode_frame(opcode: int, payload: bytes, mask: bool) -> bytes:
+    """Build a single, final frame. Clients must mask; servers must not."""
+    length = len(payload)
+    first = 0x80 | opcode
+    mask_bit = 0x80 if mask else 0
+    if length < 126:
+        header = struct.pack("!BB", first, mask_bit | length)
+    elif length < 1 << 16:
+        header = struct.pack("!BBH", first, mask_bit | 126, length)
+    else:
+        header = struct.pack("!BBQ", first, mask_bit | 127, length)
+    if mask:
+        key = os.urandom(4)
+        return header + key + _apply_mask(payload, key)
+    return header + payload
+
+
+async def _read_frame(reader: asyncio.StreamReader):
+    first, second = await reader.readexactly(2)
+    fin = bool(first & 0x80)
+    if first & 0x70:
+        raise FramingError("Reserved bits set; no extensions were negotiated.")
+    opcode = first & 0x0F
+    masked = bool(second & 0x80)
+    length = second & 0x7F
+    if length == 126:
+        (length,) = struct.unpack("!H", await reader.readexactly(2))
+    elif length == 127:
+        (length,) = struct.unpack("!Q", await reader.readexactly(8))
+    key = await reader.readexactly(4) if masked else None
+    payload = await reader.readexactly(length)
+    if key:
+        payload = _apply_mask(payload, key)
+    return fin, opcode, payload
+
+
+class MessageReader:
+    """Reads whole messages from a stream, reassembling fragments.
+
+    Control frames (close, ping, pong) are returned as soon as they arrive,
+    even in the middle of a fragmented message; the partial message is kept
+    until its final fragment is read.
+    """
+
+    def __init__(self, reader: asyncio.StreamReader):
+        self._reader = reader
+        self._fragments = []
+        self._fragment_opcode = None
+
+    async def read(self):
+        """Return (opcode, payload) for the next message or control frame."""
+        while True:
+            fin, opcode, payload = await _read_frame(self._reader)
+            if opcode >= OPCODE_CLOSE:
+                if not fin:
+                    raise FramingError("Fragmented control frame.")
+                return opcode, payload
+            if opcode == OPCODE_CONTINUATION:
+                if self._fragment_opcode is None:
+                    raise FramingError("Continuation without a first fragment.")
+                self._fragments.append(payload)
+                if fin:
+                    opcode = self._fragment_opcode
+                    payload = b"".join(self._fragments)
+                    self._fragments = []
+                    self._fragment_opcode = None
+                    return opcode, payload
+            elif self._fragment_opcode is not None:
+                raise FramingError("New message before previous one finished.")
+            elif fin:
+                return opcode, payload
+            else:
+                self._fragment_opcode = opcode
+                self._fragments = [payload]
+
+
+async def _read_http_header(reader: asyncio.StreamReader) -> list[str]:
+    try:
+        header = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.LimitOverrunError:
+        raise FramingError("HTTP upgrade header too long.")
+    if len(header) > _MAX_HEADER_BYTES:
+        raise FramingError("HTTP upgrade header too long.")
+    return header.decode("latin-1").split("\r\n")[:-2]
+
+
+def _parse_header_fields(lines: list[str]) -> dict[str, str]:
+    fields = {}
+    for line in lines:
+        name, _, value = line.partition(":")
+        fields[name.strip().lower()] = value.strip()
+    return fields
+
+
+async def client_handshake(
+    reader: asyncio.StreamReader,
+    writer: asyncio.StreamWriter,
+    host: str,
+    port: int,
+    path: str,
+) -> None:
+    key = base64.b64encode(os.urandom(16))
+    request = (
+        f"GET {path} HTTP/1.1\r\n"
+        f"Host: {host}:{port}\r\n"
+        "Upgrade: websocket\r\n"
+        "Connection: Upgrade\r\n"
+        f"Sec-WebSocket-Key: {key.decode('ascii')}\r\n"
+        "Sec-WebSocket-Version: 13\r\n"
+        "\r\n"
+    )
+    writer.write(request.encode("latin-1"))
+    await writer.drain()
+
+    lines = await _read_http_header(reader)
+    status = lines[0].split(" ", 2) if lines else []
+    if len(status) < 2 or status[1] != "101":
+        raise FramingError("Handshake rejected: %r" % (lines[:1],))
+    fields = _parse_header_fields(lines[1:])
+    if fields.get("sec-websocket-accept", "").encode("ascii") != accept_key(key):
+        raise FramingError("Handshake returned the wrong Sec-WebSocket-Accept.")
+
+
+async def server_handshake(
+    reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+) -> str:
+    """Accept a client's upgrade request. Returns the requested path."""
+    lines = await _read_http_header(reader)
+    request = lines[0].split(" ") if lines else []
+    fields = _parse_header_fields(lines[1:])
+    key = fields.get("sec-websocket-key")
+    if (
+        len(request) != 3
+        or request[0] != "GET"
+        or fields.get("upgrade", "").lower() != "websocket"
+        or not key
+    ):
+        writer.write(b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\n\r\n")
+        await writer.drain()
+        raise FramingError("Not a WebSocket upgrade request: %r" % (lines[:1],))
+    response = (
+        "HTTP/1.1 101 Switching Protocols\r\n"
+        "Upgrade: websocket\r\n"
+        "Connection: Upgrade\r\n"
+        f"Sec-WebSocket-Accept: {accept_key(key.encode('ascii')).decode('ascii')}\r\n"
+        "\r\n"
+    )
+    writer.write(response.encode("latin-1"))
+    await writer.drain()
+    return request[1]
@@ -14,8 +14,12 @@ setuptools.setup(
     long_description=long_description,
     long_description_content_type="text/markdown",
     url="https://github.com/Julian-O/pyslobs",
-    packages=setuptools.find_packages(),
+    packages=setuptools.find_packages(exclude=["benchmarks", "benchmarks.*"]),
     install_requires=["websocket-client"],
+    extras_require={
+        "orjson": ["orjson"],
+        "msgspec": ["msgspec"],
+    },
     classifiers=[
         "Programming Language :: Python :: 3",
         "Operating System :: OS Independent",
@@ -0,0 +1,606 @@
+"""
+    Exercises SlobsConnection's transport and command handling against a bare,
+    scripted WebSocket server, so each mechanism can be checked without the
+    stand-in's model of StreamLabs Desktop.
+"""
+
+import asyncio
+import json
+import unittest
+
+from pyslobs import (
+    AdaptiveTimeoutPolicy,
+    AuthenticationFailure,
+    ConnectionConfig,
+    FixedTimeoutPolicy,
+    ProtocolError,
+    ReconnectPolicy,
+    SlobsConnection,
+)
+from pyslobs import wsframing
+from pyslobs.jsoncodec import CODECS, StdlibJsonCodec
+from pyslobs.metrics import Histogram
+
+TOKEN = "token"
+
+
+class ScriptedServer:
+    """A WebSocket server that accepts TOKEN, and answers every other request
+    with respond(request). Each request is answered by its own task, so a
+    slow answer doesn't hold up those that follow.
+
+    By default, a "sleep" request is answered after args[0] seconds, a "fail"
+    request with an error, and every other request's result is [method, args].
+    """
+
+    def __init__(self, batches: bool = True):
+        self.batches = batches
+        # If False, batches are rejected with a single error, without an id.
+        self.requests = []
+        # Every request received, in order, except the authentications.
+        # A batch is one entry: a list of its requests.
+        self.unanswered = 0
+        self.max_unanswered = 0
+        # Requests received and not yet answered: now, and at most.
+        self.connections = 0
+        # Clients that have connected, ever.
+        self.port = None
+        self._server = None
+        self._writers = set()
+        self._tasks = set()
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle_client, "127.0.0.1", 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def close(self) -> None:
+        self._server.close()
+        self.drop_connections()
+        for task in self._tasks:
+            task.cancel()
+        await self._server.wait_closed()
+
+    def config(self, **kwargs) -> ConnectionConfig:
+        return ConnectionConfig(TOKEN, "127.0.0.1", self.port, **kwargs)
+
+    def drop_connections(self) -> None:
+        for writer in list(self._writers):
+            writer.transport.abort()
+
+    def emit(self, resource_id: str, data) -> None:
+        """Send an event to every client."""
+        for writer in self._writers:
+            self.send(
+                writer,
+                {
+                    "jsonrpc": "2.0",
+                    "result": {"_type": "EVENT", "resourceId": resource_id, "data": data},
+                },
+            )
+
+    async def respond(self, request):
+        method = request["method"]
+        args = request["params"].get("args", [])
+        if method == "sleep":
+            await asyncio.sleep(args[0])
+        elif method == "fail":
+            return error(request["id"], "Failed")
+        return result(request["id"], [method, args])
+
+    def send(self, writer, message) -> None:
+        if not writer.is_closing():
+            writer.write(
+                wsframing.encode_frame(
+                    wsframing.OPCODE_TEXT, json.dumps(message).encode("utf-8"), False
+                )
+            )
+
+    async def _handle_client(self, reader, writer):
+        await wsframing.server_handshake(reader, writer)
+        self._writers.add(writer)
+        self.connections += 1
+        messages = wsframing.MessageReader(reader)
+        try:
+            while True:
+                opcode, payload = await messages.read()
+                if opcode == wsframing.OPCODE_CLOSE:
+                    break
+                if opcode == wsframing.OPCODE_PING:
+                    writer.write(
+                        wsframing.encode_frame(wsframing.OPCODE_PONG, payload, False)
+                    )
+                elif opcode == wsframing.OPCODE_TEXT:
+                    self._handle_message(writer, json.loads(payload))
+        except (wsframing.FramingError, OSError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    def _handle_message(self, writer, message) -> None:
+        if isinstance(message, dict) and message["method"] == "auth":
+            if message["params"]["args"] == [TOKEN]:
+                self.send(writer, result(message["id"], True))
+            else:
+                self.send(writer, error(message["id"], "INVALID_TOKEN"))
+            return
+        self.requests.append(message)
+        if isinstance(message, list):
+            if not self.batches:
+                self.send(writer, error(None, "Invalid Request"))
+                return
+            task = asyncio.ensure_future(self._answer_batch(writer, message))
+        else:
+            task = asyncio.ensure_future(self._answer(writer, message))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _answer(self, writer, request):
+        self.unanswered += 1
+        self.max_unanswered = max(self.max_unanswered, self.unanswered)
+        try:
+            response = await self.respond(request)
+        finally:
+            self.unanswered -= 1
+        if response is not None:
+            self.send(writer, response)
+
+    async def _answer_batch(self, writer, requests):
+        responses = await asyncio.gather(*(self.respond(request) for request in requests))
+        self.send(writer, [response for response in responses if response is not None])
+
+
+def result(id_, value) -> dict:
+    return {"jsonrpc": "2.0", "id": id_, "result": value}
+
+
+def error(id_, message: str) -> dict:
+    return {"jsonrpc": "2.0", "id": id_, "error": {"code": -32600, "message": message}}
+
+
+class ScriptedTestCase(unittest.IsolatedAsyncioTestCase):
+    connection_options = dict(transport="asyncio")
+
+    def make_server(self) -> ScriptedServer:
+        return ScriptedServer()
+
+    async def asyncSetUp(self):
+        self.server = self.make_server()
+        await self.server.start()
+        self.conn = SlobsConnection(self.server.config(**self.connection_options))
+        self.background_task = asyncio.create_task(self.conn.background_processing())
+
+    async def asyncTearDown(self):
+        self.conn.close()
+        await self.background_task
+        await self.server.close()
+
+    async def command(self, method, *args):
+        return await self.conn.command(method, dict(resource="Service", args=list(args)))
+
+    async def reconnect(self):
+        """Drop the connection, and wait for the client to be back."""
+        connections = self.server.connections
+        self.server.drop_connections()
+        while self.server.connections == connections:
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.05)  # For subscriptions to be restored.
+
+
+async def read_messages(data: bytes) -> list:
+    reader = asyncio.StreamReader()
+    reader.feed_data(data)
+    reader.feed_eof()
+    messages = wsframing.MessageReader(reader)
+    result = []
+    while True:
+        try:
+            result.append(await messages.read())
+        except asyncio.IncompleteReadError:
+            return result
+
+
+def fragment(opcode: int, payload: bytes, fin: bool) -> bytes:
+    # encode_frame() only builds final frames.
+    frame = bytearray(wsframing.encode_frame(opcode, payload, mask=False))
+    if not fin:
+        frame[0] &= 0x7F
+    return bytes(frame)
+
+
+class WsFramingTestCase(unittest.IsolatedAsyncioTestCase):
+    def test_accept_key(self):
+        # The example in RFC 6455, section 1.3.
+        self.assertEqual(
+            wsframing.accept_key(b"dGhlIHNhbXBsZSBub25jZQ=="),
+            b"s3pPLMBiTxaQ9kYGzzhZRbK+xOo=",
+        )
+
+    async def test_lengths_and_masking(self):
+        for length in (0, 1, 125, 126, 65535, 65536):
+            payload = bytes(range(256)) * (length // 256) + bytes(length % 256)
+            for mask in (False, True):
+                frame = wsframing.encode_frame(wsframing.OPCODE_BINARY, payload, mask)
+                self.assertEqual(
+                    await read_messages(frame), [(wsframing.OPCODE_BINARY, payload)]
+                )
+
+    async def test_fragments_are_reassembled_around_control_frames(self):
+        data = (
+            fragment(wsframing.OPCODE_TEXT, b"Hello, ", fin=False)
+            + fragment(wsframing.OPCODE_PING, b"ping", fin=True)
+            + fragment(wsframing.OPCODE_CONTINUATION, b"World", fin=False)
+            + fragment(wsframing.OPCODE_CONTINUATION, b"!", fin=True)
+        )
+        self.assertEqual(
+            await read_messages(data),
+            [(wsframing.OPCODE_PING, b"ping"), (wsframing.OPCODE_TEXT, b"Hello, World!")],
+        )
+
+    async def test_protocol_errors(self):
+        for data in (
+            fragment(wsframing.OPCODE_CONTINUATION, b"orphan", fin=True),
+            fragment(wsframing.OPCODE_PING, b"", fin=False),
+            b"\xc1\x00",  # Reserved bit set.
+        ):
+            with self.assertRaises(wsframing.FramingError):
+                await read_messages(data)
+
+
+class AsyncTransportTestCase(ScriptedTestCase):
+    async def test_command(self):
+        self.assertEqual(await self.command("getThing", 1, "two"), ["getThing", [1, "two"]])
+        self.assertEqual(self.server.requests[0]["params"]["args"], [1, "two"])
+        self.assertTrue(self.conn.is_alive())
+
+    async def test_closed_by_server(self):
+        await self.command("getThing")
+        self.server.drop_connections()
+        await asyncio.wait_for(self.background_task, timeout=5)
+        self.assertFalse(self.conn.is_alive())
+        with self.assertRaises(ProtocolError):
+            await self.command("getThing")
+
+
+class CorrelationTestCase(ScriptedTestCase):
+    async def test_responses_out_of_order(self):
+        delays = [0.05, 0.01, 0.03, 0, 0.02]
+        tasks = [asyncio.create_task(self.command("sleep", delay)) for delay in delays]
+        await asyncio.sleep(0)
+        self.assertEqual(self.conn.in_flight, len(delays))
+        results = await asyncio.gather(*tasks)
+        self.assertEqual(results, [["sleep", [delay]] for delay in delays])
+        self.assertEqual(self.conn.in_flight, 0)
+
+    async def test_abandoned_commands_are_forgotten(self):
+        self.conn.TIMEOUT = 0.01
+        with self.assertRaises(asyncio.TimeoutError):
+            await self.command("sleep", 0.05)
+        self.assertEqual(self.conn.in_flight, 0)
+        task = asyncio.create_task(self.command("sleep", 0.05))
+        await asyncio.sleep(0.005)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        self.assertEqual(self.conn.in_flight, 0)
+        # The late responses don't disturb the commands that follow.
+        self.conn.TIMEOUT = 5
+        await asyncio.sleep(0.06)
+        self.assertEqual(await self.command("getThing"), ["getThing", []])
+
+
+class WindowTestCase(ScriptedTestCase):
+    connection_options = dict(transport="asyncio", max_in_flight=2)
+
+    async def test_window(self):
+        tasks = [
+            asyncio.create_task(
+                self.conn.command("sleep", dict(resource=f"Resource{i % 3}", args=[0.01]))
+            )
+            for i in range(10)
+        ]
+        await asyncio.sleep(0)
+        self.assertEqual(self.conn.in_flight, 2)
+        self.assertEqual(self.conn.queue_depth, 8)
+        await asyncio.gather(*tasks)
+        self.assertEqual(self.server.max_unanswered, 2)
+        self.assertEqual((self.conn.in_flight, self.conn.queue_depth), (0, 0))
+
+    async def test_same_resource_in_order(self):
+        await asyncio.gather(
+            *(self.command("sleep", 0.01 if i % 2 else 0, i) for i in range(8))
+        )
+        self.assertEqual(
+            [request["params"]["args"][1] for request in self.server.requests],
+            list(range(8)),
+        )
+
+
+class BatchTestCase(ScriptedTestCase):
+    async def test_batch(self):
+        results = await self.conn.command_batch(
+            [
+                ("getThing", dict(resource="Service", args=[1])),
+                ("fail", dict(resource="Service", args=[])),
+                ("sleep", dict(resource="Service", args=[0.01])),
+            ]
+        )
+        self.assertEqual(results[0], ["getThing", [1]])
+        self.assertIsInstance(results[1], ProtocolError)
+        self.assertEqual(results[2], ["sleep", [0.01]])
+        self.assertEqual(len(self.server.requests), 1)  # One frame.
+        self.assertEqual(len(self.server.requests[0]), 3)
+        self.assertTrue(self.conn.batch_supported)
+        self.assertEqual(await self.conn.command_batch([]), [])
+
+
+class BatchRejectedTestCase(ScriptedTestCase):
+    def make_server(self) -> ScriptedServer:
+        return ScriptedServer(batches=False)
+
+    async def test_falls_back_to_pipelining(self):
+        calls = [("getThing", dict(resource="Service", args=[i])) for i in range(3)]
+        for _ in range(2):
+            results = await self.conn.command_batch(calls)
+            self.assertEqual(results, [["getThing", [i]] for i in range(3)])
+            self.assertFalse(self.conn.batch_supported)
+        # The first batch, then its commands one by one; then only single ones.
+        self.assertIsInstance(self.server.requests[0], list)
+        self.assertEqual(len(self.server.requests), 7)
+        self.assertFalse(any(isinstance(r, list) for r in self.server.requests[1:]))
+
+
+def available_codecs() -> list:
+    codecs = []
+    for codec_class in CODECS.values():
+        try:
+            codecs.append(codec_class())
+        except ImportError:
+            pass  # Optional package not installed.
+    return codecs
+
+
+class CodecTestCase(ScriptedTestCase):
+    def test_codecs(self):
+        message = {"id": 1, "result": [{"name": "Scène ü", "n": 1.5, "ok": None}]}
+        for codec in available_codecs():
+            self.assertEqual(codec.decode(codec.encode(message)), message, codec.name)
+            self.assertEqual(codec.decode(json.dumps(message)), message, codec.name)
+            with self.assertRaises(codec.decode_errors):
+                codec.decode('{"id": ')
+
+    async def test_connection_uses_codec(self):
+        for codec in [codec.name for codec in available_codecs()] + [StdlibJsonCodec()]:
+            conn = SlobsConnection(self.server.config(transport="asyncio", codec=codec))
+            background_task = asyncio.create_task(conn.background_processing())
+            try:
+                self.assertEqual(
+                    await conn.command("getThing", dict(resource="Service", args=["ü"])),
+                    ["getThing", ["ü"]],
+                )
+            finally:
+                conn.close()
+                await background_task
+
+    def test_unknown_codec(self):
+        with self.assertRaises(ProtocolError):
+            SlobsConnection(self.server.config(transport="asyncio", codec="yaml"))
+
+
+class SubscribingServer(ScriptedServer):
+    """Answers "thingChanged" with a subscription, whose resource id differs
+    on each connection, as StreamLabs Desktop's may."""
+
+    async def respond(self, request):
+        if request["method"] == "thingChanged":
+            return result(
+                request["id"],
+                {
+                    "_type": "SUBSCRIPTION",
+                    "resourceId": f"Service.thingChanged.{self.connections}",
+                    "emitter": "STREAM",
+                },
+            )
+        return await super().respond(request)
+
+
+class ReconnectTestCase(ScriptedTestCase):
+    connection_options = dict(
+        transport="asyncio", reconnect=ReconnectPolicy(initial_delay=0.01)
+    )
+
+    def make_server(self) -> ScriptedServer:
+        return SubscribingServer()
+
+    async def test_subscriptions_are_restored(self):
+        received = asyncio.Queue()
+
+        async def callback(key, message):
+            await received.put((key, message))
+
+        resource_id = await self.conn.subscribe(
+            "thingChanged", dict(resource="Service", args=[]), callback
+        )
+        await self.reconnect()
+        self.server.emit("Service.thingChanged.2", "changed")
+        # Delivered under the resource id the subscriber knows.
+        self.assertEqual(
+            await asyncio.wait_for(received.get(), timeout=5), (resource_id, "changed")
+        )
+        self.assertEqual(await self.command("getThing"), ["getThing", []])
+        methods = [request["method"] for request in self.server.requests]
+        self.assertEqual(methods.count("thingChanged"), 2)
+
+    async def test_commands_in_flight_fail(self):
+        await self.command("getThing")
+        task = asyncio.create_task(self.command("sleep", 0.5))
+        await asyncio.sleep(0.01)
+        self.server.drop_connections()
+        with self.assertRaises(ProtocolError):
+            await task
+        await self.reconnect()
+        self.assertTrue(self.conn.is_alive())
+
+
+class RetryInFlightTestCase(ScriptedTestCase):
+    connection_options = dict(
+        transport="asyncio",
+        reconnect=ReconnectPolicy(initial_delay=0.01, retry_in_flight=True),
+    )
+
+    async def test_commands_in_flight_are_retried(self):
+        await self.command("getThing")
+        task = asyncio.create_task(self.command("sleep", 0.1, "once"))
+        await asyncio.sleep(0.01)
+        self.server.drop_connections()
+        self.assertEqual(await task, ["sleep", [0.1, "once"]])
+        sent = [request for request in self.server.requests if request["method"] == "sleep"]
+        self.assertEqual(len(sent), 2)
+
+
+class GiveUpTestCase(ScriptedTestCase):
+    connection_options = dict(
+        transport="asyncio",
+        reconnect=ReconnectPolicy(initial_delay=0.01, max_attempts=2),
+    )
+
+    async def test_gives_up(self):
+        await self.command("getThing")
+        await self.server.close()
+        await asyncio.wait_for(self.background_task, timeout=5)
+        self.assertFalse(self.conn.is_alive())
+        with self.assertRaises(ProtocolError):
+            await self.command("getThing")
+
+
+class MetricsTestCase(ScriptedTestCase):
+    connection_options = dict(transport="asyncio", metrics=True)
+
+    def test_histogram(self):
+        histogram = Histogram(buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 2):
+            histogram.observe(value)
+        self.assertEqual(
+            histogram.cumulative_counts(), [(0.1, 2), (1.0, 3), (float("inf"), 4)]
+        )
+        self.assertEqual(histogram.snapshot()["sum"], 2.65)
+
+    async def test_commands_are_measured(self):
+        self.conn.TIMEOUT = 0.05
+        await self.command("getThing", "ü")
+        await self.command("getThing")
+        with self.assertRaises(ProtocolError):
+            await self.command("fail")
+        with self.assertRaises(asyncio.TimeoutError):
+            await self.command("sleep", 0.1)
+        snapshot = self.conn.metrics.snapshot()
+        self.assertEqual(list(snapshot), ["fail", "getThing", "sleep"])
+        get_thing = snapshot["getThing"]
+        self.assertEqual((get_thing["calls"], get_thing["errors"]), (2, 0))
+        self.assertGreater(get_thing["bytes_sent"], 0)
+        self.assertGreater(get_thing["bytes_received"], 0)
+        for phase in ("encode", "send", "server_wait", "decode", "total"):
+            self.assertEqual(get_thing["latency"][phase]["count"], 2, phase)
+        self.assertEqual((snapshot["fail"]["calls"], snapshot["fail"]["errors"]), (1, 1))
+        self.assertEqual(snapshot["sleep"]["timeouts"], 1)
+        self.assertEqual(snapshot["sleep"]["latency"]["server_wait"]["count"], 0)
+        with self.assertRaises(TypeError):
+            await self.command("getThing", object())  # Fails before sending.
+        get_thing = self.conn.metrics.snapshot()["getThing"]
+        self.assertEqual((get_thing["calls"], get_thing["errors"]), (2, 1))
+        self.assertEqual(self.conn.metrics.frames_received, 3)  # Not the auth.
+
+        prometheus = self.conn.metrics.to_prometheus()
+        self.assertIn('pyslobs_commands_total{method="getThing"} 2', prometheus)
+        self.assertIn('pyslobs_command_timeouts_total{method="sleep"} 1', prometheus)
+        self.conn.metrics.reset()
+        self.assertEqual(self.conn.metrics.snapshot(), {})
+
+
+class TimeoutPolicyTestCase(ScriptedTestCase):
+    connection_options = dict(
+        transport="asyncio",
+        timeout_policy=FixedTimeoutPolicy(5, {"sleep": 0.02}),
+    )
+
+    def test_fixed(self):
+        policy = FixedTimeoutPolicy(1, {"getScenes": 20, "forever": None})
+        self.assertEqual(policy.timeout("getScenes"), 20)
+        self.assertEqual(policy.timeout("other"), 1)
+        self.assertIsNone(policy.timeout("forever"))
+
+    def test_adaptive(self):
+        policy = AdaptiveTimeoutPolicy(
+            factor=2,
+            floor=0.1,
+            ceiling=1,
+            min_samples=3,
+            window=4,
+            initial=5,
+            per_method={"slow": 10},
+        )
+        self.assertEqual((policy.timeout("fast"), policy.timeout("slow")), (5, 10))
+        for seconds in (0.01, 0.2, 0.03):
+            policy.observe("fast", seconds)
+        self.assertEqual(policy.timeout("fast"), 0.4)  # The slowest, doubled.
+        for _ in range(4):
+            policy.observe("fast", 0.01)  # The 0.2 leaves the window.
+        self.assertEqual(policy.timeout("fast"), 0.1)  # Raised to the floor.
+        for _ in range(4):
+            policy.observe("fast", 0.9)
+        self.assertEqual(policy.timeout("fast"), 1)  # Lowered to the ceiling.
+        policy.reset("fast")
+        self.assertEqual(policy.timeout("fast"), 5)
+        with self.assertRaises(ValueError):
+            AdaptiveTimeoutPolicy(percentile=0)
+        with self.assertRaises(ValueError):
+            AdaptiveTimeoutPolicy(floor=2, ceiling=1)
+
+    async def test_per_method_timeout(self):
+        self.assertEqual(await self.command("getThing"), ["getThing", []])
+        with self.assertRaises(asyncio.TimeoutError):
+            await self.command("sleep", 0.1)
+
+    async def test_adaptive_timeout_learns(self):
+        policy = self.conn.timeout_policy = AdaptiveTimeoutPolicy(
+            factor=2, floor=0.01, min_samples=3, initial=0.1
+        )
+        with self.assertRaises(asyncio.TimeoutError):
+            await self.command("sleep", 0.15)
+        # Timing out counts as taking the whole timeout, so once there are
+        # enough samples, the timeout is twice that.
+        for _ in range(2):
+            await self.command("sleep", 0.01)
+        self.assertGreaterEqual(policy.timeout("sleep"), 0.2)
+        await self.command("sleep", 0.15)
+
+
+class AsyncConnectionFailureTestCase(unittest.IsolatedAsyncioTestCase):
+    async def test_wrong_token(self):
+        server = ScriptedServer()
+        await server.start()
+        try:
+            config = server.config(transport="asyncio")
+            config.token = "wrong"
+            conn = SlobsConnection(config)
+            with self.assertRaises(AuthenticationFailure):
+                await conn.command("getThing", dict(resource="Service", args=[]))
+            conn.close()
+        finally:
+            await server.close()
+
+    async def test_refused(self):
+        server = ScriptedServer()
+        await server.start()
+        config = server.config(transport="asyncio")
+        await server.close()
+        conn = SlobsConnection(config)
+        with self.assertRaises(ProtocolError):
+            await conn.command("getThing", dict(resource="Service", args=[]))
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == "__main__":
+    main()
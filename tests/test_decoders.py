@@ -0,0 +1,170 @@
+"""
+    Exercises the compiled decoders directly, without a connection.
+"""
+
+import json
+import unittest
+
+import pyslobs  # noqa: F401 Registers the classes the factories create.
+from pyslobs.jsoncodec import (
+    RequestEncoder,
+    StdlibJsonCodec,
+    StreamedResult,
+    streamed_response,
+)
+from pyslobs.slobs.decoders import Field, camel_case, compile_decoder
+from pyslobs.slobs.factories import sceneitem_factory
+from pyslobs.slobs.typedefs import IVec2, NotificationType, TSceneNodeType
+
+
+def sceneitem_json(position) -> dict:
+    return dict(
+        resourceId='SceneItem["scene","item","source"]',
+        sourceId="source",
+        id="item",
+        parentId=None,
+        sceneId="scene",
+        sceneNodeType="item",
+        name="Item",
+        locked=False,
+        recordingVisible=True,
+        sceneItemId="item",
+        streamVisible=True,
+        transform=dict(
+            crop=dict(bottom=0, left=0, right=0, top=0),
+            position=position,
+            rotation=0,
+            scale=dict(x=1, y=1),
+        ),
+        visible=True,
+    )
+
+
+class DecoderTestCase(unittest.TestCase):
+    def test_camel_case(self):
+        self.assertEqual(camel_case("source_id"), "sourceId")
+        self.assertEqual(camel_case("id_"), "id")
+        self.assertEqual(camel_case("do_not_duplicate"), "doNotDuplicate")
+
+    def test_fields(self):
+        decoder = compile_decoder(
+            "decoder",
+            dict,
+            (
+                Field("type_", convert=NotificationType),
+                Field("play_sound"),
+                Field("tags", default=[]),
+                Field("resource_id", fallback="id"),
+            ),
+        )
+        json_dict = dict(type="INFO", playSound=True, id="a")
+        first = decoder(json_dict)
+        self.assertEqual(
+            first,
+            dict(type_=NotificationType.INFO, play_sound=True, tags=[], resource_id="a"),
+        )
+        self.assertIsNot(first["tags"], decoder(json_dict)["tags"])
+        with self.assertRaises(ValueError):
+            decoder(dict(type="NOT A TYPE", playSound=True, id="a"))
+        with self.assertRaises(KeyError):
+            decoder(dict(type="INFO", id="a"))
+
+    def test_non_literal_defaults_are_rejected(self):
+        with self.assertRaises(ValueError):
+            compile_decoder("decoder", dict, (Field("value", default=object()),))
+
+    def test_both_position_encodings(self):
+        for position in ([3, 4], dict(x=3, y=4)):
+            item = sceneitem_factory(None, sceneitem_json(position))
+            self.assertEqual(item.transform.position, IVec2(3, 4))
+            self.assertIs(item.scene_node_type, TSceneNodeType.ITEM)
+
+
+class StreamedResponseTestCase(unittest.TestCase):
+    def test_list_result_is_left_undecoded(self):
+        payload = '{"jsonrpc": "2.0", "id": 7, "result": [ {"a": [1, "]"]} , 2,[] ]}'
+        response = streamed_response(payload.encode(), {7})
+        self.assertEqual(response["id"], 7)
+        self.assertIsInstance(response["result"], StreamedResult)
+        self.assertEqual(list(response["result"]), [{"a": [1, "]"]}, 2, []])
+        self.assertEqual(list(streamed_response('{"id":7,"result":[]}', {7})["result"]), [])
+
+    def test_others_are_decoded_as_usual(self):
+        for payload in [
+            '{"jsonrpc":"2.0","id":8,"result":[1]}',  # Not streamed.
+            '{"jsonrpc":"2.0","id":7,"result":{"_type":"SUBSCRIPTION"}}',
+            '{"jsonrpc":"2.0","id":7,"error":{"code":-32600}}',
+            '{"jsonrpc":"2.0","result":[1],"id":7}',  # The id comes too late.
+            "[]",
+        ]:
+            self.assertIsNone(streamed_response(payload, {7}), payload)
+
+    def test_malformed_entries(self):
+        # Only found when the entries are reached.
+        for payload in [
+            '{"id":7,"result":[1 2]}',
+            '{"id":7,"result":[1,',
+            '{"id":7,"result":[1',
+        ]:
+            response = streamed_response(payload, {7})
+            with self.assertRaises(ValueError):
+                list(response["result"])
+
+
+class BytesCodec(StdlibJsonCodec):
+    # As orjson and msgspec return bytes.
+
+    def encode(self, obj) -> bytes:
+        return super().encode(obj).encode("utf-8")
+
+
+class RequestEncoderTestCase(unittest.TestCase):
+    def test_same_requests(self):
+        for codec in (StdlibJsonCodec(), BytesCodec()):
+            encoder = RequestEncoder(codec)
+            for id_, method, params in [
+                (1, "setVisibility", dict(resource='SceneItem["a","b"]', args=[True])),
+                (2, "setVisibility", dict(resource='SceneItem["a","b"]', args=[False])),
+                (3, "setDeflection", dict(resource='AudioSource["ü}"]', args=[0.5])),
+                ("auth_request", "auth", dict(resource="TcpServerService", args=["t"])),
+                (
+                    4,
+                    "getScenes",
+                    dict(resource="ScenesService", args=[], compactMode=True),
+                ),
+                (5, "getScenes", []),
+            ]:
+                self.assertEqual(
+                    json.loads(encoder.encode(id_, method, params)),
+                    dict(jsonrpc="2.0", id=id_, method=method, params=params),
+                )
+            self.assertEqual(len(encoder._templates), 3)
+
+    def test_other_params_are_encoded_as_given(self):
+        for codec in (StdlibJsonCodec(), BytesCodec()):
+            encoder = RequestEncoder(codec)
+            for params in [
+                dict(args=[1], compactMode=True),
+                dict(resource="ScenesService", compactMode=True),
+                dict(args=[1]),
+                dict(resource="ScenesService", args=[], other=None),
+            ]:
+                self.assertEqual(
+                    json.loads(encoder.encode(1, "m", params))["params"], params
+                )
+            self.assertEqual(encoder._templates, {})
+
+    def test_cache_is_bounded(self):
+        encoder = RequestEncoder(StdlibJsonCodec())
+        encoder.MAX_TEMPLATES = 10
+        for i in range(25):
+            encoder.encode(i, "getModel", dict(resource=f"Source[{i}]", args=[]))
+        self.assertLessEqual(len(encoder._templates), 10)
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""
+    Exercises PubSubHub directly, without a connection.
+"""
+
+import asyncio
+import random
+import unittest
+
+from pyslobs import UNSUBSCRIBED, Delivery, Overflow, SubscriptionPreferences
+from pyslobs.pubsubhub import PubSubHub
+
+
+class QueuedDeliveryTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.hub = PubSubHub()
+        self.received = []
+        self.release = asyncio.Event()
+
+    async def record(self, key, message):
+        self.received.append((key, message))
+
+    async def record_slowly(self, key, message):
+        await asyncio.sleep(random.random() / 1000)
+        self.received.append((key, message))
+
+    async def record_when_released(self, key, message):
+        await self.release.wait()
+        self.received.append((key, message))
+
+    async def drain(self, callback):
+        queue = self.hub.delivery_queue(callback)
+        while queue.depth:
+            await asyncio.sleep(0.001)
+        await asyncio.sleep(0.01)
+
+    async def test_order_is_kept_across_keys(self):
+        prefs = SubscriptionPreferences(delivery=Delivery.QUEUED)
+        await self.hub.subscribe("a", self.record_slowly, prefs)
+        await self.hub.subscribe("b", self.record_slowly, prefs)
+        sent = [(random.choice("ab"), i) for i in range(200)]
+        for key, message in sent:
+            await self.hub.publish(key, message)
+        await self.drain(self.record_slowly)
+        self.assertEqual(self.received, sent)
+        stats = self.hub.queue_stats()["QueuedDeliveryTestCase.record_slowly"]
+        self.assertEqual(stats["delivered"], 200)
+
+    async def test_block(self):
+        prefs = SubscriptionPreferences(delivery=Delivery.QUEUED, queue_size=2)
+        await self.hub.subscribe("a", self.record_when_released, prefs)
+        await self.hub.publish("a", 0)
+        await asyncio.sleep(0.01)  # Being delivered.
+        for i in (1, 2):
+            await self.hub.publish("a", i)
+        blocked = asyncio.ensure_future(self.hub.publish("a", 3))
+        await asyncio.sleep(0.01)
+        self.assertFalse(blocked.done())
+        self.assertEqual(self.hub.delivery_queue(self.record_when_released).depth, 2)
+        self.release.set()
+        await blocked
+        await self.drain(self.record_when_released)
+        self.assertEqual([message for _, message in self.received], [0, 1, 2, 3])
+
+    async def test_drop_oldest(self):
+        prefs = SubscriptionPreferences(
+            delivery=Delivery.QUEUED, queue_size=2, overflow=Overflow.DROP_OLDEST
+        )
+        await self.hub.subscribe("a", self.record_when_released, prefs)
+        await self.hub.publish("a", 0)
+        await asyncio.sleep(0.01)  # Being delivered.
+        for i in range(1, 5):
+            await self.hub.publish("a", i)
+        queue = self.hub.delivery_queue(self.record_when_released)
+        self.assertEqual(queue.dropped, 2)
+        self.release.set()
+        await self.drain(self.record_when_released)
+        self.assertEqual([message for _, message in self.received], [0, 3, 4])
+
+    async def test_coalesce(self):
+        prefs = SubscriptionPreferences(
+            delivery=Delivery.QUEUED, queue_size=2, overflow=Overflow.COALESCE
+        )
+        await self.hub.subscribe("a", self.record_when_released, prefs)
+        await self.hub.subscribe("b", self.record_when_released, prefs)
+        await self.hub.publish("a", 0)
+        await asyncio.sleep(0.01)  # Being delivered.
+        for key, message in [("a", 1), ("b", 2), ("a", 3), ("b", 4)]:
+            await self.hub.publish(key, message)
+        self.assertEqual(self.hub.delivery_queue(self.record_when_released).coalesced, 2)
+        self.release.set()
+        await self.drain(self.record_when_released)
+        self.assertEqual(self.received, [("a", 0), ("a", 3), ("b", 4)])
+
+    async def test_unsubscribe_drains_queue(self):
+        prefs = SubscriptionPreferences(
+            delivery=Delivery.QUEUED, notify_on_unsubscribe=True
+        )
+        await self.hub.subscribe("a", self.record_slowly, prefs)
+        for i in range(10):
+            await self.hub.publish("a", i)
+        await self.hub.unsubscribe("a", self.record_slowly)
+        self.assertIsNone(self.hub.delivery_queue(self.record_slowly))
+        await asyncio.sleep(0.1)
+        self.assertEqual(self.received[-1], ("a", UNSUBSCRIBED))
+        self.assertEqual([message for _, message in self.received[:-1]], list(range(10)))
+
+    async def test_task_delivery_is_unchanged(self):
+        await self.hub.subscribe("a", self.record)
+        await self.hub.publish("a", 1)
+        await asyncio.sleep(0)
+        self.assertEqual(self.received, [("a", 1)])
+        self.assertIsNone(self.hub.delivery_queue(self.record))
+
+
+class RateLimitTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.hub = PubSubHub()
+        self.received = []
+
+    async def record(self, key, message):
+        self.received.append(message)
+
+    async def test_debounce_per_identity(self):
+        # The gaps are far shorter than the debounce, even on a busy machine.
+        prefs = SubscriptionPreferences(debounce=0.2, coalesce_key="sceneItemId")
+        await self.hub.subscribe("a", self.record, prefs)
+        for i in range(10):
+            await self.hub.publish("a", dict(sceneItemId=i % 2, x=i))
+            await asyncio.sleep(0.001)
+        self.assertEqual(self.received, [])
+        await asyncio.sleep(0.4)
+        self.assertEqual(
+            sorted(self.received, key=lambda m: m["x"]),
+            [dict(sceneItemId=0, x=8), dict(sceneItemId=1, x=9)],
+        )
+
+    async def test_max_rate(self):
+        prefs = SubscriptionPreferences(max_rate=20)
+        await self.hub.subscribe("a", self.record, prefs)
+        for i in range(10):
+            await self.hub.publish("a", i)
+        await asyncio.sleep(0)
+        self.assertEqual(self.received, [0])  # The first isn't held back.
+        await asyncio.sleep(0.08)
+        self.assertEqual(self.received, [0, 9])
+
+    async def test_queued_coalescing(self):
+        release = asyncio.Event()
+
+        async def record_when_released(key, message):
+            await release.wait()
+            self.received.append(message)
+
+        prefs = SubscriptionPreferences(
+            delivery=Delivery.QUEUED, coalesce_key=lambda message: message[0]
+        )
+        await self.hub.subscribe("a", record_when_released, prefs)
+        await self.hub.publish("a", ("x", 0))
+        await asyncio.sleep(0.01)  # Being delivered.
+        for message in [("x", 1), ("y", 2), ("x", 3)]:
+            await self.hub.publish("a", message)
+        release.set()
+        await asyncio.sleep(0.01)
+        self.assertEqual(self.received, [("x", 0), ("x", 3), ("y", 2)])
+
+    async def test_unsubscribe_discards_held(self):
+        prefs = SubscriptionPreferences(debounce=0.01)
+        await self.hub.subscribe("a", self.record, prefs)
+        await self.hub.publish("a", 1)
+        await self.hub.unsubscribe("a", self.record)
+        await asyncio.sleep(0.03)
+        self.assertEqual(self.received, [])
+
+
+class FilterTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.hub = PubSubHub()
+        self.received = dict()
+
+    def recorder(self, name):
+        async def record(key, message):
+            self.received.setdefault(name, []).append(message["n"])
+
+        return record
+
+    async def test_filters(self):
+        subscriptions = dict(
+            all=None,
+            scene1=dict(sceneId=1),
+            scene1_visible=dict(sceneId=1, visible=True),
+            scene2=dict(sceneId=2),
+            unhashable=dict(sceneId=[3]),
+            odd=lambda message: message["n"] % 2,
+        )
+        for name, filter_ in subscriptions.items():
+            await self.hub.subscribe(
+                "a", self.recorder(name), SubscriptionPreferences(filter_=filter_)
+            )
+        messages = [
+            dict(n=0, sceneId=1, visible=True),
+            dict(n=1, sceneId=1, visible=False),
+            dict(n=2, sceneId=2),
+            dict(n=3, sceneId=[3]),
+            dict(n=4),
+        ]
+        for message in messages:
+            await self.hub.publish("a", message)
+        await asyncio.sleep(0)
+        self.assertEqual(
+            self.received,
+            dict(
+                all=[0, 1, 2, 3, 4],
+                scene1=[0, 1],
+                scene1_visible=[0],
+                scene2=[2],
+                unhashable=[3],
+                odd=[1, 3],
+            ),
+        )
+
+    async def test_backlog_is_filtered(self):
+        await self.hub.publish("a", dict(n=0, sceneId=1))
+        await self.hub.publish("a", dict(n=1, sceneId=2))
+        await self.hub.subscribe(
+            "a", self.recorder("scene2"), SubscriptionPreferences(filter_=dict(sceneId=2))
+        )
+        await asyncio.sleep(0)
+        self.assertEqual(self.received, dict(scene2=[1]))
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == "__main__":
+    main()
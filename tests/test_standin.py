@@ -0,0 +1,501 @@
+"""
+    Exercises the connection against the stand-in server in pyslobs.standin,
+    so it runs without StreamLabs Desktop.
+"""
+
+import asyncio
+import contextlib
+import gc
+import io
+import unittest
+
+from pyslobs import (
+    AdaptiveTimeoutPolicy,
+    AuthenticationFailure,
+    CompactTransform,
+    FixedTimeoutPolicy,
+    IVec2,
+    Overflow,
+    ProtocolError,
+    ReconnectPolicy,
+    ScenesService,
+    SceneCollectionsService,
+    SceneGraphMirror,
+    SlobsConnection,
+    SourcesService,
+    hydrate,
+)
+from pyslobs.standin import StandinModel, StandinServer, StandinThread
+from ex_all import exercise_all_ro
+
+
+async def run_quietly(exercise, conn):
+    with contextlib.redirect_stdout(io.StringIO()):
+        await exercise(conn)
+
+
+class StandinTestCase(unittest.IsolatedAsyncioTestCase):
+    server_options = dict()
+    connection_options = dict(transport="asyncio")
+
+    async def asyncSetUp(self):
+        self.model = StandinModel.seeded(scenes=3, items_per_scene=4, folders_per_scene=2)
+        self.server = StandinServer(self.model, **self.server_options)
+        await self.server.start()
+        self.conn = SlobsConnection(
+            self.server.connection_config(**self.connection_options)
+        )
+        self.background_task = asyncio.create_task(self.conn.background_processing())
+
+    async def asyncTearDown(self):
+        self.conn.close()
+        await self.background_task
+        await self.server.close()
+
+
+class ServicesTestCase(StandinTestCase):
+    async def test_exercise_all_ro(self):
+        await run_quietly(exercise_all_ro, self.conn)
+
+    async def test_scenes(self):
+        ss = ScenesService(self.conn)
+        scenes = await ss.get_scenes()
+        self.assertEqual([scene.name for scene in scenes], ["Scene 1", "Scene 2", "Scene 3"])
+        self.assertEqual(len(scenes[0].nodes), 6)
+        self.assertEqual(scenes[0].nodes._nodes, [None] * 6)  # Not built yet.
+        self.assertEqual(scenes[0].nodes[1:3], list(scenes[0].nodes)[1:3])
+        self.assertIs(scenes[0].nodes[-1], scenes[0].nodes[5])
+        self.assertEqual(scenes[0].nodes._json_nodes, [None] * 6)  # Not kept.
+        self.assertEqual(await ss.active_scene_id(), scenes[0].id)
+
+        new_scene = await ss.create_scene("New")
+        folder = await new_scene.create_folder("Folder")
+        source = await SourcesService(self.conn).create_source("Colour", "color_source")
+        item = await new_scene.add_source(source.source_id)
+        await folder.add(item.id_)
+        self.assertEqual(
+            [node.id_ for node in await folder.get_nodes()], [item.id_]
+        )
+        await ss.remove_scene(new_scene.id)
+        self.assertEqual(len(await ss.get_scenes()), 3)
+
+    async def test_streamed_results(self):
+        ss = ScenesService(self.conn)
+        scenes = [scene async for scene in ss.iter_scenes()]
+        self.assertEqual(
+            [scene.id for scene in scenes], [scene.id for scene in await ss.get_scenes()]
+        )
+        self.assertEqual(len(scenes[0].nodes), 6)
+        self.assertFalse(self.conn._streamed_ids)
+        sources = [source async for source in SourcesService(self.conn).iter_sources()]
+        self.assertEqual(len(sources), len(await SourcesService(self.conn).get_sources()))
+        # A promise: decoded as a whole, then yielded.
+        schemas = SceneCollectionsService(self.conn).iter_scene_collections_schema()
+        self.assertEqual(len([schema async for schema in schemas]), 1)
+
+    async def test_promise(self):
+        schemas = await SceneCollectionsService(self.conn).fetch_scene_collections_schema()
+        self.assertEqual(len(schemas), 1)
+        self.assertEqual(len(schemas[0].scenes), 3)
+
+    async def test_unknown_method(self):
+        with self.assertRaises(ProtocolError):
+            await self.conn.command("noSuchMethod", dict(resource="ScenesService", args=[]))
+
+    async def test_events(self):
+        ss = ScenesService(self.conn)
+        received = asyncio.Queue()
+
+        async def callback(key, message):
+            await received.put(message)
+
+        subscription = await ss.scene_switched.subscribe(callback)
+        scenes = await ss.get_scenes()
+        await ss.make_scene_active(scenes[1].id)
+        message = await asyncio.wait_for(received.get(), timeout=5)
+        self.assertEqual(message["id"], scenes[1].id)
+        await subscription.unsubscribe()
+
+    async def test_event_stream(self):
+        ss = ScenesService(self.conn)
+        scenes = await ss.get_scenes()
+        switches = [scenes[i % 3].id for i in range(1, 11)]
+        async with ss.scene_switched.stream(maxsize=4) as events:
+            for scene_id in switches[:3]:
+                await ss.make_scene_active(scene_id)
+            self.assertEqual((await anext(events))["id"], switches[0])
+            for scene_id in switches[3:]:
+                await ss.make_scene_active(scene_id)
+            received = [switches[0]]
+            while len(received) < len(switches):
+                batch = await asyncio.wait_for(events.get_many(max_items=4), timeout=5)
+                self.assertLessEqual(len(batch), 4)
+                received.extend(message["id"] for message in batch)
+        self.assertEqual(received, switches)
+        self.assertFalse(self.conn.hub.has_subscribers("ScenesService.sceneSwitched"))
+
+    async def test_slow_stream_does_not_block_commands(self):
+        ss = ScenesService(self.conn)
+        scenes = await ss.get_scenes()
+        with self.assertRaises(ValueError):
+            ss.scene_switched.stream(overflow=Overflow.BLOCK)
+        async with ss.scene_switched.stream(maxsize=2) as events:
+            for i in range(8):
+                await asyncio.wait_for(ss.make_scene_active(scenes[i % 3].id), 5)
+            received = []
+            # The reader is behind, and still sends commands while reading.
+            while batch := await asyncio.wait_for(events.get_many(), timeout=5):
+                received.extend(batch)
+                await asyncio.wait_for(ss.active_scene_id(), timeout=5)
+                if received[-1]["id"] == scenes[7 % 3].id:
+                    break
+        self.assertLess(len(received), 8)  # The oldest were dropped.
+
+    async def test_shared_subscriptions(self):
+        ss = ScenesService(self.conn)
+        received = asyncio.Queue()
+        callbacks = []
+        for i in range(5):
+            async def callback(key, message, i=i):
+                await received.put(i)
+
+            callbacks.append(callback)
+
+        scenes = await ss.get_scenes()
+        requests_before = self.server.requests_received
+        subscriptions = await asyncio.gather(
+            *(ss.scene_switched.subscribe(callback) for callback in callbacks)
+        )
+        self.assertEqual(self.server.requests_received - requests_before, 1)
+
+        await ss.make_scene_active(scenes[1].id)
+        self.assertEqual(
+            sorted([await asyncio.wait_for(received.get(), timeout=5) for _ in range(5)]),
+            list(range(5)),
+        )
+
+        requests_before = self.server.requests_received
+        for subscription in subscriptions[:-1]:
+            await subscription.unsubscribe()
+        self.assertEqual(self.server.requests_received, requests_before)
+        await subscriptions[-1].unsubscribe()
+        self.assertEqual(self.server.requests_received - requests_before, 1)
+
+    async def test_concurrent_commands(self):
+        ss = ScenesService(self.conn)
+        results = await asyncio.gather(*(ss.active_scene_id() for _ in range(50)))
+        self.assertEqual(len(set(results)), 1)
+
+    async def test_batch(self):
+        results = await self.conn.command_batch(
+            [
+                ("activeSceneId", dict(resource="ScenesService", args=[])),
+                ("noSuchMethod", dict(resource="ScenesService", args=[])),
+            ]
+        )
+        self.assertIsInstance(results[0], str)
+        self.assertIsInstance(results[1], ProtocolError)
+        self.assertTrue(self.conn.batch_supported)
+
+
+class MirrorTestCase(StandinTestCase):
+    async def test_mirror_follows_changes(self):
+        ss = ScenesService(self.conn)
+        sources = SourcesService(self.conn)
+        async with SceneGraphMirror(self.conn, check_interval=None) as mirror:
+            self.assertEqual(len(mirror.scenes()), 3)
+            active = await ss.active_scene()
+            self.assertEqual(mirror.active_scene_id, active.id)
+            self.assertEqual(
+                [node.id_ for node in mirror.nodes()], [node.id_ for node in active.nodes]
+            )
+
+            new_scene = await ss.create_scene("New")
+            source = await sources.create_source("Colour", "color_source")
+            item = await new_scene.add_source(source.source_id)
+            await item.set_visibility(False)
+            folder = await new_scene.create_folder("Folder")
+            await ss.make_scene_active(new_scene.id)
+            removed = (await active.get_items())[0]
+            await removed.remove()
+            await asyncio.sleep(0.1)
+
+            self.assertEqual(mirror.active_scene_id, new_scene.id)
+            self.assertIsNone(mirror.node(removed.id_))
+            self.assertEqual(mirror.node(item.id_).visible, False)
+            self.assertEqual(mirror.visible_items(), [])
+            self.assertEqual(mirror.node(folder.id_).name, "Folder")
+            self.assertEqual(mirror.source(source.source_id).name, "Colour")
+            self.assertEqual(mirror.items_of_source(source.source_id)[0].id_, item.id_)
+            self.assertEqual(await mirror.check(), 0)
+
+            await sources.remove_source(source.source_id)
+            await asyncio.sleep(0.1)
+            self.assertIsNone(mirror.source(source.source_id))
+            self.assertIsNone(mirror.node(item.id_))
+            self.assertEqual(await mirror.check(), 0)
+            self.assertGreater(mirror.events_applied, 0)
+
+
+class IdentityMapTestCase(StandinTestCase):
+    connection_options = dict(transport="asyncio", identity_map=True)
+
+    async def test_same_resource_same_object(self):
+        ss = ScenesService(self.conn)
+        scene = (await ss.get_scenes())[0]
+        item = (await scene.get_items())[0]
+        self.assertIs(await ss.get_scene(scene.id), scene)
+        self.assertTrue(item.visible)
+
+        await (await scene.get_item(item.id_)).set_visibility(False)
+        self.assertIs((await scene.get_items())[0], item)
+        self.assertFalse(item.visible)  # Refreshed in place.
+        self.assertGreater(self.conn.identity_map.hits, 0)
+
+    async def test_same_selection_same_object(self):
+        scene = await ScenesService(self.conn).active_scene()
+        item = (await scene.get_items())[0]
+        selection = await scene.get_selection([item.id_])
+        self.assertIs(await selection.select([item.id_]), selection)
+
+    async def test_scene_nodes_do_not_undo_changes(self):
+        ss = ScenesService(self.conn)
+        scene = await ss.active_scene()
+        item = (await scene.get_items())[0]
+        await item.set_visibility(False)
+        node = next(node for node in scene.nodes if node.id_ == item.id_)
+        self.assertIs(node, item)
+        self.assertFalse(item.visible)
+
+        count = len(self.conn.identity_map)
+        del scene, item
+        gc.collect()
+        self.assertLess(len(self.conn.identity_map), count)
+
+
+class CompactTransformTestCase(StandinTestCase):
+    connection_options = dict(transport="asyncio", compact_transforms=True)
+
+    async def test_compact_transform_reads_like_itransform(self):
+        scene = await ScenesService(self.conn).active_scene()
+        item = (await scene.get_items())[0]
+        transform = item.transform
+        self.assertIsInstance(transform, CompactTransform)
+        self.assertEqual(transform, transform.to_itransform())
+        crop, position, rotation, scale = transform
+        self.assertEqual(position.x, transform.position_x)
+        self.assertEqual(scale, transform.scale)
+        await item.set_scale(IVec2(2, 3))
+        self.assertIsInstance(item.transform, CompactTransform)
+        self.assertEqual(item.transform.scale, IVec2(2, 3))
+
+
+class CompactModeTestCase(StandinTestCase):
+    connection_options = dict(transport="asyncio", compact_mode=True)
+
+    async def test_compact_then_hydrate(self):
+        ss = ScenesService(self.conn)
+        scenes = await ss.get_scenes()
+        self.assertEqual(len(scenes), 3)
+        self.assertTrue(scenes[0].id)
+        self.assertIsNone(scenes[0].name)  # Not hydrated yet.
+        full = await ss.get_scenes(compact=False)
+        self.assertEqual([scene.id for scene in scenes], [scene.id for scene in full])
+
+        nodes = await scenes[0].get_nodes()
+        sources = await SourcesService(self.conn).get_sources()
+        self.assertIsNone(sources[0].type_)
+        resource_ids = [each.resource_id for each in scenes + nodes + sources]
+        batches = self.server.batches_received
+        await hydrate(scenes + nodes + sources)
+        self.assertEqual(self.server.batches_received, batches + 1)
+        # The getModel replies have no resourceId; each object keeps its own.
+        self.assertEqual(
+            [each.resource_id for each in scenes + nodes + sources], resource_ids
+        )
+        self.assertEqual(
+            [node.resource_id for node in scenes[0].nodes],
+            [node.resource_id for node in full[0].nodes],
+        )
+        self.assertEqual([scene.name for scene in scenes], [scene.name for scene in full])
+        self.assertEqual(len(scenes[0].nodes), len(nodes))
+        self.assertEqual(
+            [node.name for node in nodes], [node.name for node in full[0].nodes]
+        )
+        self.assertIsNotNone(sources[0].type_)
+
+        await ss.remove_scene(full[2].id)
+        with self.assertRaises(ProtocolError):
+            await hydrate(scenes)
+        self.assertTrue(scenes[0].name)  # The others were still hydrated.
+
+    async def test_hydrate_undecodable_model(self):
+        sources = await SourcesService(self.conn).get_sources()
+        del self.server.model.source(sources[0].source_id)["type"]
+        with self.assertRaises(ProtocolError):
+            await hydrate(sources[:2])
+        self.assertIsNone(sources[0].type_)
+        self.assertIsNotNone(sources[1].type_)  # Still hydrated.
+
+    async def test_mutators_on_compact_objects(self):
+        ss = ScenesService(self.conn)
+        scene = (await ss.get_scenes())[0]
+        self.assertEqual(list(scene.nodes), [])  # Not hydrated yet.
+        item = next(
+            node for node in await scene.get_nodes() if node.resource_id.startswith("SceneItem[")
+        )
+        self.assertIsNone(item.transform)
+        await item.set_scale(IVec2(2, 3))
+        self.assertIsNone(item.transform)
+        await item.set_visibility(False)
+        self.assertFalse(item.visible)
+        await scene.set_name("Renamed")
+        self.assertEqual(scene.name, "Renamed")
+        await hydrate([scene, item])
+        self.assertEqual(item.transform.scale, IVec2(2, 3))
+        self.assertEqual(len(scene.nodes), 6)
+
+
+class NoBatchTestCase(StandinTestCase):
+    server_options = dict(batches=False)
+
+    async def test_batch_falls_back(self):
+        results = await self.conn.command_batch(
+            [("activeSceneId", dict(resource="ScenesService", args=[]))] * 3
+        )
+        self.assertEqual(len(set(results)), 1)
+        self.assertFalse(self.conn.batch_supported)
+
+
+class WindowTestCase(StandinTestCase):
+    server_options = dict(latency=0.01)
+    connection_options = dict(
+        transport="asyncio",
+        max_in_flight=4,
+        metrics=True,
+        timeout_policy=AdaptiveTimeoutPolicy(min_samples=5),
+    )
+
+    async def test_window_and_metrics(self):
+        ss = ScenesService(self.conn)
+        await asyncio.gather(*(ss.active_scene_id() for _ in range(20)))
+        self.assertEqual(self.conn.in_flight, 0)
+        snapshot = self.conn.metrics.snapshot()
+        self.assertEqual(snapshot["activeSceneId"]["calls"], 20)
+        self.assertEqual(snapshot["activeSceneId"]["latency"]["server_wait"]["count"], 20)
+        self.assertIn("pyslobs_commands_total", self.conn.metrics.to_prometheus())
+        self.assertEqual(self.conn.timeout_policy.timeout("activeSceneId"), 0.5)
+
+
+class SharedReadsTestCase(StandinTestCase):
+    connection_options = dict(transport="asyncio", share_reads=True, metrics=True)
+
+    async def test_identical_reads_share_a_request(self):
+        ss = ScenesService(self.conn)
+        await ss.active_scene_id()  # Authenticated.
+        requests_before = self.server.requests_received
+        results = await asyncio.gather(*(ss.get_scenes() for _ in range(50)))
+        self.assertEqual(self.server.requests_received - requests_before, 1)
+        self.assertEqual(self.conn.commands_shared, 49)
+        metrics = self.conn.metrics.snapshot()["getScenes"]
+        self.assertEqual((metrics["calls"], metrics["shared"]), (1, 49))
+        self.assertEqual([scene.id for scene in results[0]], [s.id for s in results[-1]])
+        self.assertEqual(self.conn._flights, {})
+        # Once answered, the next one is sent again.
+        await ss.get_scenes()
+        self.assertEqual(self.server.requests_received - requests_before, 2)
+
+    async def test_shared_read_survives_cancelled_caller(self):
+        ss = ScenesService(self.conn)
+        first = asyncio.create_task(ss.active_scene_id())
+        second = asyncio.create_task(ss.active_scene_id())
+        await asyncio.sleep(0)
+        first.cancel()
+        self.assertIsInstance(await second, str)
+        with self.assertRaises(asyncio.CancelledError):
+            await first
+
+
+class LateResponseTestCase(StandinTestCase):
+    server_options = dict(latency=0.05)
+    connection_options = dict(
+        transport="asyncio", timeout_policy=FixedTimeoutPolicy(0.01)
+    )
+
+    async def test_late_responses_are_reported_not_stored(self):
+        late = []
+        self.conn.hub.on_late_message = lambda key, message, details: late.append(
+            details["method"]
+        )
+        for method, resource in (
+            ("activeSceneId", "ScenesService"),
+            ("fetchSceneCollectionsSchema", "SceneCollectionsService"),
+        ):
+            with self.assertRaises(asyncio.TimeoutError):
+                await self.conn.command(method, dict(resource=resource, args=[]))
+        await asyncio.sleep(0.2)
+        # The promise's fulfilment is late too.
+        self.assertEqual(
+            late,
+            ["activeSceneId", "fetchSceneCollectionsSchema", "fetchSceneCollectionsSchema"],
+        )
+        self.assertEqual(len(self.conn.hub.undelivered), 0)
+        self.assertEqual(self.conn.hub.undelivered.late, 3)
+
+
+class ReconnectTestCase(StandinTestCase):
+    connection_options = dict(
+        transport="asyncio",
+        reconnect=ReconnectPolicy(initial_delay=0.01),
+    )
+
+    async def test_reconnect_keeps_subscriptions(self):
+        ss = ScenesService(self.conn)
+        received = asyncio.Queue()
+
+        async def callback(key, message):
+            await received.put(message)
+
+        await ss.scene_switched.subscribe(callback)
+        scenes = await ss.get_scenes()
+        self.server.drop_connections()
+        await asyncio.sleep(0.1)
+        await ss.make_scene_active(scenes[2].id)
+        message = await asyncio.wait_for(received.get(), timeout=5)
+        self.assertEqual(message["id"], scenes[2].id)
+
+
+class AuthenticationTestCase(unittest.IsolatedAsyncioTestCase):
+    async def test_wrong_token(self):
+        async with StandinServer(token="right") as server:
+            config = server.connection_config(transport="asyncio")
+            config.token = "wrong"
+            conn = SlobsConnection(config)
+            with self.assertRaises(AuthenticationFailure):
+                await ScenesService(conn).active_scene_id()
+
+
+class ThreadTransportTestCase(unittest.TestCase):
+    def test_exercise_all_ro(self):
+        async def exercise(server):
+            conn = SlobsConnection(server.connection_config())
+            background_task = asyncio.create_task(conn.background_processing())
+            try:
+                await run_quietly(exercise_all_ro, conn)
+                scenes = [scene async for scene in ScenesService(conn).iter_scenes()]
+                self.assertEqual(len(scenes), 3)
+            finally:
+                conn.close()
+                await background_task
+
+        with StandinThread(StandinServer(StandinModel.seeded())) as server:
+            asyncio.run(exercise(server))
+            self.assertGreater(server.requests_received, 0)
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == "__main__":
+    main()